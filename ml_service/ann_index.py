@@ -0,0 +1,115 @@
+import numpy as np
+
+
+class IVFIndex:
+    """Approximate nearest neighbour index (inverted file) built on NumPy.
+
+    Users are partitioned into ``n_lists`` k-means cells. A query is compared
+    against the centroids, and only the members of the ``n_probe`` closest
+    cells are searched exactly. ``n_probe`` trades recall for latency at
+    query time; ``n_lists`` sets the cell size at build time. Exposes the
+    ``kneighbors`` interface of sklearn's NearestNeighbors so it can be used
+    in its place.
+    """
+
+    def __init__(self, n_neighbors=5, n_lists=0, n_probe=8, kmeans_iters=10,
+                 kmeans_sample=20000, random_state=42):
+        self.n_neighbors = n_neighbors
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iters = kmeans_iters
+        self.kmeans_sample = kmeans_sample
+        self.random_state = random_state
+
+    # ============ BUILD ============
+
+    def fit(self, X):
+        """Cluster the points and lay them out contiguously by cell"""
+        X = np.ascontiguousarray(X, dtype=float)
+        n_samples = len(X)
+        n_lists = self.n_lists or int(np.sqrt(n_samples))
+        n_lists = max(1, min(n_lists, n_samples))
+
+        self.centroids_ = self._kmeans(X, n_lists)
+        assignment = self._assign(X, self.centroids_)
+
+        # Store points grouped by cell so each cell is one contiguous slice
+        self.order_ = np.argsort(assignment, kind='stable')
+        self.data_ = X[self.order_]
+        self.sq_norms_ = np.einsum('ij,ij->i', self.data_, self.data_)
+        self.offsets_ = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=n_lists))))
+        self.n_samples_fit_ = n_samples
+        return self
+
+    def _kmeans(self, X, n_lists):
+        rng = np.random.default_rng(self.random_state)
+        if len(X) > self.kmeans_sample:
+            X = X[rng.choice(len(X), self.kmeans_sample, replace=False)]
+        centroids = X[rng.choice(len(X), n_lists, replace=False)].copy()
+
+        for _ in range(self.kmeans_iters):
+            assignment = self._assign(X, centroids)
+            counts = np.bincount(assignment, minlength=n_lists)
+            for dim in range(X.shape[1]):
+                sums = np.bincount(assignment, weights=X[:, dim], minlength=n_lists)
+                nonempty = counts > 0
+                centroids[nonempty, dim] = sums[nonempty] / counts[nonempty]
+            # Re-seed empty cells on random points
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = X[rng.choice(len(X), len(empty), replace=False)]
+        return centroids
+
+    def _assign(self, X, centroids, block=65536):
+        c_norms = np.einsum('ij,ij->i', centroids, centroids)
+        assignment = np.empty(len(X), dtype=np.int64)
+        for start in range(0, len(X), block):
+            chunk = X[start:start + block]
+            assignment[start:start + block] = np.argmin(c_norms - 2 * chunk @ centroids.T, axis=1)
+        return assignment
+
+    # ============ QUERY ============
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """Approximate k nearest neighbours, sorted by ascending distance"""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        k = min(n_neighbors or self.n_neighbors, self.n_samples_fit_)
+        n_probe = min(self.n_probe, len(self.centroids_))
+
+        distances = np.empty((len(X), k))
+        indices = np.empty((len(X), k), dtype=np.int64)
+        centroid_dist = (
+            np.einsum('ij,ij->i', self.centroids_, self.centroids_)[None, :]
+            - 2 * X @ self.centroids_.T
+        )
+        for q, query in enumerate(X):
+            candidates = self._candidates(np.argsort(centroid_dist[q]), n_probe, k)
+            data = self.data_[candidates]
+            sq_dist = self.sq_norms_[candidates] - 2 * data @ query + query @ query
+            if len(candidates) > k:
+                top = np.argpartition(sq_dist, k - 1)[:k]
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.argsort(sq_dist[top], kind='stable')]
+            distances[q] = np.sqrt(np.maximum(sq_dist[top], 0))
+            indices[q] = self.order_[candidates[top]]
+
+        if return_distance:
+            return distances, indices
+        return indices
+
+    def _candidates(self, cell_order, n_probe, k):
+        """Positions (into data_) of the members of the closest cells.
+
+        Probes beyond ``n_probe`` cells only when fewer than k points were found.
+        """
+        ranges = []
+        found = 0
+        for probed, cell in enumerate(cell_order):
+            if probed >= n_probe and found >= k:
+                break
+            start, end = self.offsets_[cell], self.offsets_[cell + 1]
+            if end > start:
+                ranges.append(np.arange(start, end))
+                found += end - start
+        return np.concatenate(ranges)
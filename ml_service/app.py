@@ -1,8 +1,20 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
+import metrics
+from serialization import CodecRequest, FastJSONProvider
+from profiling import RequestProfiler
 from ml_models import MLModels
+from micro_batching import MicroBatcher
+from feature_store import FeatureStore
+from training_jobs import TrainingJobManager
+from warmup import WARMUP_KEY, WarmUp
+from ingestion import DATASETS, resolve_data_file, spool_upload
+from config import (
+    MAX_BATCH_SIZE, WORKOUT_COMPACTION_THRESHOLD, WARMUP_ON_START,
+    PROFILE_REQUESTS, PROFILE_TOKEN, PROFILE_HEADER, PROFILE_SAMPLE_EVERY
+)
 import logging
 
 load_dotenv()
@@ -13,20 +25,271 @@ CORS(app)
 
 # Initialize ML Models
 ml_models = MLModels()
+training_jobs = TrainingJobManager(on_model_trained=lambda name: ml_models.registry.invalidate())
+feature_store = FeatureStore()
+# Concurrent single-user requests share one model call (off unless MICRO_BATCH_MAX_WAIT_MS > 0)
+fitness_batcher = MicroBatcher(ml_models.classify_fitness_levels, 'fitness_classifier')
+progress_batcher = MicroBatcher(ml_models.predict_progress_many, 'progress_prediction')
+profiler = RequestProfiler(PROFILE_REQUESTS, PROFILE_TOKEN, PROFILE_SAMPLE_EVERY)
+warmup = WarmUp()
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ============ METRICS ============
+
+class TimedRequest(CodecRequest):
+    """Request whose body parsing (JSON or MessagePack) is timed as the 'parse' phase"""
+    def get_json(self, *args, **kwargs):
+        with metrics.phase('parse'):
+            return super().get_json(*args, **kwargs)
+
+class TimedJSONProvider(FastJSONProvider):
+    """JSON provider whose response encoding is timed as the 'serialization' phase"""
+    def response(self, *args, **kwargs):
+        with metrics.phase('serialization'):
+            return super().response(*args, **kwargs)
+
+app.request_class = TimedRequest
+app.json = TimedJSONProvider(app)
+
+def request_route():
+    """Route pattern of the current request (bounded label cardinality)"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def metrics_route():
+    """request_route(), or None for synthetic warm-up requests (not recorded)"""
+    return None if request.environ.get(WARMUP_KEY) else request_route()
+
+@app.before_request
+def start_request_metrics():
+    metrics.start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    metrics.finish_request(metrics_route(), request.method, response.status_code)
+    return response
+
+@app.teardown_request
+def clear_request_metrics(error=None):
+    # Only records anything if after_request did not run
+    metrics.finish_request(metrics_route(), request.method, 500)
+
+def collect_cache_metrics():
+    """Cache hit ratios, computed at scrape time"""
+    nutrition = ml_models.nutrition_cache_stats()
+    registry = ml_models.registry
+    lookups = registry.hits + registry.misses
+    return metrics.sample_lines('ml_cache_hit_ratio', 'gauge', 'Cache hits / lookups', 'cache', {
+        'nutrition': nutrition['hit_ratio'],
+        'model_registry': registry.hits / lookups if lookups else 0.0
+    }) + metrics.sample_lines('ml_cache_hits_total', 'counter', 'Cache hits', 'cache', {
+        'nutrition': nutrition['hits'],
+        'model_registry': registry.hits
+    }) + metrics.sample_lines('ml_cache_misses_total', 'counter', 'Cache misses', 'cache', {
+        'nutrition': nutrition['misses'],
+        'model_registry': registry.misses
+    })
+
+metrics.register_collector(collect_cache_metrics)
+
+# ============ PROFILING ============
+
+@app.before_request
+def start_request_profile():
+    flag = request.headers.get(PROFILE_HEADER, request.args.get('profile'))
+    g.profile = profiler.begin(flag, f'{request.method} {request_route()}')
+
+@app.after_request
+def attach_request_profile(response):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.end(profile)
+        response.headers['X-Profile-Id'] = profile.profile_id
+        response.call_on_close(lambda: dump_request_profile(profile))
+    return response
+
+@app.teardown_request
+def discard_request_profile(error=None):
+    # Only set if after_request did not run
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.end(profile)
+
+def dump_request_profile(profile):
+    """Write the profile once the response has been sent"""
+    try:
+        profile.dump()
+    except Exception as e:
+        logger.error(f"Error writing profile {profile.profile_id}: {str(e)}")
+
+# ============ BATCH HELPERS ============
+
+def get_batch_users(data):
+    """Extract the users of a batch request as a list of rows or a dict of columns"""
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    users = data.get('users')
+    if users is None:
+        users = data.get('columns')
+    if isinstance(users, list):
+        count = len(users)
+    elif isinstance(users, dict):
+        count = max((len(col) for col in users.values() if isinstance(col, (list, tuple))), default=0)
+    else:
+        raise ValueError("Provide 'users' (list of objects) or 'columns' (object of arrays)")
+    if count > MAX_BATCH_SIZE:
+        raise ValueError(f'Batch of {count} users exceeds the limit of {MAX_BATCH_SIZE}')
+    return users
+
+def get_workout_model_users(data):
+    """Validate the users_with_workouts list of an incremental workout model update"""
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    users = data.get('users_with_workouts', [])
+    if not isinstance(users, list):
+        raise ValueError("'users_with_workouts' must be a list of {user_id, workouts} objects")
+    for i, user in enumerate(users):
+        if not isinstance(user, dict) or user.get('user_id') is None:
+            raise ValueError(f'users_with_workouts[{i}] needs a user_id')
+        workouts = user.get('workouts', [])
+        if not isinstance(workouts, list) or not all(isinstance(workout, dict) for workout in workouts):
+            raise ValueError(f'users_with_workouts[{i}].workouts must be a list of workout objects')
+    return users
+
+def batch_payload(results):
+    """Wrap ordered per-user batch results"""
+    return {
+        'success': True,
+        'count': len(results),
+        'errors': sum(1 for r in results if 'error' in r),
+        'results': results
+    }
+
+def batch_response(results):
+    return jsonify(batch_payload(results)), 200
+
+# ============ FEATURE STORE ============
+
+def resolve_user(data, history_default):
+    """(user_data, user_history) of a request.
+    
+    With ``user_id``, the stored profile (overridden by any ``user_data``
+    sent) and the stored history are used unless ``user_history`` is sent;
+    an ``as_of`` date picks the window of the stored history's rollups.
+    Raises LookupError for an unknown user_id.
+    """
+    user_id = data.get('user_id')
+    if user_id is None:
+        return data.get('user_data', {}), data.get('user_history', history_default)
+    
+    user_history = data.get('user_history')
+    stored_history = feature_store.user_history(user_id, data.get('as_of')) if user_history is None else None
+    if user_history is None and stored_history is None:
+        raise LookupError(f'Unknown user_id: {user_id}')
+    user_data = dict(feature_store.profile(user_id) or {}, **data.get('user_data', {}))
+    return user_data, user_history if user_history is not None else stored_history
+
+@app.route('/api/ml/users/<user_id>', methods=['GET'])
+def get_user(user_id):
+    """Stored profile and history sizes of one user"""
+    profile = feature_store.profile(user_id)
+    counts = feature_store.counts(user_id)
+    if profile is None and not any(counts.values()):
+        return jsonify({
+            'success': False,
+            'error': f'Unknown user_id: {user_id}'
+        }), 404
+    return jsonify({
+        'success': True,
+        'user_id': user_id,
+        'user_data': profile or {},
+        **counts
+    }), 200
+
+@app.route('/api/ml/users/<user_id>', methods=['DELETE'])
+def delete_user(user_id):
+    """Forget a user's profile and history"""
+    feature_store.delete_user(user_id)
+    return jsonify({'success': True}), 200
+
+@app.route('/api/ml/users/<user_id>/profile', methods=['PUT'])
+def update_user_profile(user_id):
+    """Create or update a user's stored profile (fields are merged)"""
+    try:
+        user_data = request.json.get('user_data')
+        if not isinstance(user_data, dict):
+            raise ValueError('user_data must be an object')
+        return jsonify({
+            'success': True,
+            'user_data': feature_store.set_profile(user_id, user_data)
+        }), 200
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error updating profile of user {user_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/ml/users/<user_id>/workouts', methods=['POST'])
+def append_user_workouts(user_id):
+    """Append workouts (array of objects or columnar) to a user's stored history"""
+    try:
+        added = feature_store.append_workouts(user_id, request.json.get('workouts', []))
+        return jsonify({
+            'success': True,
+            'added': added,
+            **feature_store.counts(user_id)
+        }), 200
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error storing workouts of user {user_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/ml/users/<user_id>/nutrition', methods=['POST'])
+def append_user_nutrition(user_id):
+    """Append nutrition logs (array of objects or columnar) to a user's stored history"""
+    try:
+        added = feature_store.append_nutrition(user_id, request.json.get('nutrition_logs', []))
+        return jsonify({
+            'success': True,
+            'added': added,
+            **feature_store.counts(user_id)
+        }), 200
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error storing nutrition logs of user {user_id}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # ============ WORKOUT RECOMMENDATIONS ============
 
 @app.route('/api/ml/workout-recommendations', methods=['POST'])
 def get_workout_recommendations():
     """Get personalized workout recommendations"""
     try:
-        data = request.json
-        user_data = data.get('user_data', {})
-        user_history = data.get('user_history', [])
+        user_data, user_history = resolve_user(request.json, [])
+        if isinstance(user_history, dict) and 'workout_history' in user_history:
+            user_history = user_history['workout_history']
         
         recommendations = ml_models.get_workout_recommendations(user_data, user_history)
         
@@ -34,6 +297,16 @@ def get_workout_recommendations():
             'success': True,
             'recommendations': recommendations
         }), 200
+    except LookupError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"Error generating workout recommendations: {str(e)}")
         return jsonify({
@@ -66,22 +339,43 @@ def get_nutrition_recommendations():
             'error': str(e)
         }), 500
 
+@app.route('/api/ml/nutrition-recommendations/batch', methods=['POST'])
+def get_nutrition_recommendations_batch():
+    """Get nutrition recommendations for a whole cohort in one request"""
+    try:
+        users = get_batch_users(request.json)
+        return batch_response(ml_models.get_nutrition_recommendations_batch(users))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error generating nutrition recommendations batch: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # ============ PROGRESS PREDICTION ============
 
 @app.route('/api/ml/progress-prediction', methods=['POST'])
 def predict_progress():
     """Predict user progress"""
     try:
-        data = request.json
-        user_data = data.get('user_data', {})
-        user_history = data.get('user_history', {})
+        user_data, user_history = resolve_user(request.json, {})
         
-        prediction = ml_models.predict_progress(user_data, user_history)
+        prediction = progress_batcher(user_history)
         
         return jsonify({
             'success': True,
             'prediction': prediction
         }), 200
+    except LookupError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
     except Exception as e:
         logger.error(f"Error predicting progress: {str(e)}")
         return jsonify({
@@ -89,6 +383,24 @@ def predict_progress():
             'error': str(e)
         }), 500
 
+@app.route('/api/ml/progress-prediction/batch', methods=['POST'])
+def predict_progress_batch():
+    """Predict progress for many users in one request"""
+    try:
+        users = get_batch_users(request.json)
+        return batch_response(ml_models.predict_progress_batch(users))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error predicting progress batch: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # ============ FITNESS LEVEL CLASSIFICATION ============
 
 @app.route('/api/ml/classify-fitness-level', methods=['POST'])
@@ -97,18 +409,23 @@ def classify_fitness_level():
     try:
         data = request.json
         
-        fitness_level = ml_models.classify_fitness_level(
-            age=data.get('age', 30),
-            bmi=data.get('bmi', 24),
-            workouts_per_week=data.get('workouts_per_week', 3),
-            avg_duration=data.get('avg_duration', 30),
-            max_intensity=data.get('max_intensity', 5)
-        )
+        fitness_level = fitness_batcher((
+            data.get('age', 30),
+            data.get('bmi', 24),
+            data.get('workouts_per_week', 3),
+            data.get('avg_duration', 30),
+            data.get('max_intensity', 5)
+        ))
         
         return jsonify({
             'success': True,
             'fitness_level': fitness_level
         }), 200
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         logger.error(f"Error classifying fitness level: {str(e)}")
         return jsonify({
@@ -116,15 +433,31 @@ def classify_fitness_level():
             'error': str(e)
         }), 500
 
+@app.route('/api/ml/classify-fitness-level/batch', methods=['POST'])
+def classify_fitness_level_batch():
+    """Classify fitness level for many users in one request"""
+    try:
+        users = get_batch_users(request.json)
+        return batch_response(ml_models.classify_fitness_level_batch(users))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error classifying fitness level batch: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # ============ AI INSIGHTS ============
 
 @app.route('/api/ml/insights', methods=['POST'])
 def get_insights():
     """Get AI-powered insights for user"""
     try:
-        data = request.json
-        user_data = data.get('user_data', {})
-        user_history = data.get('user_history', {})
+        user_data, user_history = resolve_user(request.json, {})
         
         insights = ml_models.get_insights(user_data, user_history)
         
@@ -132,6 +465,11 @@ def get_insights():
             'success': True,
             'insights': insights
         }), 200
+    except LookupError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
     except Exception as e:
         logger.error(f"Error generating insights: {str(e)}")
         return jsonify({
@@ -143,37 +481,102 @@ def get_insights():
 
 @app.route('/api/ml/train-models', methods=['POST'])
 def train_models():
-    """Train all ML models"""
+    """Start a background job that trains all ML models.
+    
+    Accepts inline JSON datasets, JSON ``files`` referencing NDJSON files
+    under DATA_PATH, or a streamed NDJSON body (``?dataset=<name>``).
+    """
     try:
-        data = request.json
+        if request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+            dataset = request.args.get('dataset')
+            if dataset not in DATASETS:
+                raise ValueError(f"Query parameter 'dataset' must be one of: {', '.join(DATASETS)}")
+            # Spool the body to disk in chunks; the training worker parses it
+            path = spool_upload(request.stream)
+            job_id = training_jobs.submit({}, files={dataset: path}, cleanup=[path])
+        else:
+            data = request.json
+            files = {}
+            for dataset, filename in data.get('files', {}).items():
+                if dataset not in DATASETS:
+                    raise ValueError(f"Unknown dataset in 'files': {dataset}")
+                files[dataset] = resolve_data_file(filename)
+            job_id = training_jobs.submit(data, files)
         
-        # Train workout recommendation model
-        workout_data = data.get('users_with_workouts', [])
-        if workout_data:
-            ml_models.train_workout_recommendation_model(workout_data)
+        return jsonify({
+            'success': True,
+            'message': 'Model training started',
+            'job_id': job_id,
+            'status_url': f'/api/ml/train-models/{job_id}'
+        }), 202
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error starting model training: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/ml/train-models/<job_id>', methods=['GET'])
+def training_job_status(job_id):
+    """Get status and per-model progress of a training job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Training job not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job
+    }), 200
+
+@app.route('/api/ml/workout-model/users', methods=['POST'])
+def update_workout_model_users():
+    """Add or update users in the workout recommendation model without a full refit"""
+    try:
+        users = get_workout_model_users(request.json)
         
-        # Train progress prediction model
-        progress_data = data.get('historical_progress_data', [])
-        if progress_data:
-            ml_models.train_progress_prediction_model(progress_data)
-            ml_models.train_progress_neural_network(progress_data)
+        pending = ml_models.update_workout_recommendation_model(users)
         
-        # Train fitness classifier
-        user_profiles = data.get('user_profiles', [])
-        if user_profiles:
-            ml_models.train_fitness_classifier(user_profiles)
+        # Fold pending updates into the base index in the background
+        compaction_job_id = None
+        if pending >= WORKOUT_COMPACTION_THRESHOLD:
+            compaction_job_id = training_jobs.submit_compaction()
         
         return jsonify({
             'success': True,
-            'message': 'Models trained successfully'
+            'updated': len(users),
+            'pending_updates': pending,
+            'compaction_job_id': compaction_job_id
         }), 200
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
-        logger.error(f"Error training models: {str(e)}")
+        logger.error(f"Error updating workout model: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/ml/workout-model/compact', methods=['POST'])
+def compact_workout_model():
+    """Rebuild the workout index with all pending updates in the background"""
+    job_id = training_jobs.submit_compaction()
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': f'/api/ml/train-models/{job_id}'
+    }), 202
+
 # ============ HEALTH CHECK ============
 
 @app.route('/api/ml/health', methods=['GET'])
@@ -185,6 +588,42 @@ def health_check():
         'timestamp': __import__('datetime').datetime.now().isoformat()
     }), 200
 
+@app.route('/api/ml/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: 200 once warm-up has finished, 503 until then"""
+    # Under servers that don't call start_warmup(), the first probe starts it
+    start_warmup()
+    return jsonify(dict(warmup.status(), success=warmup.ready)), 200 if warmup.ready else 503
+
+@app.route('/api/ml/models', methods=['GET'])
+def model_status():
+    """Load statistics for resident model artifacts and result caches"""
+    return jsonify({
+        'success': True,
+        'models': ml_models.registry.stats(),
+        'caches': {
+            'nutrition': ml_models.nutrition_cache_stats()
+        }
+    }), 200
+
+@app.route('/api/ml/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request, model load and cache metrics in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+# ============ WARM-UP ============
+
+def send_warmup_request(path, body):
+    """POST a synthetic request through the app; returns the status code"""
+    return app.test_client().post(path, json=body, environ_overrides={WARMUP_KEY: True}).status_code
+
+def start_warmup():
+    """Start warming up in the background, once (or mark ready if WARMUP_ON_START is off)"""
+    if WARMUP_ON_START:
+        warmup.start(send_warmup_request, ml_models.load_artifacts)
+    else:
+        warmup.skip()
+
 # ============ ERROR HANDLERS ============
 
 @app.errorhandler(404)
@@ -205,4 +644,5 @@ def internal_error(error):
 if __name__ == '__main__':
     port = os.getenv('ML_PORT', 5001)
     debug = os.getenv('FLASK_ENV') == 'development'
+    start_warmup()
     app.run(host='0.0.0.0', port=int(port), debug=debug)
@@ -0,0 +1,281 @@
+"""
+ASGI front end for the ML service.
+
+The inference endpoints are served on an asyncio event loop: request bodies
+are read and decoded there, stored users are read from the feature store on
+a small thread pool, and the model call itself runs in a pool of preloaded
+worker processes (inference_pool.InferencePool), so concurrent requests use
+as many cores as there are INFERENCE_WORKERS. Every other route (training,
+feature store writes, health, metrics, ...) is handed to the Flask app in
+app.py on a thread, so both serving modes expose the same API.
+
+Run with an ASGI server, one server process (scale with INFERENCE_WORKERS):
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import io
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+
+import metrics
+from app import app as flask_app, batch_payload, get_batch_users, ml_models, resolve_user, warmup
+from config import ASGI_THREADS, WARMUP_ON_START
+from inference_pool import InferencePool
+from micro_batching import AsyncMicroBatcher
+from serialization import decode_body, encode_body
+from warmup import WARMUP_KEY
+
+logger = logging.getLogger(__name__)
+
+# ============ ROUTES ============
+
+async def user_and_history(service, data, history_default, phases):
+    """resolve_user, reading stored users on a thread"""
+    if data.get('user_id') is None:
+        return resolve_user(data, history_default)
+    start = time.perf_counter()
+    try:
+        return await service.in_thread(resolve_user, data, history_default)
+    finally:
+        phases['feature_store'] = time.perf_counter() - start
+
+async def workout_recommendations(service, data, phases):
+    user_data, user_history = await user_and_history(service, data, [], phases)
+    if isinstance(user_history, dict) and 'workout_history' in user_history:
+        user_history = user_history['workout_history']
+    return {'recommendations': await service.infer(phases, 'get_workout_recommendations', user_data, user_history)}
+
+async def nutrition_recommendations(service, data, phases):
+    processed_data = ml_models.preprocess_user_data(data.get('user_data', {}))
+    return {'recommendations': await service.infer(phases, 'get_nutrition_recommendations', processed_data)}
+
+async def progress_prediction(service, data, phases):
+    user_data, user_history = await user_and_history(service, data, {}, phases)
+    return {'prediction': await service.progress_batcher(user_history, phases)}
+
+async def fitness_level(service, data, phases):
+    return {'fitness_level': await service.fitness_batcher((
+        data.get('age', 30), data.get('bmi', 24), data.get('workouts_per_week', 3),
+        data.get('avg_duration', 30), data.get('max_intensity', 5)
+    ), phases)}
+
+async def insights(service, data, phases):
+    user_data, user_history = await user_and_history(service, data, {}, phases)
+    return {'insights': await service.infer(phases, 'get_insights', user_data, user_history)}
+
+def batch_route(method_name):
+    async def handler(service, data, phases):
+        return batch_payload(await service.infer(phases, method_name, get_batch_users(data)))
+    return handler
+
+# path: (handler, {exception type: status}, what is logged on other errors); POST only,
+# with the same responses as the Flask routes of the same path
+ROUTES = {
+    '/api/ml/workout-recommendations': (
+        workout_recommendations, {LookupError: 404, ValueError: 400}, 'generating workout recommendations'),
+    '/api/ml/nutrition-recommendations': (
+        nutrition_recommendations, {}, 'generating nutrition recommendations'),
+    '/api/ml/nutrition-recommendations/batch': (
+        batch_route('get_nutrition_recommendations_batch'), {ValueError: 400},
+        'generating nutrition recommendations batch'),
+    '/api/ml/progress-prediction': (
+        progress_prediction, {LookupError: 404}, 'predicting progress'),
+    '/api/ml/progress-prediction/batch': (
+        batch_route('predict_progress_batch'), {ValueError: 400}, 'predicting progress batch'),
+    '/api/ml/classify-fitness-level': (
+        fitness_level, {ValueError: 400}, 'classifying fitness level'),
+    '/api/ml/classify-fitness-level/batch': (
+        batch_route('classify_fitness_level_batch'), {ValueError: 400}, 'classifying fitness level batch'),
+    '/api/ml/insights': (
+        insights, {LookupError: 404}, 'generating insights')
+}
+
+# ============ ASGI APPLICATION ============
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+def call_wsgi(wsgi_app, scope, body):
+    """Run one request through a WSGI app; returns (status, ASGI headers, body)"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False
+    }
+    if scope.get(WARMUP_KEY):
+        environ[WARMUP_KEY] = True
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ and key.startswith('HTTP_') else value
+
+    response = {}
+    def start_response(status, headers, exc_info=None):
+        response['status'], response['headers'] = status, headers
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        # Runs call_on_close callbacks (profile dumps)
+        if hasattr(result, 'close'):
+            result.close()
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response['headers']]
+    return int(response['status'].split(' ', 1)[0]), headers, body
+
+
+class AsyncService:
+    """ASGI app: the inference ROUTES on the event loop and an InferencePool, other routes through Flask"""
+
+    def __init__(self, wsgi_app, pool=None, threads=ASGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.pool = pool if pool is not None else InferencePool()
+        self.threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi')
+        # Concurrent single-user requests share one pool call (off unless MICRO_BATCH_MAX_WAIT_MS > 0)
+        self.fitness_batcher = AsyncMicroBatcher(
+            lambda rows, phases: self.infer(phases, 'classify_fitness_levels', rows), 'fitness_classifier'
+        )
+        self.progress_batcher = AsyncMicroBatcher(
+            lambda histories, phases: self.infer(phases, 'predict_progress_many', histories), 'progress_prediction'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        body = await read_body(receive)
+        route = ROUTES.get(scope['path'])
+        if route is not None and scope['method'] == 'POST':
+            status, headers, body = await self.handle(route, scope, body)
+        else:
+            status, headers, body = await self.in_thread(call_wsgi, self.wsgi_app, scope, body)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                start = time.perf_counter()
+                try:
+                    pids = await self.in_thread(self.pool.start)
+                except Exception as e:
+                    logger.error(f"Error starting inference workers: {str(e)}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                logger.info(f"{len(pids)} inference workers ready")
+                self.start_warmup(time.perf_counter() - start, len(pids))
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.in_thread(self.pool.shutdown)
+                self.threads.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def start_warmup(self, workers_seconds, n_workers):
+        """Warm up by sending the synthetic requests through this app (see warmup.py).
+
+        The models live in the inference workers, which load them before
+        the pool reports started, so that is recorded as the first step.
+        """
+        if not WARMUP_ON_START:
+            warmup.skip()
+            return
+        warmup.record('inference_workers', workers_seconds, workers=n_workers)
+        loop = asyncio.get_running_loop()
+        warmup.start(lambda path, body: asyncio.run_coroutine_threadsafe(
+            self.warmup_request(path, body), loop
+        ).result())
+
+    async def warmup_request(self, path, body):
+        scope = {
+            'type': 'http', 'method': 'POST', 'path': path, 'query_string': b'', 'http_version': '1.1',
+            'headers': [(b'content-type', b'application/json')], WARMUP_KEY: True
+        }
+        status, _, _ = await self.handle(ROUTES[path], scope, json.dumps(body).encode())
+        return status
+
+    async def in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.threads, func, *args)
+
+    async def infer(self, phases, method_name, *args):
+        """Run an MLModels method in the pool, charging compute to 'inference' and the rest to 'dispatch'"""
+        start = time.perf_counter()
+        result, compute = await self.pool.run(method_name, *args)
+        phases['inference'] = phases.get('inference', 0.0) + compute
+        phases['dispatch'] = phases.get('dispatch', 0.0) + time.perf_counter() - start - compute
+        return result
+
+    async def handle(self, route, scope, body):
+        handler, client_errors, action = route
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope.get('headers', ())}
+        phases = {}
+        metrics.IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            try:
+                data = decode_body(body, headers.get('content-type', '').split(';', 1)[0].strip().lower())
+                phases['parse'] = time.perf_counter() - start
+                payload, status = await handler(self, data, phases), 200
+                payload = dict(payload, success=True)
+            except HTTPException as e:
+                payload, status = {'success': False, 'error': e.description}, e.code
+            except Exception as e:
+                status = next((code for error, code in client_errors.items() if isinstance(e, error)), 500)
+                if status == 500:
+                    logger.error(f"Error {action}: {str(e)}")
+                payload = {'success': False, 'error': str(e)}
+
+            encode_start = time.perf_counter()
+            try:
+                body, content_type = encode_body(payload, headers.get('accept', ''))
+            except Exception as e:
+                logger.error(f"Error encoding response {action}: {str(e)}")
+                status = 500
+                body = json.dumps({'success': False, 'error': str(e)}).encode() + b'\n'
+                content_type = 'application/json'
+            now = time.perf_counter()
+            phases['serialization'] = now - encode_start
+            if not scope.get(WARMUP_KEY):
+                metrics.observe_request(scope['path'], 'POST', status, now - start, phases)
+        finally:
+            metrics.IN_FLIGHT.dec()
+
+        response_headers = [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())]
+        if 'origin' in headers:
+            # What flask-cors sends with its defaults
+            response_headers += [(b'access-control-allow-origin', headers['origin'].encode('latin-1')), (b'vary', b'Origin')]
+        return status, response_headers, body
+
+
+app = AsyncService(flask_app)
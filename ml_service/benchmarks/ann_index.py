@@ -0,0 +1,99 @@
+"""
+Benchmark: exact ball tree vs IVF approximate index for workout similarity.
+
+Builds both indexes over synthetic user feature vectors, then issues
+single-row queries (the serving pattern) and reports build time,
+recall@k against the exact neighbours, and p50/p99 query latency for each
+n_probe setting.
+
+Usage (from ml_service/):
+    python -m benchmarks.ann_index [--users 200000] [--n-probe 1 2 4 8 16]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+from ann_index import IVFIndex
+from benchmarks.feature_extraction import generate_table
+from ml_models import MLModels
+
+
+def timed_queries(index, queries, k):
+    latencies = np.empty(len(queries))
+    neighbours = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        neighbours[i] = index.kneighbors(query.reshape(1, -1), n_neighbors=k, return_distance=False)[0]
+        latencies[i] = time.perf_counter() - start
+    return neighbours, latencies
+
+
+def recall(approx, exact):
+    hits = sum(len(np.intersect1d(a, e)) for a, e in zip(approx, exact))
+    return hits / exact.size
+
+
+def run(n_users, n_queries, k, n_lists, n_probes):
+    _, features = MLModels().extract_workout_features_bulk(generate_table(n_users, 8), user_ids=np.arange(n_users))
+    rng = np.random.default_rng(1)
+    queries = features[rng.choice(n_users, n_queries, replace=False)]
+    queries = queries + rng.normal(0, 1, queries.shape)
+
+    start = time.perf_counter()
+    exact = NearestNeighbors(n_neighbors=k, algorithm='ball_tree').fit(features)
+    exact_build = time.perf_counter() - start
+    exact_neighbours, exact_latency = timed_queries(exact, queries, k)
+
+    results = [{
+        'index': 'exact',
+        'build_seconds': exact_build,
+        f'recall@{k}': 1.0,
+        'p50_ms': np.percentile(exact_latency, 50) * 1000,
+        'p99_ms': np.percentile(exact_latency, 99) * 1000
+    }]
+
+    start = time.perf_counter()
+    ivf = IVFIndex(n_neighbors=k, n_lists=n_lists).fit(features)
+    ivf_build = time.perf_counter() - start
+    for n_probe in n_probes:
+        ivf.n_probe = n_probe
+        neighbours, latency = timed_queries(ivf, queries, k)
+        results.append({
+            'index': f'ivf n_lists={len(ivf.centroids_)} n_probe={n_probe}',
+            'build_seconds': ivf_build,
+            f'recall@{k}': recall(neighbours, exact_neighbours),
+            'p50_ms': np.percentile(latency, 50) * 1000,
+            'p99_ms': np.percentile(latency, 99) * 1000
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Workout similarity index benchmark')
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--n-lists', type=int, default=0, help='IVF cells (0 = sqrt(users))')
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.users, args.queries, args.k, args.n_lists, args.n_probe)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.users} users, {args.queries} single-row queries")
+    print(f"{'index':<32} {'build':>8} {f'recall@{args.k}':>9} {'p50':>9} {'p99':>9}")
+    for r in results:
+        print(f"{r['index']:<32} {r['build_seconds']:>7.2f}s {r[f'recall@{args.k}']:>9.3f} "
+              f"{r['p50_ms']:>7.3f}ms {r['p99_ms']:>7.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
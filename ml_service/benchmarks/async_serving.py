@@ -0,0 +1,208 @@
+"""
+Benchmark: throughput of the Flask app vs the ASGI front end with N inference workers.
+
+Trains the progress, fitness and workout models on synthetic data in a
+throwaway MODEL_PATH, then drives a closed loop of --concurrency clients
+for --duration seconds against each serving mode, in-process (no sockets,
+so the numbers isolate the app and leave HTTP parsing to the server):
+
+  * flask     - the Flask app called as WSGI, one thread per client (like
+                the threaded development server); inference holds the GIL
+  * asgi-N    - asgi_app.AsyncService on an asyncio event loop, one
+                coroutine per client, inference in N preloaded worker
+                processes
+
+The request mix is CPU-bound inference (see --mix and benchmarks.load).
+Throughput of asgi-N should grow with N up to the number of cores; on a
+single core it cannot, and the process pool only adds dispatch overhead.
+For end-to-end numbers over HTTP run benchmarks.load against
+``uvicorn asgi_app:app``.
+
+Usage (from ml_service/):
+    python -m benchmarks.async_serving [--workers 1 2 4] [--concurrency 16] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.suite import fitness_profiles, progress_data
+
+DEFAULT_MIX = 'workout-recommendations=2,progress-prediction=2,classify-fitness-level=1,insights=1'
+
+
+def train_models(rows, users):
+    from benchmarks.feature_extraction import generate_table
+    from ml_models import MLModels
+
+    rng = np.random.default_rng(0)
+    ml_models = MLModels()
+    ml_models.train_progress_prediction_model(progress_data(rows, rng))
+    ml_models.train_fitness_classifier(fitness_profiles(rows, rng))
+    ml_models.train_workout_recommendation_model_from_table(generate_table(users, 8))
+
+
+def request_stream(mix, requests, seed):
+    """Endless (path, body) choices with the mix's weights"""
+    rng = np.random.default_rng(seed)
+    names = list(mix)
+    weights = np.array([mix[name] for name in names], dtype=float)
+    weights /= weights.sum()
+    while True:
+        _, path, bodies = requests[names[rng.choice(len(names), p=weights)]]
+        yield path, bodies[rng.integers(len(bodies))]
+
+
+def request_scope(path):
+    return {
+        'type': 'http', 'method': 'POST', 'path': path, 'query_string': b'', 'http_version': '1.1',
+        'headers': [(b'content-type', b'application/json')]
+    }
+
+
+def run_flask(mix, requests, concurrency, duration, warmup):
+    from app import app
+    from asgi_app import call_wsgi
+    from benchmarks.load import summarize
+
+    stop = threading.Event()
+    record_after = time.perf_counter() + warmup
+    latencies, errors = [], [0]
+
+    def client(seed):
+        for path, body in request_stream(mix, requests, seed):
+            if stop.is_set():
+                return
+            start = time.perf_counter()
+            status = call_wsgi(app, request_scope(path), body)[0]
+            if start >= record_after:
+                latencies.append(time.perf_counter() - start)
+                errors[0] += status >= 400
+
+    threads = [threading.Thread(target=client, args=(seed,), daemon=True) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup + duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], duration)
+
+
+async def asgi_request(service, path, body):
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop() if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await service(request_scope(path), receive, send)
+    return sent[0]['status']
+
+
+async def drive_asgi(service, mix, requests, concurrency, duration, warmup):
+    from benchmarks.load import summarize
+
+    record_after = time.perf_counter() + warmup
+    deadline = record_after + duration
+    latencies, errors = [], [0]
+
+    async def client(seed):
+        for path, body in request_stream(mix, requests, seed):
+            start = time.perf_counter()
+            if start >= deadline:
+                return
+            status = await asgi_request(service, path, body)
+            if start >= record_after:
+                latencies.append(time.perf_counter() - start)
+                errors[0] += status >= 400
+
+    await asyncio.gather(*(client(seed) for seed in range(concurrency)))
+    return summarize(latencies, errors[0], duration)
+
+
+def run_asgi(workers, mix, requests, concurrency, duration, warmup):
+    from app import app
+    from asgi_app import AsyncService
+    from inference_pool import InferencePool
+
+    service = AsyncService(app, InferencePool(workers))
+    start = time.perf_counter()
+    service.pool.start()
+    startup = time.perf_counter() - start
+    try:
+        result = asyncio.run(drive_asgi(service, mix, requests, concurrency, duration, warmup))
+    finally:
+        service.pool.shutdown()
+        service.threads.shutdown()
+    result['startup_seconds'] = startup
+    return result
+
+
+def run(workers, concurrency, duration, warmup, mix, history_size, rows, users):
+    root = tempfile.mkdtemp(prefix='ml-async-serving-')
+    os.environ['MODEL_PATH'] = os.path.join(root, 'models')
+    os.environ['DATA_PATH'] = os.path.join(root, 'data')
+    os.environ['FEATURE_STORE_PATH'] = os.path.join(root, 'data', 'feature_store.db')
+    os.environ['PROFILE_REQUESTS'] = 'false'
+    os.environ['PROFILE_SAMPLE_EVERY'] = '0'
+    try:
+        # Imported once MODEL_PATH points at the throwaway models (benchmarks.load imports config)
+        from benchmarks.load import build_requests, parse_mix
+
+        mix = parse_mix(mix)
+        train_models(rows, users)
+        requests = build_requests(mix, history_size, batch_size=1)
+        results = {'flask': run_flask(mix, requests, concurrency, duration, warmup)}
+        for n in workers:
+            results[f'asgi-{n}'] = run_asgi(n, mix, requests, concurrency, duration, warmup)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flask vs ASGI + inference process pool throughput')
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, 4, os.cpu_count() or 1}),
+                        help='inference worker counts to measure')
+    parser.add_argument('--concurrency', type=int, default=16, help='closed-loop clients')
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds per mode')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured seconds before that')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint weights (names from benchmarks.load)')
+    parser.add_argument('--history-size', type=int, default=50, help='workouts per user history')
+    parser.add_argument('--rows', type=int, default=20000, help='training rows for the forests')
+    parser.add_argument('--users', type=int, default=20000, help='users in the workout index')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(
+        args.workers, args.concurrency, args.duration, args.warmup, args.mix,
+        args.history_size, args.rows, args.users
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{os.cpu_count()} CPUs, {args.concurrency} clients, {args.duration:.0f}s per mode, mix {args.mix}")
+    print(f"{'mode':<10} {'req/s':>8} {'vs flask':>9} {'p50':>9} {'p99':>9} {'errors':>7}")
+    flask_rps = results['flask']['throughput_rps']
+    for mode, r in results.items():
+        if not r['requests']:
+            print(f"{mode:<10} {'no requests':>8}")
+            continue
+        print(f"{mode:<10} {r['throughput_rps']:>8.1f} {r['throughput_rps'] / flask_rps:>8.2f}x "
+              f"{r['p50_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms {r['error_rate']:>6.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: per-user vs bulk workout feature extraction.
+
+The per-user path (extract_workout_features, one DataFrame per user) is
+timed on a sample of users and extrapolated; the bulk path
+(extract_workout_features_bulk over one flat table) is timed on the whole
+population. Features of the sampled users are checked for equality.
+
+Usage (from ml_service/):
+    python -m benchmarks.feature_extraction [--users 10000 100000 1000000]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from ml_models import MLModels
+
+WORKOUT_TYPES = np.array(['Cardio', 'Strength', 'Flexibility', 'HIIT', 'Balance', 'Endurance'], dtype=object)
+
+
+def generate_table(n_users, workouts_per_user, seed=42):
+    """Flat workouts table with a Poisson number of workouts per user"""
+    rng = np.random.default_rng(seed)
+    per_user = rng.poisson(workouts_per_user, n_users)
+    user_id = np.repeat(np.arange(n_users, dtype=np.int64), per_user)
+    n_rows = len(user_id)
+    return {
+        'user_id': user_id,
+        'type': WORKOUT_TYPES[rng.integers(0, len(WORKOUT_TYPES), n_rows)],
+        'duration': rng.integers(10, 91, n_rows).astype(float),
+        'calories_burned': rng.uniform(50, 900, n_rows).round(1),
+        'date': np.datetime64('2024-01-01') + rng.integers(0, 365, n_rows).astype('timedelta64[D]')
+    }
+
+
+def user_workouts(table, starts, user):
+    start, end = starts[user], starts[user + 1]
+    return [
+        {
+            'type': table['type'][i],
+            'duration': table['duration'][i],
+            'calories_burned': table['calories_burned'][i],
+            'date': str(table['date'][i])
+        }
+        for i in range(start, end)
+    ]
+
+
+def run(sizes, workouts_per_user, sample_users):
+    ml_models = MLModels()
+    results = []
+
+    for n_users in sizes:
+        table = generate_table(n_users, workouts_per_user)
+        starts = np.searchsorted(table['user_id'], np.arange(n_users + 1))
+
+        start = time.perf_counter()
+        user_ids, bulk = ml_models.extract_workout_features_bulk(table, user_ids=np.arange(n_users))
+        bulk_seconds = time.perf_counter() - start
+
+        sample = np.random.default_rng(0).choice(n_users, min(sample_users, n_users), replace=False)
+        histories = [user_workouts(table, starts, user) for user in sample]
+        start = time.perf_counter()
+        per_user = np.array([ml_models.extract_workout_features(h) for h in histories], dtype=float)
+        sample_seconds = time.perf_counter() - start
+
+        results.append({
+            'users': n_users,
+            'workouts': len(table['user_id']),
+            'bulk_seconds': bulk_seconds,
+            'per_user_seconds_estimated': sample_seconds / len(sample) * n_users,
+            'speedup': sample_seconds / len(sample) * n_users / bulk_seconds,
+            'identical': bool(np.allclose(per_user, bulk[sample], equal_nan=True))
+        })
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Workout feature extraction benchmark')
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--workouts-per-user', type=float, default=8)
+    parser.add_argument('--sample-users', type=int, default=500,
+                        help='users timed on the per-user path (extrapolated to the population)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.users, args.workouts_per_user, args.sample_users)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'users':>10} {'workouts':>11} {'bulk':>10} {'per-user (est.)':>16} {'speedup':>9}  identical")
+    for r in results:
+        print(f"{r['users']:>10} {r['workouts']:>11} {r['bulk_seconds']:>9.3f}s "
+              f"{r['per_user_seconds_estimated']:>15.1f}s {r['speedup']:>8.0f}x  {r['identical']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Microbenchmark: sklearn random forest predict vs the compiled ForestArrays.
+
+Trains the progress regressor and fitness classifier the way MLModels does
+(StandardScaler + 100-tree forest, LabelEncoder for the classifier), then:
+
+  * checks that ForestArrays.predict returns exactly the same predictions
+    as ``forest.predict(scaler.transform(X))`` on random rows
+  * times both paths for batches of 1, 8, 64 and 512 rows (p50 latency)
+
+The crossover batch size is where COMPILED_FOREST_MAX_ROWS should sit.
+Exits non-zero if any prediction differs.
+
+Usage (from ml_service/):
+    python -m benchmarks.forest_inference [--rows 20000] [--batch-sizes 1 8 64 512]
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from forest_arrays import ForestArrays
+
+FITNESS_LEVELS = np.array(['Beginner', 'Intermediate', 'Advanced', 'Elite'], dtype=object)
+
+
+def synthetic_features(n_rows, rng):
+    return np.column_stack([
+        rng.integers(16, 80, n_rows), rng.uniform(16, 40, n_rows), rng.integers(0, 8, n_rows),
+        rng.uniform(10, 90, n_rows), rng.integers(1, 11, n_rows)
+    ]).astype(float)
+
+
+def train(n_rows, rng):
+    X = synthetic_features(n_rows, rng)
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    regressor = RandomForestRegressor(n_estimators=100, random_state=42)
+    regressor.fit(X_scaled, X[:, 2] * 0.3 - X[:, 1] * 0.1 + rng.normal(0, 1, n_rows))
+
+    le = LabelEncoder()
+    y = le.fit_transform(FITNESS_LEVELS[np.minimum(X[:, 2] // 2, 3).astype(int)])
+    classifier = RandomForestClassifier(n_estimators=100, random_state=42)
+    classifier.fit(X_scaled, np.where(rng.uniform(size=n_rows) < 0.2, rng.integers(0, 4, n_rows), y))
+
+    return {
+        'progress_regressor': (
+            lambda X: regressor.predict(scaler.transform(X)),
+            ForestArrays.from_estimator(regressor, scaler)
+        ),
+        'fitness_classifier': (
+            lambda X: le.inverse_transform(classifier.predict(scaler.transform(X))),
+            ForestArrays.from_estimator(classifier, scaler, le)
+        )
+    }
+
+
+def p50_ms(predict, X, repeats):
+    predict(X)
+    latencies = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        predict(X)
+        latencies[i] = time.perf_counter() - start
+    return np.percentile(latencies, 50) * 1000
+
+
+def run(n_rows, batch_sizes, repeats, n_check):
+    rng = np.random.default_rng(0)
+    models = train(n_rows, rng)
+    X_check = synthetic_features(n_check, rng) * rng.uniform(0.8, 1.2, (n_check, 5))
+
+    results = []
+    for name, (sklearn_predict, forest) in models.items():
+        expected = sklearn_predict(X_check)
+        actual = np.concatenate([forest.predict(X_check[i:i + 512]) for i in range(0, n_check, 512)])
+        identical = bool(np.array_equal(expected, actual))
+
+        for batch_size in batch_sizes:
+            X = X_check[:batch_size]
+            sklearn_ms = p50_ms(sklearn_predict, X, repeats)
+            compiled_ms = p50_ms(forest.predict, X, repeats)
+            results.append({
+                'model': name,
+                'nodes': forest.n_nodes,
+                'batch_size': batch_size,
+                'sklearn_ms': sklearn_ms,
+                'compiled_ms': compiled_ms,
+                'speedup': sklearn_ms / compiled_ms,
+                'identical': identical
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compiled forest inference microbenchmark')
+    parser.add_argument('--rows', type=int, default=20000, help='training rows per forest')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 64, 512])
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--check', type=int, default=10000, help='rows compared against sklearn')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.batch_sizes, args.repeats, args.check)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.rows} training rows, 100 trees; p50 latency per call")
+        print(f"{'model':<20} {'rows':>5} {'sklearn':>10} {'compiled':>10} {'speedup':>8} {'identical':>9}")
+        for r in results:
+            print(f"{r['model']:<20} {r['batch_size']:>5} {r['sklearn_ms']:>8.3f}ms {r['compiled_ms']:>8.3f}ms "
+                  f"{r['speedup']:>7.1f}x {str(r['identical']):>9}")
+
+    if not all(r['identical'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
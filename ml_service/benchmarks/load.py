@@ -0,0 +1,290 @@
+"""
+Closed-loop load generator for the ML service.
+
+Each of --concurrency worker threads owns one persistent HTTP/1.1 connection
+and sends its next request as soon as the previous response arrives, picking
+the endpoint from a weighted --mix. Request bodies are generated and encoded
+up front (a small pool per endpoint, sized by --history-size and
+--batch-size), so the client spends its time on I/O rather than building
+payloads. Requests during --warmup are not counted.
+
+Reports throughput, p50/p95/p99/max latency and error rate per endpoint and
+overall. Training and model-update endpoints are not driven (they mutate the
+service's models).
+
+The client is Python too: on a small machine it competes with the service
+for CPU, so run it from another host for absolute numbers.
+
+Usage (from ml_service/):
+    python -m benchmarks.load --start-service [--server asgi] [--concurrency 8] [--duration 30]
+    python -m benchmarks.load --url http://localhost:5001 --mix workout-recommendations=3,insights=1
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+from benchmarks.startup import SERVICE_DIR, free_port
+from benchmarks.suite import batch_users, user_history
+
+PROFILE = {'fitness_level': 'Intermediate', 'goal': 'Weight Loss', 'weight': 80, 'height': 178, 'age': 34}
+
+# name: (method, path, body builder(rng, history_size, batch_size) or None)
+ENDPOINTS = {
+    'health': ('GET', '/api/ml/health', None),
+    'models': ('GET', '/api/ml/models', None),
+    'metrics': ('GET', '/api/ml/metrics', None),
+    'workout-recommendations': ('POST', '/api/ml/workout-recommendations', lambda rng, h, b: {
+        'user_data': PROFILE, 'user_history': user_history(h, rng)['workout_history']
+    }),
+    'nutrition-recommendations': ('POST', '/api/ml/nutrition-recommendations', lambda rng, h, b: {
+        'user_data': dict(PROFILE, weight=int(rng.integers(50, 120)), age=int(rng.integers(18, 70)))
+    }),
+    'progress-prediction': ('POST', '/api/ml/progress-prediction', lambda rng, h, b: {
+        'user_data': PROFILE, 'user_history': user_history(h, rng)
+    }),
+    'classify-fitness-level': ('POST', '/api/ml/classify-fitness-level', lambda rng, h, b: {
+        'age': int(rng.integers(18, 70)), 'bmi': float(rng.uniform(18, 35)),
+        'workouts_per_week': int(rng.integers(0, 7)), 'avg_duration': float(rng.uniform(15, 90)),
+        'max_intensity': int(rng.integers(1, 11))
+    }),
+    'insights': ('POST', '/api/ml/insights', lambda rng, h, b: {
+        'user_data': PROFILE, 'user_history': user_history(h, rng)
+    }),
+    'classify-fitness-level-batch': ('POST', '/api/ml/classify-fitness-level/batch', lambda rng, h, b: {
+        'users': batch_users(b, rng)
+    }),
+    'progress-prediction-batch': ('POST', '/api/ml/progress-prediction/batch', lambda rng, h, b: {
+        'users': batch_users(b, rng)
+    }),
+    'nutrition-recommendations-batch': ('POST', '/api/ml/nutrition-recommendations/batch', lambda rng, h, b: {
+        'users': batch_users(b, rng)
+    })
+}
+PAYLOADS_PER_ENDPOINT = 16
+
+
+def parse_mix(text):
+    """'a=3,b=1' -> {'a': 3.0, 'b': 1.0}; empty means every endpoint, equally weighted"""
+    if not text:
+        return {name: 1.0 for name in ENDPOINTS}
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f'Unknown endpoint {name!r}; choose from {", ".join(ENDPOINTS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def build_requests(mix, history_size, batch_size, seed=0):
+    """{name: (method, path, [encoded bodies])} for the endpoints in the mix"""
+    rng = np.random.default_rng(seed)
+    requests = {}
+    for name in mix:
+        method, path, build = ENDPOINTS[name]
+        bodies = [None] if build is None else [
+            json.dumps(build(rng, history_size, batch_size)).encode() for _ in range(PAYLOADS_PER_ENDPOINT)
+        ]
+        requests[name] = (method, path, bodies)
+    return requests
+
+
+class Worker(threading.Thread):
+    """One closed-loop client: send, wait for the response, record, repeat"""
+
+    def __init__(self, host, port, requests, names, weights, seed, record_after, stop):
+        super().__init__(daemon=True)
+        self.host, self.port = host, port
+        self.requests = requests
+        self.names, self.weights = names, weights
+        self.rng = np.random.default_rng(seed)
+        self.record_after, self.stop = record_after, stop
+        self.latencies = {name: [] for name in names}
+        self.errors = {name: 0 for name in names}
+        self.connects = 0
+        self.connection = None
+
+    def connect(self):
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        self.connects += 1
+
+    def send(self, method, path, body):
+        if self.connection is None:
+            self.connect()
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+        if response.will_close:
+            # Server did not keep the connection alive (e.g. an HTTP/1.0 server)
+            self.connection.close()
+            self.connection = None
+        return response.status
+
+    def run(self):
+        while not self.stop.is_set():
+            name = self.names[self.rng.choice(len(self.names), p=self.weights)]
+            method, path, bodies = self.requests[name]
+            body = bodies[self.rng.integers(len(bodies))]
+            start = time.perf_counter()
+            try:
+                ok = 200 <= self.send(method, path, body) < 300
+            except (OSError, http.client.HTTPException):
+                ok = False
+            elapsed = time.perf_counter() - start
+            if start >= self.record_after:
+                self.latencies[name].append(elapsed)
+                if not ok:
+                    self.errors[name] += 1
+        if self.connection is not None:
+            self.connection.close()
+
+
+def summarize(latencies, errors, seconds):
+    ms = np.array(latencies) * 1000
+    count = len(ms)
+    if count == 0:
+        return {'requests': 0, 'errors': errors, 'error_rate': 0.0, 'throughput_rps': 0.0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        'requests': count,
+        'errors': errors,
+        'error_rate': errors / count,
+        'throughput_rps': count / seconds,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_ms': float(ms.max())
+    }
+
+
+def run(url, concurrency, duration, warmup, mix, history_size, batch_size):
+    parsed = urllib.parse.urlsplit(url)
+    host, port = parsed.hostname, parsed.port or 80
+    requests = build_requests(mix, history_size, batch_size)
+    names = list(mix)
+    weights = np.array([mix[name] for name in names], dtype=float)
+    weights /= weights.sum()
+
+    stop = threading.Event()
+    record_after = time.perf_counter() + warmup
+    workers = [
+        Worker(host, port, requests, names, weights, seed, record_after, stop)
+        for seed in range(concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+    time.sleep(warmup + duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    endpoints = {
+        name: summarize(
+            [t for w in workers for t in w.latencies[name]], sum(w.errors[name] for w in workers), duration
+        )
+        for name in names
+    }
+    overall = summarize(
+        [t for w in workers for name in names for t in w.latencies[name]],
+        sum(sum(w.errors.values()) for w in workers), duration
+    )
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'duration_seconds': duration,
+        'history_size': history_size,
+        'batch_size': batch_size,
+        'connections_opened': sum(w.connects for w in workers),
+        'endpoints': endpoints,
+        'overall': overall
+    }
+
+
+def start_service(server='flask', timeout=60):
+    """Start app.py (or asgi_app.py under uvicorn) on a free port and wait until it has warmed up;
+    returns (process, base url)"""
+    port = free_port()
+    env = dict(os.environ, ML_PORT=str(port), FLASK_ENV='production')
+    command = [sys.executable, 'app.py'] if server == 'flask' else [
+        sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--port', str(port), '--log-level', 'warning'
+    ]
+    proc = subprocess.Popen(
+        command, cwd=SERVICE_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'ML service exited with code {proc.returncode}')
+        try:
+            with urllib.request.urlopen(url + '/api/ml/ready', timeout=1):
+                return proc, url
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError(f'ML service not ready after {timeout}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Closed-loop load generator for the ML service')
+    parser.add_argument('--url', default='http://localhost:5001', help='service base URL')
+    parser.add_argument('--start-service', action='store_true', help='start the service locally on a free port')
+    parser.add_argument('--server', choices=('flask', 'asgi'), default='flask',
+                        help='with --start-service: app.py, or asgi_app.py under uvicorn')
+    parser.add_argument('--concurrency', type=int, default=8, help='clients, one connection each')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds before that')
+    parser.add_argument('--mix', default='', help='endpoint weights, e.g. workout-recommendations=3,insights=1')
+    parser.add_argument('--history-size', type=int, default=50, help='workouts per user history')
+    parser.add_argument('--batch-size', type=int, default=32, help='users per batch request')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    proc = None
+    url = args.url
+    if args.start_service:
+        proc, url = start_service(args.server)
+    try:
+        results = run(url, args.concurrency, args.duration, args.warmup, mix, args.history_size, args.batch_size)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{url}: {args.concurrency} clients, {args.duration:.0f}s, history {args.history_size}, "
+          f"batch {args.batch_size}, {results['connections_opened']} connections opened")
+    print(f"{'endpoint':<32} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'errors':>7}")
+    rows = list(results['endpoints'].items()) + [('overall', results['overall'])]
+    for name, r in rows:
+        if not r['requests']:
+            print(f"{name:<32} {'no requests':>8}")
+            continue
+        print(f"{name:<32} {r['throughput_rps']:>8.1f} {r['p50_ms']:>7.2f}ms {r['p95_ms']:>7.2f}ms "
+              f"{r['p99_ms']:>7.2f}ms {r['max_ms']:>7.1f}ms {r['error_rate']:>6.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark: micro-batching of concurrent single-user predictions.
+
+Trains the fitness classifier and progress forest on synthetic data in a
+throwaway MODEL_PATH, then drives /api/ml/classify-fitness-level and
+/api/ml/progress-prediction on the Flask app (called as WSGI, no sockets)
+from --concurrency closed-loop client threads, once per batching window in
+--wait-ms (0 = batching off). For each run it reports throughput, p50/p99
+latency, the mean batch size and, per request, the mean time spent
+waiting for a batch (queue_wait) vs in the model call (inference), read
+from the service's own phase metrics.
+
+Usage (from ml_service/):
+    python -m benchmarks.micro_batching [--concurrency 1 16] [--wait-ms 0 1 2 5] [--duration 5]
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.suite import fitness_profiles, progress_data, user_history
+
+ENDPOINTS = ('/api/ml/classify-fitness-level', '/api/ml/progress-prediction')
+SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+
+def request_bodies(rng, n=64):
+    fitness = fitness_profiles(n, rng)
+    return {
+        ENDPOINTS[0]: [
+            json.dumps({
+                'age': float(fitness['age'][i]), 'bmi': float(fitness['bmi'][i]),
+                'workouts_per_week': float(fitness['workouts_per_week'][i]),
+                'avg_duration': float(fitness['average_duration'][i]),
+                'max_intensity': float(fitness['max_intensity'][i])
+            }).encode()
+            for i in range(n)
+        ],
+        ENDPOINTS[1]: [
+            json.dumps({'user_data': {}, 'user_history': user_history(int(rng.integers(1, 60)), rng)}).encode()
+            for _ in range(n)
+        ]
+    }
+
+
+def metric_sums():
+    """{(name, labels): value} of the phase and batch size sums and counts"""
+    import metrics
+
+    sums = {}
+    for line in metrics.render().splitlines():
+        match = SAMPLE.match(line)
+        if match and match.group(1) in (
+            'ml_request_phase_seconds_sum', 'ml_request_phase_seconds_count',
+            'ml_micro_batch_size_sum', 'ml_micro_batch_size_count'
+        ):
+            sums[match.group(1), match.group(2)] = float(match.group(3))
+    return sums
+
+
+def delta(before, after, name, labels):
+    key = (name, labels)
+    return after.get(key, 0.0) - before.get(key, 0.0)
+
+
+def run_clients(bodies, concurrency, duration, warmup):
+    from app import app
+    from asgi_app import call_wsgi
+    from benchmarks.async_serving import request_scope
+
+    stop = threading.Event()
+    record_after = time.perf_counter() + warmup
+    latencies = {path: [] for path in ENDPOINTS}
+
+    def client(seed):
+        rng = np.random.default_rng(seed)
+        while not stop.is_set():
+            path = ENDPOINTS[rng.integers(len(ENDPOINTS))]
+            body = bodies[path][rng.integers(len(bodies[path]))]
+            start = time.perf_counter()
+            call_wsgi(app, request_scope(path), body)
+            if start >= record_after:
+                latencies[path].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(seed,), daemon=True) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    before = metric_sums()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, before, metric_sums()
+
+
+def run(concurrencies, waits_ms, duration, warmup, rows):
+    root = tempfile.mkdtemp(prefix='ml-micro-batching-')
+    os.environ['MODEL_PATH'] = os.path.join(root, 'models')
+    os.environ['DATA_PATH'] = os.path.join(root, 'data')
+    os.environ['FEATURE_STORE_PATH'] = os.path.join(root, 'data', 'feature_store.db')
+    os.environ['PROFILE_REQUESTS'] = 'false'
+    os.environ['PROFILE_SAMPLE_EVERY'] = '0'
+    try:
+        import app
+        from ml_models import MLModels
+
+        rng = np.random.default_rng(0)
+        ml_models = MLModels()
+        ml_models.train_fitness_classifier(fitness_profiles(rows, rng))
+        ml_models.train_progress_prediction_model(progress_data(rows, rng))
+        bodies = request_bodies(rng)
+
+        results = []
+        for concurrency in concurrencies:
+            for wait_ms in waits_ms:
+                for batcher in (app.fitness_batcher, app.progress_batcher):
+                    batcher.max_wait = wait_ms / 1000
+                latencies, before, after = run_clients(bodies, concurrency, duration, warmup)
+                for path, batcher in zip(ENDPOINTS, (app.fitness_batcher, app.progress_batcher)):
+                    ms = np.array(latencies[path]) * 1000
+                    requests = delta(before, after, 'ml_request_phase_seconds_count', f'route="{path}",phase="inference"')
+                    batches = delta(before, after, 'ml_micro_batch_size_count', f'model="{batcher.name}"')
+                    per_request = {
+                        phase: delta(before, after, 'ml_request_phase_seconds_sum', f'route="{path}",phase="{phase}"')
+                        / max(requests, 1) * 1000
+                        for phase in ('queue_wait', 'inference')
+                    }
+                    results.append({
+                        'endpoint': path,
+                        'concurrency': concurrency,
+                        'wait_ms': wait_ms,
+                        'throughput_rps': len(ms) / duration,
+                        'p50_ms': float(np.percentile(ms, 50)) if len(ms) else None,
+                        'p99_ms': float(np.percentile(ms, 99)) if len(ms) else None,
+                        'mean_batch': delta(before, after, 'ml_micro_batch_size_sum', f'model="{batcher.name}"')
+                        / batches if batches else 1.0,
+                        'queue_wait_ms': per_request['queue_wait'],
+                        'inference_ms': per_request['inference']
+                    })
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-batching of concurrent single-user predictions')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16], help='client threads')
+    parser.add_argument('--wait-ms', type=float, nargs='+', default=[0, 1, 2, 5], help='batching windows; 0 = off')
+    parser.add_argument('--duration', type=float, default=5, help='measured seconds per run')
+    parser.add_argument('--warmup', type=float, default=1, help='unmeasured seconds before that')
+    parser.add_argument('--rows', type=int, default=20000, help='training rows for the forests')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.concurrency, args.wait_ms, args.duration, args.warmup, args.rows)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'endpoint':<32} {'clients':>7} {'wait':>6} {'req/s':>8} {'p50':>9} {'p99':>9} "
+          f"{'batch':>6} {'queue_wait':>10} {'inference':>10}")
+    for r in results:
+        print(f"{r['endpoint']:<32} {r['concurrency']:>7} {r['wait_ms']:>4.0f}ms {r['throughput_rps']:>8.1f} "
+              f"{r['p50_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms {r['mean_batch']:>6.1f} "
+              f"{r['queue_wait_ms']:>8.2f}ms {r['inference_ms']:>8.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: request/response codecs and request shapes for large histories.
+
+Posts one user's workout history to /api/ml/workout-recommendations through
+the Flask test client (JSON parsing, feature extraction, response encoding
+included) in four ways:
+
+  * json      - the json module, history as an array of workout objects
+  * orjson    - orjson, same array of objects
+  * columnar  - orjson, history as parallel arrays ({"type": [...], ...})
+  * msgpack   - MessagePack request and response, columnar history
+
+and checks that all four return the same recommendations. Reports p50
+latency per history size and the request body size.
+
+Usage (from ml_service/):
+    python -m benchmarks.payload_codecs [--sizes 100 1000 10000]
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+import serialization
+from benchmarks.suite import workout_history
+
+PROFILE = {'fitness_level': 'Intermediate', 'goal': 'Weight Loss'}
+URL = '/api/ml/workout-recommendations'
+
+
+def p50_ms(func, repeats):
+    func()
+    latencies = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        func()
+        latencies[i] = time.perf_counter() - start
+    return np.percentile(latencies, 50) * 1000
+
+
+def variants(history):
+    columns = {key: [workout[key] for workout in history] for key in history[0]}
+    rows_body = {'user_data': PROFILE, 'user_history': history}
+    columnar_body = {'user_data': PROFILE, 'user_history': columns}
+    json_headers = {'Content-Type': 'application/json'}
+    variants = {
+        'json': (False, json.dumps(rows_body).encode(), json_headers),
+        'orjson': (True, json.dumps(rows_body).encode(), json_headers),
+        'columnar': (True, json.dumps(columnar_body).encode(), json_headers)
+    }
+    if serialization.msgpack is not None:
+        variants['msgpack'] = (True, serialization.msgpack.packb(columnar_body), {
+            'Content-Type': 'application/msgpack', 'Accept': 'application/msgpack'
+        })
+    return variants
+
+
+def decode(response):
+    if response.mimetype in serialization.MSGPACK_MIMETYPES:
+        return serialization.msgpack.unpackb(response.get_data(), raw=False)
+    return json.loads(response.get_data())
+
+
+def run(sizes, repeats):
+    from app import app
+
+    client = app.test_client()
+    orjson = serialization.orjson
+    results = []
+    for size in sizes:
+        history = workout_history(size, np.random.default_rng(size))
+        outputs = {}
+        for name, (use_orjson, body, headers) in variants(history).items():
+            # Without orjson the provider falls back to the json module
+            serialization.orjson = orjson if use_orjson else None
+            post = lambda: client.post(URL, data=body, headers=headers)
+            outputs[name] = decode(post())
+            results.append({
+                'history': size,
+                'codec': name,
+                'request_bytes': len(body),
+                'p50_ms': p50_ms(post, repeats)
+            })
+        serialization.orjson = orjson
+
+        reference = outputs['json']
+        for name, output in outputs.items():
+            if output != reference:
+                raise AssertionError(f'{name} response differs from json for history {size}')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Request codec and request shape benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='workouts per history')
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    if serialization.orjson is None:
+        print('orjson is not installed; the orjson variants measure the json module', file=sys.stderr)
+    results = run(args.sizes, args.repeats)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"POST {URL}, p50 per request")
+    print(f"{'history':>8} {'codec':<10} {'body':>10} {'p50':>10} {'vs json':>8}")
+    baseline = {}
+    for r in results:
+        baseline.setdefault(r['history'], r['p50_ms'])
+        print(f"{r['history']:>8} {r['codec']:<10} {r['request_bytes'] / 1024:>8.1f}KB {r['p50_ms']:>8.2f}ms "
+              f"{baseline[r['history']] / r['p50_ms']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
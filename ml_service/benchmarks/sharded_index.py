@@ -0,0 +1,108 @@
+"""
+Benchmark: sharded scatter-gather workout similarity index.
+
+Builds a ShardedIndex over synthetic user feature vectors for each shard
+count in --shards, then reports the full build time (--workers build
+processes), the time to rebuild after one user changed (one shard), the
+size of the largest shard, recall@k against one exact index over all users
+and p50/p99 single-row query latency with the shards loaded in-process and,
+with --processes, in one worker process per shard.
+
+Usage (from ml_service/):
+    python -m benchmarks.sharded_index [--users 200000] [--shards 1 2 4 8] [--workers 4] [--processes]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+from benchmarks.ann_index import recall, timed_queries
+from benchmarks.feature_extraction import generate_table
+from ml_models import MLModels
+from sharded_index import ShardedIndex
+
+
+def run(n_users, n_queries, k, shard_counts, workers, mode, processes):
+    user_ids, features = MLModels().extract_workout_features_bulk(
+        generate_table(n_users, 8), user_ids=np.arange(n_users)
+    )
+    rng = np.random.default_rng(1)
+    queries = features[rng.choice(n_users, n_queries, replace=False)]
+    queries = queries + rng.normal(0, 1, queries.shape)
+    exact = NearestNeighbors(n_neighbors=k, algorithm='ball_tree').fit(features)
+    exact_neighbours = exact.kneighbors(queries, return_distance=False)
+
+    root = tempfile.mkdtemp(prefix='ml-sharded-index-')
+    features_path = os.path.join(root, 'features.npy')
+    np.save(features_path, features)
+    user_ids = list(user_ids)
+    results = []
+    try:
+        for n_shards in shard_counts:
+            directory = os.path.join(root, str(n_shards))
+            os.makedirs(directory)
+            start = time.perf_counter()
+            index = ShardedIndex.build(directory, user_ids, features_path, n_shards, mode, k, workers)
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index = ShardedIndex.build(
+                directory, user_ids, features_path, n_shards, mode, k, workers, previous=index, changed_rows=[0]
+            )
+            rebuild = time.perf_counter() - start
+
+            placements = [('in-process', False)] + ([('processes', True)] if processes else [])
+            for placement, use_processes in placements:
+                index.attach(directory, use_processes)
+                neighbours, latency = timed_queries(index, queries, k)
+                results.append({
+                    'shards': n_shards,
+                    'placement': placement,
+                    'build_seconds': build,
+                    'rebuild_one_seconds': rebuild,
+                    'largest_shard': max(index.sizes_),
+                    f'recall@{k}': recall(neighbours, exact_neighbours),
+                    'p50_ms': np.percentile(latency, 50) * 1000,
+                    'p99_ms': np.percentile(latency, 99) * 1000
+                })
+                index.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded workout similarity index benchmark')
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help='build processes')
+    parser.add_argument('--mode', default='exact', choices=['exact', 'ivf'], help='index inside each shard')
+    parser.add_argument('--processes', action='store_true', help='also query with one worker process per shard')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.users, args.queries, args.k, args.shards, args.workers, args.mode, args.processes)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.users} users, {args.queries} single-row queries, {args.mode} shards, "
+          f"{args.workers} build workers, {os.cpu_count()} CPUs")
+    print(f"{'shards':>6} {'placement':<10} {'build':>8} {'rebuild 1':>9} {'largest':>8} "
+          f"{f'recall@{args.k}':>9} {'p50':>9} {'p99':>9}")
+    for r in results:
+        print(f"{r['shards']:>6} {r['placement']:<10} {r['build_seconds']:>7.2f}s {r['rebuild_one_seconds']:>8.2f}s "
+              f"{r['largest_shard']:>8} {r[f'recall@{args.k}']:>9.3f} {r['p50_ms']:>7.3f}ms {r['p99_ms']:>7.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
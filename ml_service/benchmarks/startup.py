@@ -0,0 +1,173 @@
+"""
+Cold-start benchmark for the ML service.
+
+Measures, in fresh interpreters:
+  * import time and peak RSS of ``import app``
+  * heavy modules (TensorFlow, pandas, sklearn) pulled in by that import
+  * time from process spawn to the first successful /api/ml/health response
+  * time from process spawn to /api/ml/ready (warm-up finished), and the
+    warm-up time the service reports
+
+Exits non-zero if any budget from config.py is exceeded.
+
+Usage (from ml_service/):
+    python -m benchmarks.startup [--runs 3] [--json]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from config import (
+    STARTUP_IMPORT_BUDGET_SECONDS,
+    STARTUP_HEALTHY_BUDGET_SECONDS,
+    STARTUP_RSS_BUDGET_MB,
+    STARTUP_FORBIDDEN_MODULES
+)
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+try:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss_kb / (1024 * 1024) if sys.platform == 'darwin' else rss_kb / 1024
+except ImportError:
+    rss_mb = None
+heavy = sorted(m for m in %r if m in sys.modules)
+print(json.dumps({'import_seconds': elapsed, 'rss_mb': rss_mb, 'heavy_modules': heavy}))
+"""
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def measure_import():
+    probe = IMPORT_PROBE % (list(STARTUP_FORBIDDEN_MODULES),)
+    output = subprocess.check_output([sys.executable, '-c', probe], cwd=SERVICE_DIR)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def read_rss_mb(pid):
+    """Current RSS of a running process (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def wait_for(proc, url, start, timeout):
+    """Seconds since ``start`` until ``url`` answers 200"""
+    while time.perf_counter() - start < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f'ML service exited with code {proc.returncode}')
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError(f'No 200 from {url} after {timeout}s')
+
+
+def measure_time_to_healthy(timeout=60):
+    port = free_port()
+    env = dict(os.environ, ML_PORT=str(port), FLASK_ENV='production')
+    url = f'http://127.0.0.1:{port}/api/ml'
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, 'app.py'], cwd=SERVICE_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        healthy_seconds = wait_for(proc, url + '/health', start, timeout)
+        ready_seconds = wait_for(proc, url + '/ready', start, timeout)
+        with urllib.request.urlopen(url + '/ready', timeout=1) as response:
+            warmup_ms = json.loads(response.read())['warmup_ms']
+        return {
+            'healthy_seconds': healthy_seconds,
+            'ready_seconds': ready_seconds,
+            'warmup_seconds': warmup_ms / 1000 if warmup_ms is not None else None,
+            'server_rss_mb': read_rss_mb(proc.pid)
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run(runs):
+    imports = [measure_import() for _ in range(runs)]
+    boots = [measure_time_to_healthy() for _ in range(runs)]
+
+    rss_values = [r['rss_mb'] for r in imports if r['rss_mb'] is not None]
+    results = {
+        'runs': runs,
+        'import_seconds': min(r['import_seconds'] for r in imports),
+        'import_rss_mb': max(rss_values) if rss_values else None,
+        'heavy_modules': sorted({m for r in imports for m in r['heavy_modules']}),
+        'healthy_seconds': min(b['healthy_seconds'] for b in boots),
+        'ready_seconds': min(b['ready_seconds'] for b in boots),
+        'warmup_seconds': boots[-1]['warmup_seconds'],
+        'server_rss_mb': boots[-1]['server_rss_mb']
+    }
+
+    failures = []
+    if results['import_seconds'] > STARTUP_IMPORT_BUDGET_SECONDS:
+        failures.append(f"import took {results['import_seconds']:.3f}s (budget {STARTUP_IMPORT_BUDGET_SECONDS}s)")
+    if results['healthy_seconds'] > STARTUP_HEALTHY_BUDGET_SECONDS:
+        failures.append(f"first healthy response after {results['healthy_seconds']:.3f}s (budget {STARTUP_HEALTHY_BUDGET_SECONDS}s)")
+    if results['import_rss_mb'] is not None and results['import_rss_mb'] > STARTUP_RSS_BUDGET_MB:
+        failures.append(f"RSS after import {results['import_rss_mb']:.1f}MB (budget {STARTUP_RSS_BUDGET_MB}MB)")
+    if results['heavy_modules']:
+        failures.append(f"heavy modules imported at startup: {', '.join(results['heavy_modules'])}")
+    results['failures'] = failures
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ML service cold-start benchmark')
+    parser.add_argument('--runs', type=int, default=3, help='fresh processes per measurement (best run is reported)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"import app:            {results['import_seconds'] * 1000:8.1f} ms")
+        if results['import_rss_mb'] is not None:
+            print(f"RSS after import:      {results['import_rss_mb']:8.1f} MB")
+        print(f"first healthy reply:   {results['healthy_seconds'] * 1000:8.1f} ms")
+        print(f"ready (warmed up):     {results['ready_seconds'] * 1000:8.1f} ms")
+        if results['warmup_seconds'] is not None:
+            print(f"  of which warm-up:    {results['warmup_seconds'] * 1000:8.1f} ms")
+        if results['server_rss_mb'] is not None:
+            print(f"server RSS when ready: {results['server_rss_mb']:8.1f} MB")
+        for failure in results['failures']:
+            print(f"BUDGET EXCEEDED: {failure}")
+        if not results['failures']:
+            print('All startup budgets met')
+
+    sys.exit(1 if results['failures'] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+"""
+Benchmark suite: every MLModels training and inference method, in-process.
+
+Runs against a throwaway MODEL_PATH/DATA_PATH, in three groups:
+
+  * train - every train_* method (and train_from_file on NDJSON) at several
+            training set sizes
+  * model - feature extraction and every inference method on models trained
+            at a fixed reference size, at several history / batch sizes
+  * http  - the Flask endpoints through the test client (routing, JSON
+            parsing and serialization included)
+
+Each case runs once to warm up, then repeatedly until it has at least
+--min-repeats timings and has used its time budget. Results are written as
+JSON keyed by ``group/case/size``. Given --baseline, every case whose p50 is
+more than --threshold slower than the baseline's (and slower by at least
+--min-delta-ms) is reported and the run exits 1. Baselines only compare
+runs on the same machine; record one with --save-baseline.
+
+Usage (from ml_service/):
+    python -m benchmarks.suite [--quick] [--output results.json]
+    python -m benchmarks.suite --save-baseline
+    python -m benchmarks.suite --baseline benchmarks/baseline.json [--threshold 0.2]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+FITNESS_LEVELS = np.array(['Beginner', 'Intermediate', 'Advanced', 'Elite'], dtype=object)
+
+# Sizes per case family; --quick uses the second set
+SIZES = {
+    'train_rows': ([1000, 10000], [500, 2000]),
+    'train_users': ([2000, 20000], [500, 2000]),
+    'history': ([10, 100, 1000], [10, 100]),
+    'batch': ([1, 64, 512], [1, 64])
+}
+REFERENCE_ROWS = (20000, 2000)  # training rows / users behind the inference cases
+
+
+# ============ SYNTHETIC DATA ============
+
+def progress_data(n_rows, rng):
+    return {
+        'days_elapsed': rng.integers(1, 365, n_rows).astype(float),
+        'workouts_completed': rng.integers(0, 200, n_rows).astype(float),
+        'calories_burned': rng.uniform(0, 80000, n_rows),
+        'nutrition_compliance': rng.uniform(0, 1, n_rows),
+        'sleep_hours': rng.uniform(4, 10, n_rows),
+        'water_intake': rng.uniform(1, 4, n_rows),
+        'protein_intake': rng.uniform(40, 200, n_rows),
+        'exercise_variety': rng.integers(1, 7, n_rows).astype(float),
+        'workout_intensity': rng.integers(1, 11, n_rows).astype(float),
+        'rest_days': rng.integers(0, 4, n_rows).astype(float),
+        'weight_change': rng.normal(0, 3, n_rows)
+    }
+
+
+def fitness_profiles(n_rows, rng):
+    return {
+        'age': rng.integers(16, 80, n_rows).astype(float),
+        'bmi': rng.uniform(16, 40, n_rows),
+        'workouts_per_week': rng.integers(0, 8, n_rows).astype(float),
+        'average_duration': rng.uniform(10, 90, n_rows),
+        'max_intensity': rng.integers(1, 11, n_rows).astype(float),
+        'fitness_level': FITNESS_LEVELS[rng.integers(0, 4, n_rows)]
+    }
+
+
+def users_with_workouts(table):
+    from benchmarks.feature_extraction import user_workouts
+
+    n_users = int(table['user_id'][-1]) + 1
+    starts = np.searchsorted(table['user_id'], np.arange(n_users + 1))
+    return [{'user_id': user, 'workouts': user_workouts(table, starts, user)} for user in range(n_users)]
+
+
+def workout_history(n_workouts, rng):
+    from benchmarks.feature_extraction import WORKOUT_TYPES
+
+    days = np.sort(rng.integers(0, 365, n_workouts))
+    return [
+        {
+            'type': WORKOUT_TYPES[rng.integers(0, len(WORKOUT_TYPES))],
+            'duration': int(rng.integers(10, 91)),
+            'calories_burned': round(float(rng.uniform(50, 900)), 1),
+            'date': str(np.datetime64('2024-01-01') + int(day))
+        }
+        for day in days
+    ]
+
+
+def user_history(n_workouts, rng):
+    return {
+        'workout_history': workout_history(n_workouts, rng),
+        'nutrition_history': [{'calories': 2000, 'protein': 120}] * min(n_workouts, 30),
+        'nutrition_compliance': 0.8
+    }
+
+
+def batch_users(n_users, rng):
+    profiles = fitness_profiles(n_users, rng)
+    progress = progress_data(n_users, rng)
+    return [
+        {
+            'age': profiles['age'][i], 'bmi': profiles['bmi'][i],
+            'workouts_per_week': profiles['workouts_per_week'][i],
+            'avg_duration': profiles['average_duration'][i], 'max_intensity': profiles['max_intensity'][i],
+            'days_elapsed': progress['days_elapsed'][i], 'workouts_completed': progress['workouts_completed'][i],
+            'calories_burned': progress['calories_burned'][i],
+            'nutrition_compliance': progress['nutrition_compliance'][i],
+            'weight': 50 + profiles['bmi'][i] * 1.5, 'height': 170, 'fitness_level': 'Intermediate',
+            'goal': 'Weight Loss'
+        }
+        for i in range(n_users)
+    ]
+
+
+def write_ndjson(path, columns):
+    names = list(columns)
+    with open(path, 'w') as f:
+        for row in zip(*(columns[name].tolist() for name in names)):
+            f.write(json.dumps(dict(zip(names, row))) + '\n')
+
+
+# ============ CASES ============
+
+def train_cases(ml_models, quick, rng, work_dir):
+    """(name, size, callable) for every training method"""
+    from benchmarks.feature_extraction import generate_table
+
+    for rows in SIZES['train_rows'][quick]:
+        progress = progress_data(rows, rng)
+        profiles = fitness_profiles(rows, rng)
+        path = os.path.join(work_dir, f'progress_{rows}.ndjson')
+        write_ndjson(path, progress)
+
+        yield 'train_progress_prediction_model', rows, lambda d=progress: ml_models.train_progress_prediction_model(d)
+        yield 'train_fitness_classifier', rows, lambda d=profiles: ml_models.train_fitness_classifier(d)
+        yield 'train_from_file', rows, lambda p=path: ml_models.train_from_file(
+            'train_progress_prediction_model', 'historical_progress_data', p
+        )
+        if importlib.util.find_spec('tensorflow') is not None:
+            yield 'train_progress_neural_network', rows, lambda d=progress: ml_models.train_progress_neural_network(d)
+        else:
+            yield 'train_progress_neural_network', rows, None
+
+    for users in SIZES['train_users'][quick]:
+        table = generate_table(users, 8)
+        nested = users_with_workouts(table)
+        yield 'train_workout_recommendation_model', users, lambda u=nested: ml_models.train_workout_recommendation_model(u)
+        yield 'train_workout_recommendation_model_from_table', users, \
+            lambda t=table: ml_models.train_workout_recommendation_model_from_table(t)
+
+
+def model_cases(ml_models, quick, rng):
+    """(name, size, callable) for feature extraction and every inference method"""
+    profile = {'fitness_level': 'Intermediate', 'goal': 'Weight Loss', 'weight': 80, 'height': 178, 'age': 34}
+
+    for n_workouts in SIZES['history'][quick]:
+        history = user_history(n_workouts, rng)
+        workouts = history['workout_history']
+        yield 'extract_workout_features', n_workouts, lambda w=workouts: ml_models.extract_workout_features(w)
+        yield 'get_workout_recommendations', n_workouts, lambda w=workouts: ml_models.get_workout_recommendations(profile, w)
+        yield 'predict_progress', n_workouts, lambda h=history: ml_models.predict_progress(profile, h)
+        yield 'get_insights', n_workouts, lambda h=history: ml_models.get_insights(profile, h)
+
+    yield 'classify_fitness_level', 1, lambda: ml_models.classify_fitness_level(34, 25.2, 3, 45, 7)
+    yield 'get_nutrition_recommendations', 1, lambda: ml_models.get_nutrition_recommendations(profile)
+    yield 'compute_nutrition_recommendations', 1, lambda: ml_models.compute_nutrition_recommendations(
+        80, 178, 34, 'Intermediate', 'Weight Loss'
+    )
+
+    for n_users in SIZES['batch'][quick]:
+        users = batch_users(n_users, rng)
+        yield 'classify_fitness_level_batch', n_users, lambda u=users: ml_models.classify_fitness_level_batch(u)
+        yield 'predict_progress_batch', n_users, lambda u=users: ml_models.predict_progress_batch(u)
+        yield 'get_nutrition_recommendations_batch', n_users, \
+            lambda u=users: ml_models.get_nutrition_recommendations_batch(u)
+
+
+def http_cases(client, quick, rng):
+    """(name, size, callable) for the Flask endpoints"""
+    profile = {'fitness_level': 'Intermediate', 'goal': 'Weight Loss', 'weight': 80, 'height': 178, 'age': 34}
+
+    def post(url, body):
+        def call():
+            response = client.post(url, json=body)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        return call
+
+    yield 'GET /api/ml/health', 1, lambda: client.get('/api/ml/health')
+    yield 'POST /api/ml/nutrition-recommendations', 1, post('/api/ml/nutrition-recommendations', {'user_data': profile})
+    yield 'POST /api/ml/classify-fitness-level', 1, post('/api/ml/classify-fitness-level', {
+        'age': 34, 'bmi': 25.2, 'workouts_per_week': 3, 'avg_duration': 45, 'max_intensity': 7
+    })
+
+    for n_workouts in SIZES['history'][quick]:
+        history = user_history(n_workouts, rng)
+        yield 'POST /api/ml/workout-recommendations', n_workouts, post(
+            '/api/ml/workout-recommendations', {'user_data': profile, 'user_history': history['workout_history']}
+        )
+        yield 'POST /api/ml/progress-prediction', n_workouts, post(
+            '/api/ml/progress-prediction', {'user_data': profile, 'user_history': history}
+        )
+        yield 'POST /api/ml/insights', n_workouts, post(
+            '/api/ml/insights', {'user_data': profile, 'user_history': history}
+        )
+
+    for n_users in SIZES['batch'][quick]:
+        users = json.loads(json.dumps(batch_users(n_users, rng)))
+        for url in ('/api/ml/classify-fitness-level/batch', '/api/ml/progress-prediction/batch',
+                    '/api/ml/nutrition-recommendations/batch'):
+            yield f'POST {url}', n_users, post(url, {'users': users})
+
+
+# ============ RUNNER ============
+
+def measure(func, min_repeats, budget_seconds):
+    """Warm up once, then time func until min_repeats and the time budget are both used"""
+    func()
+    timings = []
+    deadline = time.perf_counter() + budget_seconds
+    while len(timings) < min_repeats or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+        if len(timings) >= 10000:
+            break
+    ms = np.array(timings) * 1000
+    return {
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'mean_ms': float(ms.mean()),
+        'min_ms': float(ms.min()),
+        'repeats': len(ms)
+    }
+
+
+def run_group(group, cases, results, min_repeats, budget_seconds):
+    for name, size, func in cases:
+        key = f'{group}/{name}/{size}'
+        if func is None:
+            results[key] = {'skipped': 'dependency not installed'}
+        else:
+            results[key] = measure(func, min_repeats, budget_seconds)
+        print(f'{key:<70} {format_result(results[key])}', file=sys.stderr)
+
+
+def format_result(result):
+    if 'skipped' in result:
+        return f"skipped ({result['skipped']})"
+    return f"p50 {result['p50_ms']:>10.3f}ms  p95 {result['p95_ms']:>10.3f}ms  n={result['repeats']}"
+
+
+def run(quick, min_repeats, budget_seconds, train_budget_seconds):
+    root = tempfile.mkdtemp(prefix='ml-benchmarks-')
+    os.environ['MODEL_PATH'] = os.path.join(root, 'models')
+    os.environ['DATA_PATH'] = os.path.join(root, 'data')
+    os.environ['PROFILE_REQUESTS'] = 'false'
+    os.environ['PROFILE_SAMPLE_EVERY'] = '0'
+    try:
+        from benchmarks.feature_extraction import generate_table
+        from ml_models import MLModels
+
+        rng = np.random.default_rng(0)
+        ml_models = MLModels()
+        results = {}
+
+        # Training cases are slow; a couple of repeats is enough
+        run_group('train', train_cases(ml_models, quick, rng, root), results, min(min_repeats, 3), train_budget_seconds)
+
+        # Inference runs against models trained at one reference size
+        reference = REFERENCE_ROWS[quick]
+        ml_models.train_progress_prediction_model(progress_data(reference, rng))
+        ml_models.train_fitness_classifier(fitness_profiles(reference, rng))
+        ml_models.train_workout_recommendation_model_from_table(generate_table(reference, 8))
+        run_group('model', model_cases(ml_models, quick, rng), results, min_repeats, budget_seconds)
+
+        from app import app
+        run_group('http', http_cases(app.test_client(), quick, rng), results, min_repeats, budget_seconds)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpus': os.cpu_count(),
+            'quick': quick,
+            'reference_rows': REFERENCE_ROWS[quick],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Cases whose p50 regressed against the baseline: [(key, baseline_ms, current_ms)]"""
+    regressions = []
+    for key, result in results['results'].items():
+        previous = baseline['results'].get(key)
+        if not previous or 'p50_ms' not in previous or 'p50_ms' not in result:
+            continue
+        before, after = previous['p50_ms'], result['p50_ms']
+        if after > before * (1 + threshold) and after - before >= min_delta_ms:
+            regressions.append((key, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MLModels benchmark suite')
+    parser.add_argument('--quick', action='store_true', help='smaller sizes and budgets (smoke test)')
+    parser.add_argument('--min-repeats', type=int, default=20)
+    parser.add_argument('--budget', type=float, default=None, help='seconds per inference case (default 1, quick 0.2)')
+    parser.add_argument('--train-budget', type=float, default=None, help='seconds per training case (default 5, quick 0)')
+    parser.add_argument('--output', help='write results JSON to this file (default stdout)')
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, help='also write results as the baseline')
+    parser.add_argument('--baseline', help='compare against this results file; exit 1 on regression')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p50 slowdown (0.2 = 20%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help='ignore smaller absolute slowdowns')
+    args = parser.parse_args()
+
+    quick = int(args.quick)
+    budget = args.budget if args.budget is not None else (0.2 if quick else 1.0)
+    train_budget = args.train_budget if args.train_budget is not None else (0.0 if quick else 5.0)
+    results = run(quick, args.min_repeats, budget, train_budget)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(text + '\n')
+        print(f'Baseline written to {args.save_baseline}', file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('quick') != results['meta']['quick']:
+            print('Warning: baseline and this run used different --quick settings', file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for key, before, after in regressions:
+            print(f'REGRESSION {key}: {before:.3f}ms -> {after:.3f}ms ({after / before - 1:+.0%})', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions against {args.baseline}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark: memory of N serving workers with private vs memory-mapped models.
+
+Trains the progress, fitness and workout models on synthetic data, then
+starts 1/4/8 worker processes per mode. Each worker loads every artifact
+through ModelRegistry, scores single rows (the serving pattern), reads
+every loaded array so all model pages are resident, and reports its memory
+while all workers are alive:
+
+  * pickle - sklearn forests unpickled into each worker (no compiled forest
+             files, MODEL_MMAP_MODE empty)
+  * mmap   - compiled forest arrays and other artifact arrays memory-mapped
+             read-only (MODEL_MMAP_MODE=r)
+
+RSS counts shared pages once per process, so the sum of RSS over-states
+what mmap workers use; PSS splits each shared page between the processes
+mapping it, so the PSS sum is the real footprint. Linux only (/proc).
+
+Usage (from ml_service/):
+    python -m benchmarks.worker_memory [--workers 1 4 8] [--rows 20000] [--users 200000]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+def proc_memory_mb():
+    """(RSS, PSS) of the current process in MB"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[-1] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields['Rss'] / 1024, fields['Pss'] / 1024
+
+
+def touch_arrays(obj):
+    """Read every array reachable from a loaded artifact so its pages are resident"""
+    arrays = [v for v in vars(obj).values() if isinstance(v, np.ndarray)] if hasattr(obj, '__dict__') else []
+    tree = getattr(obj, '_tree', None)
+    if tree is not None and hasattr(tree, 'get_arrays'):
+        arrays.extend(np.asarray(a) for a in tree.get_arrays())
+    for array in arrays:
+        if array.dtype != object:
+            array.view(np.uint8).sum()
+
+
+def worker(queries, barrier, results):
+    from ml_models import MLModels
+
+    ml_models = MLModels()
+    for row in queries.tolist():
+        ml_models.classify_fitness_level(*row)
+        ml_models.predict_progress({}, {'workout_history': [{'calories_burned': row[3] * 10}] * int(row[2]),
+                                        'nutrition_compliance': row[4] / 10})
+    ml_models.get_workout_recommendations({'fitness_level': 'Beginner'}, {'workout_history': []})
+    for entry in list(ml_models.registry._entries.values()):
+        for obj in entry.obj if isinstance(entry.obj, tuple) else (entry.obj,):
+            if obj is not None:
+                touch_arrays(obj)
+
+    barrier.wait()
+    results.put(proc_memory_mb())
+    barrier.wait()
+
+
+def measure(model_path, mmap_mode, n_workers, queries):
+    os.environ['MODEL_PATH'] = model_path
+    os.environ['MODEL_MMAP_MODE'] = mmap_mode
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(n_workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(queries, barrier, results)) for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+    # A worker that dies never reports; don't wait on it forever
+    memory = [results.get(timeout=600) for _ in processes]
+    for process in processes:
+        process.join()
+    rss, pss = np.array(memory).T
+    return {
+        'rss_per_worker_mb': rss.mean(),
+        'rss_total_mb': rss.sum(),
+        'pss_total_mb': pss.sum()
+    }
+
+
+def train(model_path, n_rows, n_users):
+    os.environ['MODEL_PATH'] = model_path
+    from benchmarks.feature_extraction import generate_table
+    from ml_models import MLModels
+
+    rng = np.random.default_rng(0)
+    ml_models = MLModels()
+    ml_models.train_progress_prediction_model({
+        'days_elapsed': rng.integers(1, 365, n_rows).astype(float),
+        'workouts_completed': rng.integers(0, 200, n_rows).astype(float),
+        'calories_burned': rng.uniform(0, 80000, n_rows),
+        'nutrition_compliance': rng.uniform(0, 1, n_rows),
+        'weight_change': rng.normal(0, 3, n_rows)
+    })
+    ml_models.train_fitness_classifier({
+        'age': rng.integers(16, 80, n_rows).astype(float),
+        'bmi': rng.uniform(16, 40, n_rows),
+        'workouts_per_week': rng.integers(0, 8, n_rows).astype(float),
+        'average_duration': rng.uniform(10, 90, n_rows),
+        'max_intensity': rng.integers(1, 11, n_rows).astype(float),
+        'fitness_level': np.array(['Beginner', 'Intermediate', 'Advanced', 'Elite'], dtype=object)[rng.integers(0, 4, n_rows)]
+    })
+    ml_models.train_workout_recommendation_model_from_table(generate_table(n_users, 8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serving worker memory benchmark')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--rows', type=int, default=20000, help='training rows for the forests')
+    parser.add_argument('--users', type=int, default=200000, help='users in the workout index')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='worker-memory-')
+    try:
+        mmap_path = os.path.join(root, 'mmap')
+        pickle_path = os.path.join(root, 'pickle')
+        os.makedirs(mmap_path)
+        train(mmap_path, args.rows, args.users)
+        shutil.copytree(mmap_path, pickle_path, ignore=shutil.ignore_patterns('*_forest.pkl'))
+
+        rng = np.random.default_rng(1)
+        queries = np.column_stack([
+            rng.integers(16, 80, 500), rng.uniform(16, 40, 500), rng.integers(0, 8, 500),
+            rng.uniform(10, 90, 500), rng.integers(1, 11, 500)
+        ]).astype(float)
+
+        results = []
+        for mode, model_path, mmap_mode in (('pickle', pickle_path, ''), ('mmap', mmap_path, 'r')):
+            for n_workers in args.workers:
+                results.append(dict(mode=mode, workers=n_workers, **measure(model_path, mmap_mode, n_workers, queries)))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.rows} training rows per forest, {args.users} users in the workout index")
+    print(f"{'mode':<8} {'workers':>7} {'RSS/worker':>11} {'RSS total':>10} {'PSS total':>10}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['workers']:>7} {r['rss_per_worker_mb']:>9.0f}MB "
+              f"{r['rss_total_mb']:>8.0f}MB {r['pss_total_mb']:>8.0f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,10 @@ DB_NAME = os.getenv('DB_NAME', 'fitsphereaai')
 # ML Model Configuration
 MODEL_PATH = os.getenv('MODEL_PATH', './models/')
 DATA_PATH = os.getenv('DATA_PATH', './data/')
+UPLOAD_PATH = os.path.join(DATA_PATH, 'uploads')  # spooled NDJSON training uploads
+INGEST_CHUNK_BYTES = int(os.getenv('INGEST_CHUNK_BYTES', 1 << 20))  # NDJSON read size
+MODEL_RELOAD_CHECK_INTERVAL = float(os.getenv('MODEL_RELOAD_CHECK_INTERVAL', 5))  # seconds between mtime checks
+FEATURE_STORE_PATH = os.getenv('FEATURE_STORE_PATH', os.path.join(DATA_PATH, 'feature_store.sqlite3'))  # per-user histories
 
 # Model Parameters
 WORKOUT_RECOMMENDATION_MODEL = 'workout_recommendation_model.pkl'
@@ -24,6 +28,54 @@ NUTRITION_RECOMMENDATION_MODEL = 'nutrition_recommendation_model.pkl'
 PROGRESS_PREDICTION_MODEL = 'progress_prediction_model.pkl'
 FITNESS_CLASSIFIER_MODEL = 'fitness_classifier_model.pkl'
 PROGRESS_NEURAL_NETWORK = 'progress_neural_network.h5'
+PROGRESS_NN_WEIGHTS = 'progress_nn_weights.npz'  # TensorFlow-free export of the network + scaler
+
+# Forests compiled into plain node arrays (forest_arrays.py) for serving
+PROGRESS_PREDICTION_FOREST = 'progress_prediction_forest.pkl'
+FITNESS_CLASSIFIER_FOREST = 'fitness_classifier_forest.pkl'
+# 'r' loads artifact arrays memory-mapped and read-only so worker processes
+# share them through the page cache; empty loads a private copy per process
+MODEL_MMAP_MODE = os.getenv('MODEL_MMAP_MODE', 'r') or None
+# Up to this many rows are scored with the compiled NumPy forest; larger
+# batches use sklearn's C traversal (and load the pickled forest)
+COMPILED_FOREST_MAX_ROWS = int(os.getenv('COMPILED_FOREST_MAX_ROWS', 64))
+
+# Workout similarity index: 'exact' (ball tree), 'ivf' (approximate, NumPy)
+# or 'sharded' (users hash-partitioned across shard files, scatter-gather queries)
+WORKOUT_INDEX_MODE = os.getenv('WORKOUT_INDEX_MODE', 'exact')
+WORKOUT_NEIGHBORS = 5
+IVF_N_LISTS = int(os.getenv('IVF_N_LISTS', 0))  # cells; 0 = sqrt(n_users)
+IVF_N_PROBE = int(os.getenv('IVF_N_PROBE', 8))  # cells searched per query (recall vs latency)
+WORKOUT_INDEX_SHARDS = int(os.getenv('WORKOUT_INDEX_SHARDS', 4))  # shard files in 'sharded' mode
+WORKOUT_SHARD_INDEX_MODE = os.getenv('WORKOUT_SHARD_INDEX_MODE', 'exact')  # index inside each shard: 'exact' or 'ivf'
+WORKOUT_SHARD_PROCESSES = os.getenv('WORKOUT_SHARD_PROCESSES', 'false').lower() == 'true'  # one worker process per shard
+WORKOUT_SHARD_BUILD_WORKERS = int(os.getenv('WORKOUT_SHARD_BUILD_WORKERS', min(4, os.cpu_count() or 1)))  # build processes
+
+# Incremental workout model updates
+WORKOUT_FEATURES = 'workout_features.npy'  # base feature matrix, rebuilt on compaction
+WORKOUT_UPDATES_LOG = 'workout_updates.log'  # append-only new/changed user vectors
+WORKOUT_COMPACTION_THRESHOLD = int(os.getenv('WORKOUT_COMPACTION_THRESHOLD', 1000))  # pending users
+
+# Workout types flagged in the workout feature vector (features 5-8)
+WORKOUT_FEATURE_TYPES = ('Strength', 'Cardio', 'Flexibility', 'HIIT')
+
+# Neighbour-based workout recommendations (neighbour_recommender.py)
+WORKOUT_RECOMMENDER = 'workout_recommender.pkl'  # per-cluster top workout types
+WORKOUT_TYPE_COUNTS = 'workout_type_counts.pkl'  # sparse user x WORKOUT_CATEGORIES counts, reused on compaction
+RECOMMENDER_CLUSTER_SIZE = int(os.getenv('RECOMMENDER_CLUSTER_SIZE', 50))  # users per cluster
+RECOMMENDER_TOP_K = int(os.getenv('RECOMMENDER_TOP_K', 4))  # workout types kept per cluster
+WORKOUT_RECOMMENDATIONS = 3  # workouts per response
+
+# Artifacts written together by one training run, loaded and swapped as one
+# snapshot (ModelRegistry.get_group). Forest groups list the compiled forest,
+# the sklearn model, the scaler and the label encoder, in that order.
+ARTIFACT_GROUPS = {
+    'workout_recommendation': (WORKOUT_RECOMMENDATION_MODEL, 'user_ids.pkl', WORKOUT_RECOMMENDER),
+    'progress_prediction': (PROGRESS_PREDICTION_FOREST, PROGRESS_PREDICTION_MODEL, 'progress_scaler.pkl'),
+    'fitness_classifier': (
+        FITNESS_CLASSIFIER_FOREST, FITNESS_CLASSIFIER_MODEL, 'fitness_scaler.pkl', 'fitness_label_encoder.pkl'
+    )
+}
 
 # Recommendation Configuration
 MIN_WORKOUT_DATA_POINTS = 5
@@ -31,6 +83,66 @@ MIN_NUTRITION_DATA_POINTS = 3
 
 # Prediction Configuration
 PREDICTION_DAYS_AHEAD = 30  # Forecast 30 days ahead
+INSIGHTS_WINDOW_DAYS = 28  # workouts per week are averaged over this many days
+
+# Background Training
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', min(4, os.cpu_count() or 1)))  # processes per job
+TRAINING_JOB_HISTORY = int(os.getenv('TRAINING_JOB_HISTORY', 50))  # finished jobs kept for status queries
+
+# Async Serving (asgi_app.py)
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', os.cpu_count() or 1))  # preloaded inference processes
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))  # threads for feature store reads and Flask-served routes
+
+# Micro-batching: concurrent single-user fitness/progress predictions wait up to
+# MICRO_BATCH_MAX_WAIT_MS for each other and run as one model call (0 = off)
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', 0))
+MICRO_BATCH_MAX_SIZE = int(os.getenv('MICRO_BATCH_MAX_SIZE', 64))  # flush as soon as this many are waiting
+
+# Batch Inference
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 8192))  # rows per scaler/predict pass
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 200000))  # rows per request
+FITNESS_BATCH_FEATURES = ('age', 'bmi', 'workouts_per_week', 'avg_duration', 'max_intensity')
+FITNESS_BATCH_DEFAULTS = {'age': 30, 'bmi': 24, 'workouts_per_week': 3, 'avg_duration': 30, 'max_intensity': 5}
+PROGRESS_BATCH_FEATURES = ('days_elapsed', 'workouts_completed', 'calories_burned', 'nutrition_compliance')
+PROGRESS_BATCH_DEFAULTS = {'days_elapsed': 0, 'workouts_completed': 0, 'calories_burned': 0, 'nutrition_compliance': 0.7}
+
+# Progress prediction engine: 'forest' (random forest) or 'neural_network'
+# (NumPy forward pass over PROGRESS_NN_WEIGHTS; falls back to the forest)
+PROGRESS_ENGINE = os.getenv('PROGRESS_ENGINE', 'forest')
+PROGRESS_NN_DTYPE = os.getenv('PROGRESS_NN_DTYPE', 'float32')  # 'float64', 'float32' or 'int8'
+PROGRESS_NN_FEATURES = PROGRESS_BATCH_FEATURES + (
+    'sleep_hours', 'water_intake', 'protein_intake', 'exercise_variety', 'workout_intensity', 'rest_days'
+)
+PROGRESS_NN_DEFAULTS = dict(
+    PROGRESS_BATCH_DEFAULTS, sleep_hours=7, water_intake=2.5, protein_intake=120,
+    exercise_variety=3, workout_intensity=6, rest_days=1
+)
+
+NUTRITION_BATCH_FEATURES = ('weight', 'height', 'age')
+NUTRITION_BATCH_DEFAULTS = {'weight': 70, 'height': 170, 'age': 30}
+
+# Nutrition plan cache (keyed by weight, height, age, fitness_level, goal)
+NUTRITION_CACHE_SIZE = int(os.getenv('NUTRITION_CACHE_SIZE', 4096))
+
+# Request Profiling
+PROFILE_REQUESTS = os.getenv('PROFILE_REQUESTS', 'false').lower() == 'true'  # honour the flag below
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')  # if set, the flag must carry this value
+PROFILE_HEADER = 'X-Profile'  # or ?profile=<value>; value 'sampling' picks the sampler
+PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', 0))  # profile 1 in N requests; 0 = off
+PROFILE_ENGINE = os.getenv('PROFILE_ENGINE', 'cprofile')  # 'cprofile' (.prof) or 'sampling' (.collapsed)
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 1))
+PROFILE_PATH = os.getenv('PROFILE_PATH', os.path.join(DATA_PATH, 'profiles'))
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 200))  # oldest dumps are deleted beyond this
+
+# Warm-up: load artifacts and send one synthetic request per inference endpoint
+# at boot; /api/ml/ready succeeds once it is done (at once when off)
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'true').lower() == 'true'
+
+# Startup Budget (checked by benchmarks/startup.py)
+STARTUP_IMPORT_BUDGET_SECONDS = float(os.getenv('STARTUP_IMPORT_BUDGET_SECONDS', 1.5))
+STARTUP_HEALTHY_BUDGET_SECONDS = float(os.getenv('STARTUP_HEALTHY_BUDGET_SECONDS', 3.0))
+STARTUP_RSS_BUDGET_MB = float(os.getenv('STARTUP_RSS_BUDGET_MB', 120))
+STARTUP_FORBIDDEN_MODULES = ('tensorflow', 'pandas', 'sklearn')
 
 # Workout Categories
 WORKOUT_CATEGORIES = [
@@ -54,3 +166,69 @@ NUTRITION_CATEGORIES = [
     'Vegetarian',
     'Keto'
 ]
+
+# Workout catalogue: one workout per category for each fitness level ('Elite'
+# uses 'Advanced'). The first three of a level are its default plan, used when
+# similar users give nothing to go on.
+WORKOUT_CATALOGUE = {
+    'Beginner': {
+        'Cardio': {'name': 'Brisk Walking', 'duration': 30, 'intensity': 'Low',
+                   'description': 'Easy-paced walking to build cardiovascular fitness',
+                   'calories_burned': 120, 'difficulty': 1},
+        'Strength': {'name': 'Bodyweight Training', 'duration': 25, 'intensity': 'Low-Medium',
+                     'description': 'Basic exercises using your body weight',
+                     'calories_burned': 150, 'difficulty': 1},
+        'Flexibility': {'name': 'Beginner Yoga', 'duration': 20, 'intensity': 'Low',
+                        'description': 'Stretching and basic yoga poses',
+                        'calories_burned': 80, 'difficulty': 1},
+        'HIIT': {'name': 'Low-Impact Intervals', 'duration': 20, 'intensity': 'Medium',
+                 'description': 'Short work and rest intervals without jumping',
+                 'calories_burned': 160, 'difficulty': 1},
+        'Endurance': {'name': 'Easy Cycling', 'duration': 40, 'intensity': 'Low',
+                      'description': 'Steady cycling at a conversational pace',
+                      'calories_burned': 200, 'difficulty': 1},
+        'Balance': {'name': 'Balance Basics', 'duration': 15, 'intensity': 'Low',
+                    'description': 'Single-leg stands and stability drills',
+                    'calories_burned': 50, 'difficulty': 1}
+    },
+    'Intermediate': {
+        'Cardio': {'name': 'Running', 'duration': 40, 'intensity': 'Medium',
+                   'description': 'Steady-state running to improve endurance',
+                   'calories_burned': 400, 'difficulty': 2},
+        'Strength': {'name': 'Weight Training', 'duration': 45, 'intensity': 'Medium',
+                     'description': 'Structured weight lifting program',
+                     'calories_burned': 350, 'difficulty': 2},
+        'HIIT': {'name': 'Interval Training', 'duration': 30, 'intensity': 'High',
+                 'description': 'High-intensity intervals for maximum results',
+                 'calories_burned': 350, 'difficulty': 3},
+        'Flexibility': {'name': 'Vinyasa Yoga', 'duration': 40, 'intensity': 'Medium',
+                        'description': 'Flowing yoga sequences for mobility and control',
+                        'calories_burned': 180, 'difficulty': 2},
+        'Endurance': {'name': 'Tempo Cycling', 'duration': 60, 'intensity': 'Medium',
+                      'description': 'Longer rides with sustained tempo efforts',
+                      'calories_burned': 550, 'difficulty': 2},
+        'Balance': {'name': 'Stability Circuit', 'duration': 25, 'intensity': 'Medium',
+                    'description': 'Unilateral strength and stability-ball work',
+                    'calories_burned': 150, 'difficulty': 2}
+    },
+    'Advanced': {
+        'Strength': {'name': 'Advanced Lifting', 'duration': 60, 'intensity': 'Very High',
+                     'description': 'Progressive overload strength training',
+                     'calories_burned': 450, 'difficulty': 4},
+        'HIIT': {'name': 'CrossFit-Style Training', 'duration': 45, 'intensity': 'Very High',
+                 'description': 'Intense functional fitness training',
+                 'calories_burned': 500, 'difficulty': 4},
+        'Endurance': {'name': 'Long-Distance Running', 'duration': 90, 'intensity': 'Medium-High',
+                      'description': 'Building endurance and stamina',
+                      'calories_burned': 900, 'difficulty': 4},
+        'Cardio': {'name': 'Hill Sprints', 'duration': 35, 'intensity': 'Very High',
+                   'description': 'Repeated uphill sprints with walk-back recovery',
+                   'calories_burned': 450, 'difficulty': 4},
+        'Flexibility': {'name': 'Power Yoga', 'duration': 50, 'intensity': 'Medium-High',
+                        'description': 'Demanding yoga flows with strength holds',
+                        'calories_burned': 250, 'difficulty': 3},
+        'Balance': {'name': 'Agility and Balance Drills', 'duration': 30, 'intensity': 'High',
+                    'description': 'Plyometric landings and reactive balance work',
+                    'calories_burned': 250, 'difficulty': 3}
+    }
+}
@@ -0,0 +1,313 @@
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from config import FEATURE_STORE_PATH, INSIGHTS_WINDOW_DAYS
+from rollups import FIELDS, Rollup, nutrition_buckets, to_days, today, workout_buckets
+from workout_aggregates import WORKOUT_DEFAULTS, WorkoutAggregate
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workouts (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    type TEXT,
+    duration REAL,
+    calories_burned REAL,
+    intensity TEXT,
+    date TEXT
+);
+CREATE INDEX IF NOT EXISTS workouts_user ON workouts (user_id, id);
+CREATE TABLE IF NOT EXISTS nutrition (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    date TEXT,
+    calories REAL,
+    protein_grams REAL,
+    carbs_grams REAL,
+    fat_grams REAL
+);
+CREATE INDEX IF NOT EXISTS nutrition_user ON nutrition (user_id, id);
+CREATE TABLE IF NOT EXISTS workout_aggregates (
+    user_id TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    duration_sum REAL NOT NULL,
+    duration_mean REAL NOT NULL,
+    duration_m2 REAL NOT NULL,
+    calories_sum REAL NOT NULL,
+    calories_mean REAL NOT NULL,
+    calories_m2 REAL NOT NULL,
+    type_mask INTEGER NOT NULL,
+    nutrition_count INTEGER NOT NULL DEFAULT 0
+);
+"""
+AGGREGATE_UPSERT = (
+    f'INSERT INTO workout_aggregates (user_id, {", ".join(WorkoutAggregate.__slots__)}) '
+    f'VALUES ({", ".join("?" * (len(WorkoutAggregate.__slots__) + 1))}) '
+    f'ON CONFLICT (user_id) DO UPDATE SET {", ".join(f"{f} = excluded.{f}" for f in WorkoutAggregate.__slots__)}'
+)
+NUTRITION_COUNT_UPSERT = (
+    f'INSERT INTO workout_aggregates (user_id, {", ".join(WorkoutAggregate.__slots__)}, nutrition_count) '
+    f'VALUES (?, {", ".join("?" * len(WorkoutAggregate.__slots__))}, ?) '
+    f'ON CONFLICT (user_id) DO UPDATE SET nutrition_count = nutrition_count + excluded.nutrition_count'
+)
+
+# One row per user and day with dated records; day is days since 1970-01-01
+ROLLUP_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    user_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    {", ".join(f"{field} REAL NOT NULL" for field in FIELDS)},
+    PRIMARY KEY (user_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_totals (
+    user_id TEXT PRIMARY KEY,
+    first_day INTEGER NOT NULL,
+    {", ".join(f"{field} REAL NOT NULL" for field in FIELDS)}
+);
+"""
+ROLLUP_UPSERT = (
+    f'INSERT INTO daily_rollups (user_id, day, {", ".join(FIELDS)}) VALUES ({", ".join("?" * (len(FIELDS) + 2))}) '
+    f'ON CONFLICT (user_id, day) DO UPDATE SET {", ".join(f"{f} = {f} + excluded.{f}" for f in FIELDS)}'
+)
+ROLLUP_TOTALS_UPSERT = (
+    f'INSERT INTO rollup_totals (user_id, first_day, {", ".join(FIELDS)}) VALUES ({", ".join("?" * (len(FIELDS) + 2))}) '
+    f'ON CONFLICT (user_id) DO UPDATE SET first_day = MIN(first_day, excluded.first_day), '
+    f'{", ".join(f"{f} = {f} + excluded.{f}" for f in FIELDS)}'
+)
+
+WORKOUT_COLUMNS = ('type', 'duration', 'calories_burned', 'intensity', 'date')
+NUMERIC_WORKOUT_COLUMNS = ('duration', 'calories_burned')
+NUTRITION_COLUMNS = ('date', 'calories', 'protein_grams', 'carbs_grams', 'fat_grams')
+NUMERIC_NUTRITION_COLUMNS = ('calories', 'protein_grams', 'carbs_grams', 'fat_grams')
+
+
+class FeatureStore:
+    """Embedded per-user store of profiles, workouts and nutrition logs.
+
+    Backed by one SQLite file in WAL mode, so several worker processes can
+    read while one appends. Each thread gets its own connection. Histories
+    come back as dicts of NumPy columns, the columnar shape MLModels accepts
+    anywhere a workout or nutrition history is expected. User ids are
+    stored as text, so 42 and "42" are the same user.
+    
+    Each user's WorkoutAggregate and nutrition log count are updated in the
+    same transaction as the records they cover, so inference reads one row
+    instead of the history.
+    Missing durations and calories are stored as their ingestion defaults.
+    Dated workouts and logs are also summed into per-day rollup rows and one
+    all-time totals row per user, so insights read the rows of the recent
+    window instead of the history.
+    """
+
+    def __init__(self, path=FEATURE_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.connection() as db:
+            db.executescript(SCHEMA)
+            db.executescript(ROLLUP_SCHEMA)
+
+    def connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    # ============ WRITING ============
+
+    def set_profile(self, user_id, profile):
+        """Merge ``profile`` fields into the user's stored profile; returns the result"""
+        db = self.connection()
+        with db:
+            # Take the write lock before reading the profile it merges into
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute('SELECT data FROM profiles WHERE user_id = ?', (str(user_id),)).fetchone()
+            merged = dict(json.loads(row[0]) if row else {}, **profile)
+            db.execute(
+                'INSERT OR REPLACE INTO profiles (user_id, data) VALUES (?, ?)',
+                (str(user_id), json.dumps(merged))
+            )
+        return merged
+
+    def append_workouts(self, user_id, workouts):
+        """Append workouts (list of dicts or dict of columns); returns how many were added"""
+        rows = self._rows(user_id, workouts, WORKOUT_COLUMNS, NUMERIC_WORKOUT_COLUMNS, WORKOUT_DEFAULTS)
+        db = self.connection()
+        with db:
+            # Take the write lock before reading the aggregate it updates
+            db.execute('BEGIN IMMEDIATE')
+            aggregate = self._workout_aggregate(db, user_id)
+            db.executemany(
+                f'INSERT INTO workouts (user_id, {", ".join(WORKOUT_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)', rows
+            )
+            for _, workout_type, duration, calories, _, _ in rows:
+                aggregate.update(workout_type, duration, calories)
+            self._save_aggregate(db, user_id, aggregate)
+            self._add_rollups(db, user_id, workout_buckets([dict(zip(WORKOUT_COLUMNS, row[1:])) for row in rows]))
+        return len(rows)
+
+    def append_nutrition(self, user_id, logs):
+        """Append nutrition logs (list of dicts or dict of columns); returns how many were added"""
+        rows = self._rows(user_id, logs, NUTRITION_COLUMNS, NUMERIC_NUTRITION_COLUMNS)
+        with self.connection() as db:
+            db.executemany(
+                f'INSERT INTO nutrition (user_id, {", ".join(NUTRITION_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)', rows
+            )
+            db.execute(NUTRITION_COUNT_UPSERT, (str(user_id),) + WorkoutAggregate().to_row() + (len(rows),))
+            self._add_rollups(db, user_id, nutrition_buckets([dict(zip(NUTRITION_COLUMNS, row[1:])) for row in rows]))
+        return len(rows)
+
+    def _add_rollups(self, db, user_id, buckets):
+        """Add (days, values) from rollups.*_buckets to the user's daily rows"""
+        days, values = buckets
+        if not len(days):
+            return
+        unique_days, index = np.unique(days, return_inverse=True)
+        per_day = np.zeros((len(unique_days), len(FIELDS)))
+        np.add.at(per_day, index, values)
+        db.executemany(ROLLUP_UPSERT, [
+            (str(user_id), int(day), *row) for day, row in zip(unique_days.tolist(), per_day.tolist())
+        ])
+        db.execute(ROLLUP_TOTALS_UPSERT, (str(user_id), int(unique_days[0]), *per_day.sum(axis=0).tolist()))
+
+    def _rows(self, user_id, records, columns, numeric, defaults=None):
+        """Insert tuples from a list of records or a dict of equal-length columns"""
+        if isinstance(records, dict):
+            lengths = {len(values) for values in records.values()}
+            if len(lengths) > 1:
+                raise ValueError('Columnar records must have columns of equal length')
+            n = lengths.pop() if lengths else 0
+            values = [records.get(col, [None] * n) for col in columns]
+            records = [dict(zip(columns, row)) for row in zip(*values)]
+        elif not isinstance(records, list):
+            raise ValueError('Records must be a list of objects or an object of columns')
+
+        rows = []
+        for record in records:
+            row = [str(user_id)]
+            for col in columns:
+                value = record.get(col)
+                if value is None and defaults:
+                    value = defaults.get(col)
+                if value is not None:
+                    value = float(value) if col in numeric else str(value)
+                row.append(value)
+            rows.append(tuple(row))
+        return rows
+
+    def delete_user(self, user_id):
+        with self.connection() as db:
+            for table in ('profiles', 'workouts', 'nutrition', 'workout_aggregates', 'daily_rollups', 'rollup_totals'):
+                db.execute(f'DELETE FROM {table} WHERE user_id = ?', (str(user_id),))
+
+    # ============ READING ============
+
+    def profile(self, user_id):
+        """Stored profile dict, or None for an unknown user"""
+        row = self.connection().execute('SELECT data FROM profiles WHERE user_id = ?', (str(user_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def workout_aggregate(self, user_id):
+        """The user's WorkoutAggregate (empty for a user without workouts)"""
+        return self._workout_aggregate(self.connection(), user_id)
+
+    def _workout_aggregate(self, db, user_id):
+        return self._aggregate_row(db, user_id)[0]
+
+    def _aggregate_row(self, db, user_id):
+        """(WorkoutAggregate, nutrition log count) of a user, from one row"""
+        row = db.execute(
+            f'SELECT {", ".join(WorkoutAggregate.__slots__)}, nutrition_count FROM workout_aggregates WHERE user_id = ?',
+            (str(user_id),)
+        ).fetchone()
+        if row is None:
+            return WorkoutAggregate(), 0
+        return WorkoutAggregate.from_row(row[:-1]), row[-1]
+
+    def _save_aggregate(self, db, user_id, aggregate):
+        db.execute(AGGREGATE_UPSERT, (str(user_id),) + aggregate.to_row())
+
+    def rollup(self, user_id, first_day, last_day):
+        """The user's Rollup over days first_day..last_day inclusive.
+        
+        Only that window's daily rows are loaded; the first dated record and
+        the all-time totals come from the user's totals row. Empty for a
+        user without dated records.
+        """
+        db = self.connection()
+        totals = db.execute(
+            f'SELECT first_day, {", ".join(FIELDS)} FROM rollup_totals WHERE user_id = ?', (str(user_id),)
+        ).fetchone()
+        if totals is None:
+            return Rollup()
+        rows = db.execute(
+            f'SELECT day, {", ".join(FIELDS)} FROM daily_rollups WHERE user_id = ? AND day BETWEEN ? AND ? ORDER BY day',
+            (str(user_id), int(first_day), int(last_day))
+        ).fetchall()
+        if not rows:
+            return Rollup(first_day=totals[0], all_time=totals[1:])
+        rows = np.array(rows, dtype=float)
+        days = rows[:, 0].astype(np.int64)
+        daily = np.zeros((days[-1] - days[0] + 1, len(FIELDS)))
+        daily[days - days[0]] = rows[:, 1:]
+        return Rollup(int(days[0]), daily, first_day=totals[0], all_time=totals[1:])
+
+    def workout_history(self, user_id):
+        """The user's workouts, oldest first, as a dict of NumPy columns"""
+        return self._columns('workouts', user_id, WORKOUT_COLUMNS, NUMERIC_WORKOUT_COLUMNS)
+
+    def nutrition_history(self, user_id):
+        """The user's nutrition logs, oldest first, as a dict of NumPy columns"""
+        return self._columns('nutrition', user_id, NUTRITION_COLUMNS, NUMERIC_NUTRITION_COLUMNS)
+
+    def _columns(self, table, user_id, columns, numeric):
+        rows = self.connection().execute(
+            f'SELECT {", ".join(columns)} FROM {table} WHERE user_id = ? ORDER BY id', (str(user_id),)
+        ).fetchall()
+        values = list(zip(*rows)) if rows else [()] * len(columns)
+        return {
+            col: np.array(column, dtype=float) if col in numeric else np.array(column, dtype=object)
+            for col, column in zip(columns, values)
+        }
+
+    def user_history(self, user_id, as_of=None):
+        """History in the shape the inference methods take, or None for an unknown user.
+        
+        ``workout_history`` is the user's WorkoutAggregate, not the workouts,
+        ``rollup`` their daily totals over the INSIGHTS_WINDOW_DAYS days
+        ending on ``as_of`` (an ISO date, default today) and
+        ``nutrition_count`` the number of nutrition logs; the logs themselves
+        are not loaded.
+        """
+        profile = self.profile(user_id)
+        workouts, nutrition_count = self._aggregate_row(self.connection(), user_id)
+        if profile is None and not len(workouts) and not nutrition_count:
+            return None
+        last_day = int(to_days([as_of])[0]) if as_of else today()
+        history = {
+            'workout_history': workouts,
+            'rollup': self.rollup(user_id, last_day - INSIGHTS_WINDOW_DAYS + 1, last_day),
+            'nutrition_count': nutrition_count
+        }
+        if as_of:
+            history['as_of'] = as_of
+        if profile and 'nutrition_compliance' in profile:
+            history['nutrition_compliance'] = profile['nutrition_compliance']
+        return history
+
+    def counts(self, user_id):
+        """Stored workouts and nutrition logs of a user, from the aggregate row"""
+        workouts, nutrition_count = self._aggregate_row(self.connection(), user_id)
+        return {'workouts': workouts.count, 'nutrition': nutrition_count}
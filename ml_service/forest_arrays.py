@@ -0,0 +1,152 @@
+import numpy as np
+
+
+class ForestArrays:
+    """A trained sklearn random forest compiled into flat NumPy node arrays.
+
+    All trees are concatenated into one set of contiguous arrays (split
+    feature, threshold, children, leaf value) with ``roots_`` pointing at
+    each tree's first node. Only plain arrays are pickled, so
+    ``joblib.load(path, mmap_mode='r')`` maps them straight from the file
+    and every worker process shares the same physical pages through the OS
+    page cache. sklearn's own ``Tree`` objects copy their nodes into
+    private memory on unpickling and cannot be shared this way.
+
+    The fitted StandardScaler (and, for classifiers, the LabelEncoder) are
+    fused in, so predict() takes raw feature rows and returns final labels
+    without sklearn's per-call validation and joblib dispatch. Leaves point
+    back at themselves, so all trees are walked together in a fixed number
+    of branch-free steps. Predictions are identical to
+    ``forest.predict(scaler.transform(X))``.
+
+    The walk is vectorized NumPy, so it wins on a few rows at a time; for
+    large batches sklearn's compiled traversal is faster per row.
+    """
+
+    # Bumped when the stored layout changes; older files are not used
+    VERSION = 2
+
+    def __init__(self, feature, threshold, children, value, roots, depths,
+                 classes=None, mean=None, scale=None):
+        self.version = self.VERSION
+        self.feature_ = feature
+        self.threshold_ = threshold
+        self.children_ = children  # (n_nodes, 2): [right, left], indexed by "goes left"
+        self.value_ = value
+        self.roots_ = roots
+        self.depths_ = depths
+        self.classes_ = classes
+        self.mean_ = mean
+        self.scale_ = scale
+        # Trees deepest first, and how many of them are still moving at each step
+        self.tree_order_ = np.argsort(-depths, kind='stable').astype(np.int32)
+        self.active_trees_ = np.array([(depths > step).sum() for step in range(depths.max(initial=0))], dtype=np.int32)
+
+    def __setstate__(self, state):
+        # Keep memory-mapped arrays as plain ndarray views: indexing an
+        # np.memmap returns memmap subclasses, which is much slower.
+        self.__dict__.update({
+            name: np.asarray(value) if isinstance(value, np.memmap) else value
+            for name, value in state.items()
+        })
+
+    @classmethod
+    def from_estimator(cls, forest, scaler=None, label_encoder=None):
+        """Compile a fitted RandomForestRegressor or RandomForestClassifier"""
+        is_classifier = hasattr(forest, 'classes_')
+        features, thresholds, children, values, roots, depths = [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n_nodes, dtype=np.int32)
+
+            features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            children.append(np.column_stack([
+                np.where(leaf, own, tree.children_right + offset),
+                np.where(leaf, own, tree.children_left + offset)
+            ]).astype(np.int32))
+            if is_classifier:
+                values.append(cls._class_fractions(tree.value[:, 0, :len(forest.classes_)]))
+            else:
+                values.append(tree.value[:, 0, 0].copy())
+            roots.append(offset)
+            depths.append(tree.max_depth)
+            offset += n_nodes
+
+        classes = None
+        if is_classifier:
+            classes = np.asarray(forest.classes_)
+            if label_encoder is not None:
+                classes = label_encoder.classes_[classes]
+
+        mean = scale = None
+        if scaler is not None:
+            mean = np.asarray(scaler.mean_, dtype=float) if scaler.with_mean else None
+            scale = np.asarray(scaler.scale_, dtype=float) if scaler.with_std else None
+
+        return cls(
+            np.concatenate(features),
+            np.concatenate(thresholds),
+            np.concatenate(children),
+            np.concatenate(values),
+            np.array(roots, dtype=np.int32),
+            np.array(depths, dtype=np.int32),
+            classes, mean, scale
+        )
+
+    @staticmethod
+    def _class_fractions(value):
+        # Newer sklearn stores per-leaf class fractions; older versions store
+        # weighted counts and normalize in predict_proba. Do the same here.
+        sums = value.sum(axis=1)
+        if np.allclose(sums, 1.0):
+            return value.copy()
+        sums[sums == 0.0] = 1.0
+        return value / sums[:, np.newaxis]
+
+    @property
+    def n_nodes(self):
+        return len(self.feature_)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in vars(self).values() if isinstance(a, np.ndarray))
+
+    def transform(self, X):
+        """The fused StandardScaler step, followed by sklearn's float32 cast for trees"""
+        X = np.asarray(X, dtype=float)
+        if self.mean_ is not None:
+            X = X - self.mean_
+        if self.scale_ is not None:
+            X = X / self.scale_
+        return X.astype(np.float32)
+
+    def apply(self, X):
+        """Leaf node index of each (already transformed) row in every tree: (n_rows, n_trees)"""
+        X = np.ascontiguousarray(X)
+        flat = X.ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, np.newaxis]
+        node = np.repeat(self.roots_[self.tree_order_][np.newaxis, :], len(X), axis=0)
+        # Only trees deeper than the current step still have to move
+        for n_active in self.active_trees_:
+            current = node[:, :n_active]
+            go_left = flat[row_offsets + self.feature_[current]] <= self.threshold_[current]
+            node[:, :n_active] = self.children_[current, go_left.view(np.int8)]
+
+        leaves = np.empty_like(node)
+        leaves[:, self.tree_order_] = node
+        return leaves
+
+    def predict(self, X):
+        """Same output as forest.predict(scaler.transform(X)), decoded by the label encoder"""
+        leaves = self.apply(self.transform(X))
+        # cumsum adds tree by tree, in order, exactly like the forest does
+        # (a plain sum may use pairwise summation and round differently)
+        total = np.cumsum(self.value_[leaves], axis=1)[:, -1] / len(self.roots_)
+
+        if self.classes_ is None:
+            return total
+        return self.classes_.take(np.argmax(total, axis=1), axis=0)
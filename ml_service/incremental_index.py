@@ -0,0 +1,207 @@
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from config import MODEL_RELOAD_CHECK_INTERVAL
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+
+class WorkoutUpdateLog:
+    """Append-only log of new or changed user feature vectors.
+
+    Writers append one pickled ``(user_ids, features)`` record per update,
+    so an update costs O(changed users). Readers tail the file: refresh()
+    only parses records written since the last call, and starts over when
+    compaction replaces the file. Last write per user wins.
+    """
+
+    def __init__(self, path, n_features=10, check_interval=MODEL_RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.n_features = n_features
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._reset(None)
+
+    def _reset(self, inode):
+        self._inode = inode
+        self._offset = 0
+        self._checked_at = float('-inf')
+        self.user_ids = []
+        self._rows = {}
+        self._matrix = np.empty((0, self.n_features))
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    # ============ WRITING ============
+
+    @contextmanager
+    def locked(self):
+        """Exclusive access to the log file across threads and (on POSIX) processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, user_ids, features):
+        """Durably append one batch of feature vectors"""
+        record = pickle.dumps((list(user_ids), np.asarray(features, dtype=float)), protocol=pickle.HIGHEST_PROTOCOL)
+        with self.locked():
+            with open(self.path, 'ab') as f:
+                f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+        self.refresh(force=True)
+
+    # ============ READING ============
+
+    def refresh(self, force=False):
+        """Apply records appended since the last refresh"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                if self._inode is not None:
+                    self._reset(None)
+                return
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                self._reset(st.st_ino)
+            if st.st_size == self._offset:
+                return
+
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                while True:
+                    try:
+                        user_ids, features = pickle.load(f)
+                    except (EOFError, pickle.UnpicklingError):
+                        # End of file, or a record still being written
+                        break
+                    self._apply(user_ids, features)
+                    self._offset = f.tell()
+            self._checked_at = time.monotonic()
+
+    def _apply(self, user_ids, features):
+        for user_id, vector in zip(user_ids, np.atleast_2d(features)):
+            row = self._rows.get(user_id)
+            if row is None:
+                row = len(self.user_ids)
+                if row == len(self._matrix):
+                    grown = np.empty((max(16, 2 * row), self.n_features))
+                    grown[:row] = self._matrix[:row]
+                    self._matrix = grown
+                self._rows[user_id] = row
+                self.user_ids.append(user_id)
+            self._matrix[row] = vector
+
+    def position(self):
+        """(inode, size) of the log file on disk, or None if it does not exist"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size)
+
+    def snapshot(self):
+        """(user_ids, features, log position) of everything applied so far"""
+        with self._lock:
+            n = len(self.user_ids)
+            return list(self.user_ids), self._matrix[:n].copy(), (self._inode, self._offset)
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    def vector(self, user_id):
+        """Latest pending feature vector of a user, or None"""
+        with self._lock:
+            row = self._rows.get(user_id)
+            return None if row is None else self._matrix[row].copy()
+
+    def kneighbors(self, query, k):
+        """Exact k nearest pending vectors: (distances, user_ids)"""
+        with self._lock:
+            n = len(self.user_ids)
+            if n == 0:
+                return np.empty(0), []
+            distances = np.sqrt(((self._matrix[:n] - query) ** 2).sum(axis=1))
+            top = np.argsort(distances, kind='stable')[:k]
+            return distances[top], [self.user_ids[i] for i in top]
+
+    # ============ COMPACTION ============
+
+    def truncate(self, position):
+        """Drop the records up to ``position`` (already folded into the base index).
+
+        ``position`` comes from position() or snapshot(); if the file has been
+        replaced since, those records are already gone and nothing is done.
+        Must be called while holding locked().
+        """
+        inode, offset = position
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_ino != inode:
+                    return
+                f.seek(offset)
+                remainder = f.read()
+        except FileNotFoundError:
+            return
+        tmp_path = self.path + '.compact'
+        with open(tmp_path, 'wb') as f:
+            f.write(remainder)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.refresh(force=True)
+
+
+def merge_neighbours(base_model, base_user_ids, update_log, query, k):
+    """k nearest users across the base index and pending updates.
+
+    Base hits for users that have a newer vector in the log are skipped, so
+    each user appears at most once with its latest features. Returns
+    (distances, user_ids), ascending by distance.
+    """
+    query = np.asarray(query, dtype=float).reshape(1, -1)
+    n_base = len(base_user_ids)
+    k_total = min(k, n_base + len(update_log))
+
+    base_distances, base_ids = np.empty(0), []
+    if n_base:
+        fetch = min(k + min(len(update_log), k), n_base)
+        while True:
+            distances, indices = base_model.kneighbors(query, n_neighbors=fetch)
+            hits = [
+                (d, base_user_ids[i]) for d, i in zip(distances[0], indices[0])
+                if base_user_ids[i] not in update_log
+            ]
+            if len(hits) >= k or fetch == n_base:
+                break
+            fetch = min(2 * fetch, n_base)
+        base_distances = np.array([d for d, _ in hits[:k]])
+        base_ids = [uid for _, uid in hits[:k]]
+
+    log_distances, log_ids = update_log.kneighbors(query[0], k)
+
+    distances = np.concatenate([base_distances, log_distances])
+    user_ids = base_ids + log_ids
+    top = np.argsort(distances, kind='stable')[:k_total]
+    return distances[top], [user_ids[i] for i in top]
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import INFERENCE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# MLModels of this worker process, created by _init_worker
+_models = None
+
+
+def _init_worker():
+    """Create this worker's MLModels and load its model artifacts before the first request"""
+    global _models
+    from ml_models import MLModels
+
+    _models = MLModels()
+    try:
+        _models.classify_fitness_level(30, 24, 3, 30, 5)
+        _models.predict_progress({}, {})
+        _models.get_workout_recommendations({'fitness_level': 'Beginner', 'goal': 'Weight Loss'}, [])
+    except Exception as e:
+        # Serve anyway: requests report the error themselves
+        logger.error(f"Error preloading models in inference worker {os.getpid()}: {str(e)}")
+
+
+def _ready(barrier):
+    # Blocks until every worker has picked up one of these calls
+    barrier.wait()
+    return os.getpid()
+
+
+def _call(method_name, args):
+    """Run one MLModels method in a worker; returns (result, compute seconds)"""
+    start = time.perf_counter()
+    result = getattr(_models, method_name)(*args)
+    return result, time.perf_counter() - start
+
+
+class InferencePool:
+    """Preloaded worker processes that run MLModels inference methods.
+
+    Each worker imports the models once (``_init_worker``) and keeps them
+    resident, so a request only pays for pickling its arguments and result.
+    Inference runs outside the server's GIL, so throughput scales with the
+    number of workers up to the number of cores. Workers are spawned, not
+    forked, so they don't inherit the server's threads or event loop. A
+    worker that dies takes the pool down with it; the pool is then
+    recreated and the failed call raises.
+    """
+
+    def __init__(self, max_workers=INFERENCE_WORKERS):
+        self.max_workers = max_workers
+        self.context = multiprocessing.get_context('spawn')
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=self.context, initializer=_init_worker
+                )
+            return self._pool
+
+    def start(self):
+        """Start every worker and wait until all of them have loaded the models; returns their pids"""
+        pool = self._executor()
+        with self.context.Manager() as manager:
+            barrier = manager.Barrier(self.max_workers)
+            # Calls that wait for each other make the executor spawn one process per call
+            futures = [pool.submit(_ready, barrier) for _ in range(self.max_workers)]
+            return sorted(future.result() for future in futures)
+
+    async def run(self, method_name, *args):
+        """Await ``MLModels.<method_name>(*args)`` in a worker; returns (result, compute seconds)"""
+        pool = self._executor()
+        try:
+            return await asyncio.wrap_future(pool.submit(_call, method_name, args))
+        except BrokenProcessPool:
+            self._restart(pool)
+            raise
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._pool is broken:
+                logger.error('Inference worker died; restarting the pool')
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from config import DATA_PATH, UPLOAD_PATH, INGEST_CHUNK_BYTES
+
+# Columns parsed for each NDJSON training dataset. Numeric columns become
+# float64 arrays (missing values use the default, else NaN); categorical
+# columns become object arrays sharing one string per distinct value.
+DATASETS = {
+    'historical_progress_data': {
+        'numeric': ('days_elapsed', 'workouts_completed', 'calories_burned', 'nutrition_compliance',
+                    'sleep_hours', 'water_intake', 'protein_intake', 'exercise_variety',
+                    'workout_intensity', 'rest_days', 'weight_change'),
+        'categorical': (),
+        'defaults': {}
+    },
+    'user_profiles': {
+        'numeric': ('age', 'bmi', 'workouts_per_week', 'average_duration', 'max_intensity'),
+        'categorical': ('fitness_level',),
+        'defaults': {}
+    },
+    # One workout per line, flattened: {"user_id": 1, "type": "Cardio", "duration": 30, ...}
+    'workouts': {
+        'numeric': ('duration', 'calories_burned'),
+        'categorical': ('user_id', 'type'),
+        'defaults': {'duration': 30, 'calories_burned': 200}
+    }
+}
+
+
+def resolve_data_file(filename):
+    """Absolute path of a file under DATA_PATH; rejects paths that escape it"""
+    root = os.path.realpath(DATA_PATH)
+    path = os.path.realpath(os.path.join(root, filename))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f'File must be inside DATA_PATH: {filename}')
+    if not os.path.isfile(path):
+        raise ValueError(f'File not found in DATA_PATH: {filename}')
+    return path
+
+
+def spool_upload(stream, chunk_size=INGEST_CHUNK_BYTES):
+    """Copy a request body stream to a file under UPLOAD_PATH in fixed-size chunks"""
+    os.makedirs(UPLOAD_PATH, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix='upload-', suffix='.ndjson', dir=UPLOAD_PATH)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(stream, f, chunk_size)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def count_lines(path, chunk_size=INGEST_CHUNK_BYTES):
+    """Upper bound on the number of records in an NDJSON file"""
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    return lines + (last != b'\n')
+
+
+def iter_ndjson_chunks(path, chunk_size=INGEST_CHUNK_BYTES):
+    """Yield lists of decoded records, one list per chunk of the file"""
+    leftover = b''
+    line_number = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            lines = (leftover + chunk).split(b'\n')
+            leftover = lines.pop() if chunk else b''
+            records = []
+            for line in lines:
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError as e:
+                    raise ValueError(f'Invalid JSON on line {line_number}: {e}')
+            if records:
+                yield records
+            if not chunk:
+                break
+
+
+def read_ndjson(path, dataset):
+    """Parse an NDJSON training file into a dict of column arrays.
+
+    Arrays are preallocated from a line count, then filled one chunk at a
+    time, so peak memory is the arrays plus one chunk of decoded records.
+    """
+    spec = DATASETS.get(dataset)
+    if spec is None:
+        raise ValueError(f'Unknown dataset: {dataset}')
+
+    capacity = count_lines(path)
+    numeric = {col: np.full(capacity, np.nan) for col in spec['numeric']}
+    codes = {col: np.empty(capacity, dtype=np.int32) for col in spec['categorical']}
+    categories = {col: {} for col in spec['categorical']}
+    defaults = spec['defaults']
+
+    n = 0
+    for records in iter_ndjson_chunks(path):
+        end = n + len(records)
+        for col, array in numeric.items():
+            default = defaults.get(col, np.nan)
+            values = [record.get(col) for record in records]
+            array[n:end] = [default if v is None else v for v in values]
+        for col, array in codes.items():
+            mapping = categories[col]
+            array[n:end] = [mapping.setdefault(record.get(col), len(mapping)) for record in records]
+        n = end
+
+    columns = {col: array[:n] for col, array in numeric.items()}
+    for col, array in codes.items():
+        values = np.empty(len(categories[col]), dtype=object)
+        values[:] = list(categories[col])
+        columns[col] = values[array[:n]]
+    return columns
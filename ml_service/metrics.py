@@ -0,0 +1,269 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Counters, gauges and histograms are plain dicts keyed by label values and
+guarded by one lock each, so recording costs a dict update and a bisect.
+Request latency is split into phases: a per-thread RequestTimer charges
+elapsed time to whichever phase is innermost, so nested phases (a model
+load during inference) are never counted twice.
+"""
+
+import bisect
+import math
+import threading
+import time
+from functools import wraps
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_metrics = []
+_collectors = []
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # Per-bucket counts (made cumulative when rendered), sum, count
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted((labels, ([*counts], total, n)) for labels, (counts, total, n) in self._values.items())
+        for labels, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                label_text = _format_labels(self.labelnames, labels, [('le', _format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{label_text} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {n}')
+        return lines
+
+
+def register_collector(collect):
+    """Add a callable run at scrape time that returns rendered metric lines"""
+    _collectors.append(collect)
+
+
+def render():
+    """All metrics in the Prometheus text format"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return '\n'.join(lines) + '\n'
+
+
+def sample_lines(name, kind, help_text, labelname, values):
+    """Rendered lines for a metric computed at scrape time ({label value: number})"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for label, value in sorted(values.items()):
+        lines.append(f'{name}{_format_labels((labelname,), (label,))} {_format_value(value)}')
+    return lines
+
+
+# ============ REQUEST METRICS ============
+
+REQUESTS = Counter('ml_requests_total', 'Requests handled', ('route', 'method', 'status'))
+ERRORS = Counter('ml_request_errors_total', 'Requests answered with a 4xx/5xx status', ('route', 'status'))
+IN_FLIGHT = Gauge('ml_requests_in_flight', 'Requests currently being handled')
+LATENCY = Histogram('ml_request_duration_seconds', 'Request latency', ('route',))
+PHASE_LATENCY = Histogram(
+    'ml_request_phase_seconds',
+    'Request latency by phase (parse, preprocessing, model_load, inference, serialization, '
+    'queue_wait when micro-batched; feature_store and dispatch in the ASGI mode)',
+    ('route', 'phase')
+)
+MICRO_BATCH_SIZE = Histogram(
+    'ml_micro_batch_size', 'Concurrent single-row predictions coalesced into one model call', ('model',),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+MODEL_ERRORS = Counter('ml_model_errors_total', 'Model predictions that raised', ('model',))
+MODEL_LOAD = Histogram(
+    'ml_model_load_seconds', 'Time to load a model artifact from disk', ('artifact',),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+)
+
+IN_FLIGHT.set(0)
+
+_local = threading.local()
+
+
+class RequestTimer:
+    """Exclusive time per phase for one request; time not in a nested phase goes to the root"""
+
+    __slots__ = ('phases', 'stack', 'mark', 'started')
+
+    def __init__(self, root='inference'):
+        self.phases = {}
+        self.stack = [root]
+        self.started = self.mark = time.perf_counter()
+
+    def _charge(self):
+        now = time.perf_counter()
+        top = self.stack[-1]
+        self.phases[top] = self.phases.get(top, 0.0) + now - self.mark
+        self.mark = now
+
+    def push(self, name):
+        self._charge()
+        self.stack.append(name)
+
+    def pop(self):
+        self._charge()
+        self.stack.pop()
+
+    def finish(self):
+        self._charge()
+        return self.mark - self.started
+
+    def move(self, name, seconds):
+        """Re-charge ``seconds`` already spent in the current phase to ``name``"""
+        self._charge()
+        top = self.stack[-1]
+        self.phases[top] -= seconds
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+class phase:
+    """Context manager charging the enclosed time to ``name`` for the current request.
+
+    A no-op outside a request (training processes, scripts).
+    """
+
+    __slots__ = ('name', 'timer')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timer = getattr(_local, 'timer', None)
+        if self.timer is not None:
+            self.timer.push(self.name)
+
+    def __exit__(self, *exc):
+        if self.timer is not None:
+            self.timer.pop()
+        return False
+
+
+def timed(name):
+    """Decorator form of phase()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def charge(name, seconds):
+    """Count ``seconds`` of the current phase, already elapsed, as ``name`` instead (no-op outside a request)"""
+    timer = getattr(_local, 'timer', None)
+    if timer is not None:
+        timer.move(name, seconds)
+
+
+def start_request():
+    _local.timer = RequestTimer()
+    IN_FLIGHT.inc()
+
+
+def finish_request(route, method, status):
+    """Record a finished request; safe to call twice (the second call is ignored)"""
+    timer = getattr(_local, 'timer', None)
+    if timer is None:
+        return
+    _local.timer = None
+    IN_FLIGHT.dec()
+    if route is None:
+        return
+    observe_request(route, method, status, timer.finish(), timer.phases)
+
+
+def observe_request(route, method, status, seconds, phases):
+    """Record one request's latency, per-phase seconds and status"""
+    LATENCY.observe(seconds, route)
+    for name, phase_seconds in phases.items():
+        PHASE_LATENCY.observe(phase_seconds, route, name)
+    REQUESTS.inc(route, method, str(status))
+    if status >= 400:
+        ERRORS.inc(route, str(status))
@@ -0,0 +1,156 @@
+"""
+Dynamic micro-batching of concurrent single-row predictions.
+
+A batcher wraps a function from a list of calls to a list of results (e.g.
+MLModels.classify_fitness_levels). Each call waits until either
+``max_wait_ms`` has passed since the oldest waiting call or ``max_size``
+calls are waiting, and then the whole group runs as one vectorized model
+call whose results are handed back to the individual callers. Lone
+requests pay up to ``max_wait_ms`` extra; concurrent ones share one scaler
+and forest pass instead of paying the per-call overhead each.
+
+MicroBatcher serves threads (the Flask app); AsyncMicroBatcher serves an
+asyncio event loop (asgi_app.py) and lets several batches be in flight at
+once, one per inference worker. Both record the batch size in
+``ml_micro_batch_size`` and charge each request's wait to the
+``queue_wait`` phase, separate from the model's compute time.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+from config import MICRO_BATCH_MAX_WAIT_MS, MICRO_BATCH_MAX_SIZE
+
+
+class MicroBatcher:
+    """Coalesces calls from concurrent threads into batches run on one background thread"""
+
+    def __init__(self, run_batch, name, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS, max_size=MICRO_BATCH_MAX_SIZE):
+        self.run_batch = run_batch
+        self.name = name
+        self.max_wait = max_wait_ms / 1000
+        self.max_size = max_size
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_wait > 0 and self.max_size > 1
+
+    def __call__(self, args):
+        """``run_batch([args])[0]``, possibly run together with concurrent calls"""
+        if not self.enabled:
+            return self.run_batch([args])[0]
+        if self._thread is None:
+            self._start()
+        future = Future()
+        enqueued = time.perf_counter()
+        self._queue.put((args, enqueued, future))
+        result, started = future.result()
+        metrics.charge('queue_wait', started - enqueued)
+        return result
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f'micro-batch-{self.name}', daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0][1] + self.max_wait
+            while len(batch) < self.max_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch):
+        started = time.perf_counter()
+        try:
+            results = self.run_batch([args for args, _, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+                return
+            # One bad call must not fail the others: retry them one at a time
+            for item in batch:
+                self._run([item])
+            return
+        metrics.MICRO_BATCH_SIZE.observe(len(batch), self.name)
+        for (_, _, future), result in zip(batch, results):
+            future.set_result((result, started))
+
+
+class AsyncMicroBatcher:
+    """Coalesces concurrent calls on an event loop; ``run_batch(calls, phases)`` is a coroutine function.
+
+    A batch is started as soon as it is complete, without waiting for the
+    previous one, so batches overlap when run_batch hands them to a pool.
+    The batch's phases (e.g. dispatch and inference) are added to every
+    caller's ``phases``.
+    """
+
+    def __init__(self, run_batch, name, max_wait_ms=MICRO_BATCH_MAX_WAIT_MS, max_size=MICRO_BATCH_MAX_SIZE):
+        self.run_batch = run_batch
+        self.name = name
+        self.max_wait = max_wait_ms / 1000
+        self.max_size = max_size
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    @property
+    def enabled(self):
+        return self.max_wait > 0 and self.max_size > 1
+
+    async def __call__(self, args, phases):
+        if not self.enabled:
+            return (await self.run_batch([args], phases))[0]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((args, time.perf_counter(), future, phases))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._run(batch))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        started = time.perf_counter()
+        batch_phases = {}
+        try:
+            results = await self.run_batch([args for args, _, _, _ in batch], batch_phases)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][2].done():
+                    batch[0][2].set_exception(e)
+                return
+            # One bad call must not fail the others: retry them one at a time
+            await asyncio.gather(*(self._run([item]) for item in batch))
+            return
+        metrics.MICRO_BATCH_SIZE.observe(len(batch), self.name)
+        for (_, enqueued, future, phases), result in zip(batch, results):
+            phases['queue_wait'] = started - enqueued
+            for name, seconds in batch_phases.items():
+                phases[name] = phases.get(name, 0.0) + seconds
+            if not future.done():
+                future.set_result(result)
@@ -1,14 +1,24 @@
+import logging
 import numpy as np
-import pandas as pd
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-from sklearn.neighbors import NearestNeighbors
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Dropout
-from tensorflow.keras.optimizers import Adam
-import joblib
 import os
+from functools import lru_cache
 from config import *
+from model_registry import ModelRegistry, atomic_dump, atomic_write
+from ann_index import IVFIndex
+from forest_arrays import ForestArrays
+from progress_network import ProgressNetwork
+import metrics
+from metrics import timed
+from incremental_index import WorkoutUpdateLog, merge_neighbours
+from neighbour_recommender import NeighbourRecommender
+from sharded_index import ShardedIndex
+from workout_aggregates import WORKOUT_DEFAULTS, WorkoutAggregate
+from rollups import Rollup, to_days
+
+logger = logging.getLogger(__name__)
+
+# What predict raises for a broken or mismatched artifact (wrong feature count, wrong object)
+PREDICT_ERRORS = (ValueError, TypeError, AttributeError, IndexError)
 
 class MLModels:
     """Machine Learning Models for FitSphereAI"""
@@ -18,9 +28,56 @@ class MLModels:
         os.makedirs(self.model_path, exist_ok=True)
         self.scalers = {}
         self.label_encoders = {}
+        self.registry = ModelRegistry(self.model_path)
+        self.workout_updates = WorkoutUpdateLog(os.path.join(self.model_path, WORKOUT_UPDATES_LOG))
+        self.nutrition_plan_cache = lru_cache(maxsize=NUTRITION_CACHE_SIZE)(self.compute_nutrition_recommendations)
+        
+    def load_artifacts(self):
+        """Load every artifact used for serving into the registry; {filename: found}"""
+        loaded = {}
+        for group, filenames in ARTIFACT_GROUPS.items():
+            loaded.update(zip(filenames, (obj is not None for obj in self.artifact_group(group))))
+        if PROGRESS_ENGINE == 'neural_network':
+            loaded[PROGRESS_NN_WEIGHTS] = self.progress_network() is not None
+        return loaded
+    
+    def save_artifact(self, obj, filename):
+        """Persist a model artifact atomically (temp file + rename)"""
+        atomic_dump(obj, os.path.join(self.model_path, filename))
+    
+    def artifact_group(self, group):
+        """Artifacts of one ARTIFACT_GROUPS entry from the same training run; None for missing ones"""
+        loaders = {WORKOUT_RECOMMENDATION_MODEL: self.load_workout_index}
+        return self.registry.get_group(group, ARTIFACT_GROUPS[group], loaders)
+    
+    def commit_artifact_group(self, group):
+        """Publish the artifacts of ``group`` just written as one generation, then drop cached copies"""
+        self.registry.commit_group(group, ARTIFACT_GROUPS[group])
+        self.registry.invalidate()
+    
+    def forest_predictor(self, n_rows, group):
+        """Function from raw feature rows to final predictions, or None if not trained.
         
+        Up to COMPILED_FOREST_MAX_ROWS rows go through the compiled forest,
+        which skips sklearn's per-call overhead. Larger batches, and model
+        directories without an up-to-date compiled forest, use the sklearn
+        forest, whose C traversal is faster once there are enough rows.
+        """
+        forest, model, scaler, *label_encoder = self.artifact_group(group)
+        if n_rows <= COMPILED_FOREST_MAX_ROWS:
+            if forest is not None and getattr(forest, 'version', 1) == ForestArrays.VERSION:
+                return forest.predict
+        
+        if model is None or scaler is None or None in label_encoder:
+            return None
+        if label_encoder:
+            le = label_encoder[0]
+            return lambda X: le.inverse_transform(model.predict(scaler.transform(X)))
+        return lambda X: model.predict(scaler.transform(X))
+    
     # ============ DATA PREPROCESSING ============
     
+    @timed('preprocessing')
     def preprocess_user_data(self, user_data):
         """Preprocess user data for ML models"""
         processed_data = {
@@ -39,19 +96,26 @@ class MLModels:
     
     def preprocess_workout_history(self, workouts):
         """Preprocess workout history for analysis"""
+        import pandas as pd
+        
         if not workouts:
             return pd.DataFrame()
         
         df = pd.DataFrame(workouts)
-        df['date'] = pd.to_datetime(df['date'])
-        df['duration_minutes'] = df.get('duration', 30)
+        if 'date' in df:
+            df['date'] = pd.to_datetime(df['date'])
+        # Non-numeric values raise ValueError; missing ones count as their ingestion defaults
+        for column, source in (('duration_minutes', 'duration'), ('calories_burned', 'calories_burned')):
+            default = WORKOUT_DEFAULTS[source]
+            df[column] = pd.to_numeric(df[source]).fillna(default) if source in df else default
         df['intensity'] = df.get('intensity', 'Medium')
-        df['calories_burned'] = df.get('calories_burned', 200)
         
         return df
     
     def preprocess_nutrition_history(self, nutrition_logs):
         """Preprocess nutrition history for analysis"""
+        import pandas as pd
+        
         if not nutrition_logs:
             return pd.DataFrame()
         
@@ -64,38 +128,236 @@ class MLModels:
         
         return df
     
+    # ============ TRAINING DATA ============
+    
+    def count_rows(self, data):
+        """Number of records in a list of dicts or a dict of column arrays"""
+        if not data:
+            return 0
+        if isinstance(data, dict):
+            return len(next(iter(data.values())))
+        return len(data)
+    
+    def training_columns(self, data, columns, dtype=float):
+        """(n_rows, len(columns)) array from a list of dicts or a dict of column arrays"""
+        if isinstance(data, dict):
+            return np.column_stack([np.asarray(data[col], dtype=dtype) for col in columns])
+        
+        import pandas as pd
+        return pd.DataFrame(data)[columns].values.astype(dtype)
+    
+    def train_from_file(self, method_name, dataset, path):
+        """Run a training method on an NDJSON file parsed straight into column arrays"""
+        from ingestion import read_ndjson
+        
+        return getattr(self, method_name)(read_ndjson(path, dataset))
+    
     # ============ WORKOUT RECOMMENDATION ============
     
     def train_workout_recommendation_model(self, users_with_workouts):
         """Train collaborative filtering model for workout recommendations"""
-        # Create user-workout matrix
-        workout_matrix = []
-        user_ids = []
+        pending = self.pending_workout_updates()
         
-        for user in users_with_workouts:
-            user_ids.append(user['user_id'])
-            # Calculate workout features for each user
-            workouts = user.get('workouts', [])
-            features = self.extract_workout_features(workouts)
-            workout_matrix.append(features)
+        # Create user-workout matrix in one vectorized pass over all workouts
+        user_ids, table = self.flatten_users_with_workouts(users_with_workouts)
+        workout_matrix = self.workout_feature_matrix(table['row'], len(user_ids), table)
+        type_counts = self.workout_type_counts(table['row'], len(user_ids), table['type'])
         
-        workout_matrix = np.array(workout_matrix)
+        return self.fit_workout_recommendation_model(*self.with_pending_users(user_ids, workout_matrix, type_counts, pending))
+    
+    def train_workout_recommendation_model_from_table(self, workouts_table):
+        """Train the workout recommendation model from a flat workouts table"""
+        pending = self.pending_workout_updates()
+        user_ids, workout_matrix = self.extract_workout_features_bulk(workouts_table)
+        type_counts = None
+        if 'type' in workouts_table:
+            codes = np.searchsorted(user_ids, np.asarray(workouts_table['user_id']))
+            type_counts = self.workout_type_counts(codes, len(user_ids), workouts_table['type'])
+        return self.fit_workout_recommendation_model(*self.with_pending_users(user_ids, workout_matrix, type_counts, pending))
+    
+    def pending_workout_updates(self):
+        """(user_ids, features, log position) of every incremental update in the log right now"""
+        log = WorkoutUpdateLog(self.workout_updates.path)
+        log.refresh(force=True)
+        return log.snapshot()
+    
+    def with_pending_users(self, user_ids, workout_matrix, type_counts, pending):
+        """fit_workout_recommendation_model arguments for a full retrain that keeps pending users.
+        
+        Users in the update log but not in the training data are appended
+        with their logged vectors (and estimated type counts), so truncating
+        the log does not drop them; users in both keep their training data.
+        """
+        from scipy import sparse
+        
+        update_ids, update_features, (inode, offset) = pending
+        user_ids = list(user_ids)
+        known = set(user_ids)
+        missing = [j for j, user_id in enumerate(update_ids) if user_id not in known]
+        if missing:
+            user_ids += [update_ids[j] for j in missing]
+            workout_matrix = np.vstack([workout_matrix, update_features[missing]])
+            if type_counts is not None:
+                type_counts = sparse.vstack([type_counts, self.estimated_type_counts(update_features[missing])]).tocsr()
+        return user_ids, workout_matrix, (inode, offset) if inode is not None else None, type_counts
+    
+    def fit_workout_recommendation_model(self, user_ids, workout_matrix, log_position=None, type_counts=None,
+                                         changed_rows=None):
+        """Fit and persist the KNN model over a user feature matrix.
+        
+        Pending incremental updates up to ``log_position`` (see
+        WorkoutUpdateLog.position) are folded into the new model and dropped.
+        ``type_counts`` (see workout_type_counts) feeds the per-cluster
+        workout rankings; without it the counts are estimated from the
+        feature vectors. In 'sharded' mode, ``changed_rows`` (positions of
+        existing users whose vectors changed; new users are appended) limits
+        the rebuild to the shards holding them.
+        """
+        matrix = np.ascontiguousarray(workout_matrix, dtype=float)
+        features_path = os.path.join(self.model_path, WORKOUT_FEATURES)
+        atomic_write(features_path, lambda path: np.save(path, matrix))
         
         # Train KNN for finding similar users
-        model = NearestNeighbors(n_neighbors=5, algorithm='ball_tree')
-        model.fit(workout_matrix)
+        if WORKOUT_INDEX_MODE == 'sharded':
+            # The manifest only: the registry's copy has its shards attached
+            previous_path = os.path.join(self.model_path, WORKOUT_RECOMMENDATION_MODEL)
+            previous = self.registry.load(previous_path) if changed_rows is not None and os.path.exists(previous_path) else None
+            model = ShardedIndex.build(
+                self.model_path, user_ids, features_path, WORKOUT_INDEX_SHARDS, WORKOUT_SHARD_INDEX_MODE,
+                WORKOUT_NEIGHBORS, WORKOUT_SHARD_BUILD_WORKERS,
+                previous=previous if isinstance(previous, ShardedIndex) else None, changed_rows=changed_rows
+            )
+        else:
+            model = self.build_workout_index()
+            model.fit(matrix)
         
-        joblib.dump(model, os.path.join(self.model_path, WORKOUT_RECOMMENDATION_MODEL))
-        joblib.dump(user_ids, os.path.join(self.model_path, 'user_ids.pkl'))
+        if type_counts is None:
+            type_counts = self.estimated_type_counts(matrix)
+        recommender = NeighbourRecommender.fit(
+            user_ids, matrix, type_counts, WORKOUT_CATEGORIES, RECOMMENDER_TOP_K, RECOMMENDER_CLUSTER_SIZE
+        )
+        self.save_artifact(type_counts, WORKOUT_TYPE_COUNTS)
+        self.save_artifact(recommender, WORKOUT_RECOMMENDER)
+        self.save_artifact(model, WORKOUT_RECOMMENDATION_MODEL)
+        self.save_artifact(user_ids, 'user_ids.pkl')
+        self.commit_artifact_group('workout_recommendation')
+        if log_position:
+            with self.workout_updates.locked():
+                self.workout_updates.truncate(log_position)
         
         return model
     
+    def workout_type_counts(self, codes, n_users, types):
+        """Sparse (n_users, len(WORKOUT_CATEGORIES)) matrix of each user's workouts per category.
+        
+        ``codes`` gives each workout's row, as in workout_feature_matrix;
+        workouts of other types are not counted.
+        """
+        from scipy import sparse
+        
+        codes = np.asarray(codes, dtype=np.int64)
+        types = np.asarray(types)
+        columns = np.full(len(codes), -1, dtype=np.int64)
+        for j, workout_type in enumerate(WORKOUT_CATEGORIES):
+            columns[types == workout_type] = j
+        known = columns >= 0
+        return sparse.csr_matrix(
+            (np.ones(known.sum()), (codes[known], columns[known])), shape=(n_users, len(WORKOUT_CATEGORIES))
+        )
+    
+    def estimated_type_counts(self, features):
+        """workout_type_counts for users known only by their feature vectors.
+        
+        The vectors only flag which WORKOUT_FEATURE_TYPES a user did, so each
+        user's workouts are split evenly between the flagged types.
+        """
+        from scipy import sparse
+        
+        features = np.atleast_2d(features)
+        flags = features[:, 5:9]
+        n_flagged = flags.sum(axis=1, keepdims=True)
+        counts = np.zeros((len(features), len(WORKOUT_CATEGORIES)))
+        columns = [WORKOUT_CATEGORIES.index(workout_type) for workout_type in WORKOUT_FEATURE_TYPES]
+        counts[:, columns] = np.divide(
+            flags * features[:, :1], n_flagged, out=np.zeros_like(flags), where=n_flagged > 0
+        )
+        return sparse.csr_matrix(counts)
+    
+    # ============ INCREMENTAL WORKOUT MODEL UPDATES ============
+    
+    def update_workout_recommendation_model(self, users_with_workouts):
+        """Add or replace users' feature vectors without refitting the index.
+        
+        Costs O(changed users): the vectors are appended to the update log and
+        searched alongside the base index until the next compaction. Returns
+        the number of users pending compaction.
+        """
+        user_ids, table = self.flatten_users_with_workouts(users_with_workouts)
+        if user_ids:
+            features = self.workout_feature_matrix(table['row'], len(user_ids), table)
+            self.workout_updates.append(user_ids, features)
+        return len(self.workout_updates)
+    
+    def compact_workout_model(self):
+        """Fold pending updates into a freshly built base index"""
+        from scipy import sparse
+        
+        base_user_ids = self.registry.get('user_ids.pkl') or []
+        features_path = os.path.join(self.model_path, WORKOUT_FEATURES)
+        if base_user_ids and not os.path.exists(features_path):
+            raise FileNotFoundError(f'{WORKOUT_FEATURES} missing; retrain the workout model to enable compaction')
+        
+        update_ids, update_features, log_position = self.pending_workout_updates()
+        if not update_ids:
+            return None
+        
+        base_features = np.load(features_path) if base_user_ids else np.empty((0, update_features.shape[1]))
+        base_counts = self.registry.get(WORKOUT_TYPE_COUNTS)
+        if base_counts is None or base_counts.shape[0] != len(base_user_ids):
+            base_counts = self.estimated_type_counts(base_features)
+        positions = {user_id: i for i, user_id in enumerate(base_user_ids)}
+        user_ids = list(base_user_ids)
+        # Row of each user in [base counts; update counts]
+        count_rows = list(range(len(base_user_ids)))
+        new_rows = []
+        changed_rows = []
+        for j, (user_id, vector) in enumerate(zip(update_ids, update_features)):
+            position = positions.get(user_id)
+            if position is None:
+                user_ids.append(user_id)
+                new_rows.append(vector)
+                count_rows.append(len(base_user_ids) + j)
+            else:
+                base_features[position] = vector
+                count_rows[position] = len(base_user_ids) + j
+                changed_rows.append(position)
+        if new_rows:
+            base_features = np.vstack([base_features, new_rows])
+        
+        type_counts = sparse.vstack([base_counts, self.estimated_type_counts(update_features)]).tocsr()[count_rows]
+        return self.fit_workout_recommendation_model(user_ids, base_features, log_position, type_counts, changed_rows)
+    
+    
+    @timed('preprocessing')
     def extract_workout_features(self, workouts):
-        """Extract features from workout history"""
-        if not workouts:
+        """Extract features from workout history (a list of workouts, a dict of columns or a WorkoutAggregate).
+        
+        Raises ValueError for a history that is none of these, has columns of
+        different lengths or non-numeric durations or calories.
+        """
+        if isinstance(workouts, WorkoutAggregate):
+            return workouts.features()
+        self.validate_workout_history(workouts)
+        if not self.count_rows(workouts):
             return np.zeros(10)
         
+        if isinstance(workouts, dict):
+            # Columnar history: straight into the grouped NumPy aggregation
+            codes = np.zeros(self.count_rows(workouts), dtype=np.int64)
+            return self.workout_feature_matrix(codes, 1, workouts)[0]
+        
         df = self.preprocess_workout_history(workouts)
+        types = df['type'].values if 'type' in df else []
         
         features = np.array([
             len(workouts),  # Total workouts
@@ -103,137 +365,199 @@ class MLModels:
             df['calories_burned'].sum() if len(df) > 0 else 0,  # Total calories
             df['duration_minutes'].mean() if len(df) > 0 else 30,  # Avg duration
             df['calories_burned'].mean() if len(df) > 0 else 200,  # Avg calories
-            1 if 'Strength' in df.get('type', []).values else 0,
-            1 if 'Cardio' in df.get('type', []).values else 0,
-            1 if 'Flexibility' in df.get('type', []).values else 0,
-            1 if 'HIIT' in df.get('type', []).values else 0,
+            1 if 'Strength' in types else 0,
+            1 if 'Cardio' in types else 0,
+            1 if 'Flexibility' in types else 0,
+            1 if 'HIIT' in types else 0,
             df['duration_minutes'].std() if len(df) > 1 else 0,  # Consistency
         ])
         
         return features
     
+    def validate_workout_history(self, workouts):
+        """Raise ValueError unless ``workouts`` is a list of workout dicts or a dict of equal-length columns"""
+        if workouts is None:
+            return
+        if isinstance(workouts, dict):
+            lengths = {len(column) if isinstance(column, (list, tuple, np.ndarray)) else None for column in workouts.values()}
+            if None in lengths or len(lengths) > 1:
+                raise ValueError('Columnar workout history needs list columns of the same length')
+        elif not isinstance(workouts, (list, tuple)) or not all(isinstance(workout, dict) for workout in workouts):
+            raise ValueError('Workout history must be a list of workout objects or a dict of columns')
+    
+    def load_workout_index(self, path):
+        """Registry loader for WORKOUT_RECOMMENDATION_MODEL: a ShardedIndex comes back with its shards attached"""
+        index = self.registry.load(path)
+        if isinstance(index, ShardedIndex):
+            index.attach(os.path.dirname(path), WORKOUT_SHARD_PROCESSES, self.registry.mmap_mode)
+        return index
+    
+    def build_workout_index(self, mode=None):
+        """Create an unfitted similarity index for the configured WORKOUT_INDEX_MODE"""
+        mode = mode or WORKOUT_INDEX_MODE
+        if mode == 'ivf':
+            return IVFIndex(n_neighbors=WORKOUT_NEIGHBORS, n_lists=IVF_N_LISTS, n_probe=IVF_N_PROBE)
+        if mode == 'exact':
+            from sklearn.neighbors import NearestNeighbors
+            return NearestNeighbors(n_neighbors=WORKOUT_NEIGHBORS, algorithm='ball_tree')
+        raise ValueError(f'Unknown workout index mode: {mode}')
+    
+    def flatten_users_with_workouts(self, users_with_workouts):
+        """Flatten [{user_id, workouts: [...]}, ...] into (user_ids, workouts table).
+        
+        The table's ``row`` column holds each workout's position in user_ids.
+        """
+        user_ids = []
+        rows, types, durations, calories = [], [], [], []
+        
+        for position, user in enumerate(users_with_workouts):
+            user_ids.append(user['user_id'])
+            workouts = user.get('workouts', [])
+            for workout in workouts:
+                rows.append(position)
+                types.append(workout.get('type'))
+                # Missing values become NaN, which the aggregation treats as the default
+                durations.append(workout.get('duration', np.nan))
+                calories.append(workout.get('calories_burned', np.nan))
+        
+        table = {
+            'row': np.asarray(rows, dtype=np.int64),
+            'type': np.asarray(types, dtype=object),
+            'duration': np.asarray(durations, dtype=float),
+            'calories_burned': np.asarray(calories, dtype=float)
+        }
+        
+        return user_ids, table
+    
+    def extract_workout_features_bulk(self, workouts_table, user_ids=None):
+        """Extract workout features for every user in a flat workouts table.
+        
+        ``workouts_table`` is a DataFrame or dict of columns with ``user_id``,
+        ``type``, ``duration`` and ``calories_burned`` (or ``calories``); ``date``
+        is accepted but not used. Returns (user_ids, features) where row i of
+        the (n_users, 10) matrix matches extract_workout_features() for the
+        workouts of user_ids[i]. Users listed in ``user_ids`` without workouts
+        get a zero row; workouts of users not listed are ignored.
+        """
+        table_user_ids = np.asarray(workouts_table['user_id'])
+        
+        if user_ids is None:
+            user_ids, codes = np.unique(table_user_ids, return_inverse=True)
+            table = workouts_table
+        else:
+            user_ids = np.asarray(user_ids)
+            if len(user_ids) == 0:
+                return user_ids, np.zeros((0, 10))
+            order = np.argsort(user_ids, kind='stable')
+            sorted_ids = user_ids[order]
+            positions = np.searchsorted(sorted_ids, table_user_ids).clip(0, len(user_ids) - 1)
+            known = sorted_ids[positions] == table_user_ids
+            codes = order[positions[known]]
+            table = {
+                col: np.asarray(workouts_table[col])[known]
+                for col in ('type', 'duration', 'calories_burned', 'calories') if col in workouts_table
+            }
+        
+        return user_ids, self.workout_feature_matrix(codes.reshape(-1), len(user_ids), table)
+    
+    def workout_feature_matrix(self, codes, n_users, table):
+        """Grouped NumPy aggregation behind extract_workout_features_bulk.
+        
+        ``codes`` gives each workout's row in the output matrix.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        counts = np.bincount(codes, minlength=n_users).astype(float)
+        features = np.zeros((n_users, 10))
+        
+        calories_column = 'calories_burned' if 'calories_burned' in table else 'calories'
+        dur_sum, dur_mean, dur_std = self._grouped_stats(codes, counts, table, 'duration', WORKOUT_DEFAULTS['duration'])
+        cal_sum, cal_mean, _ = self._grouped_stats(
+            codes, counts, table, calories_column, WORKOUT_DEFAULTS['calories_burned']
+        )
+        
+        features[:, 0] = counts
+        features[:, 1] = dur_sum
+        features[:, 2] = cal_sum
+        features[:, 3] = dur_mean
+        features[:, 4] = cal_mean
+        if 'type' in table:
+            types = np.asarray(table['type'])
+            for j, workout_type in enumerate(WORKOUT_FEATURE_TYPES):
+                matches = np.bincount(codes[types == workout_type], minlength=n_users)
+                features[:, 5 + j] = matches > 0
+        features[:, 9] = np.where(counts > 1, dur_std, 0)
+        
+        # Users without workouts get the same all-zero row as the per-user path
+        features[counts == 0] = 0
+        return features
+    
+    def _grouped_stats(self, codes, counts, table, column, default):
+        """Per-user sum, mean and sample std of one column.
+        
+        A missing column or NaN value means ``default``, like
+        preprocess_workout_history does for a missing key or value.
+        """
+        n_users = len(counts)
+        if column not in table:
+            return default * counts, np.full(n_users, float(default)), np.zeros(n_users)
+        
+        values = np.asarray(table[column], dtype=float)
+        values = np.where(np.isnan(values), default, values)
+        
+        total = np.bincount(codes, weights=values, minlength=n_users)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / counts
+            deviations = values - mean[codes]
+            m2 = np.bincount(codes, weights=deviations * deviations, minlength=n_users)
+            std = np.where(counts > 1, np.sqrt(m2 / (counts - 1)), 0)
+        
+        return total, mean, std
+    
     def get_workout_recommendations(self, user_data, user_history):
         """Generate personalized workout recommendations"""
-        try:
-            model = joblib.load(os.path.join(self.model_path, WORKOUT_RECOMMENDATION_MODEL))
-            user_ids = joblib.load(os.path.join(self.model_path, 'user_ids.pkl'))
-            
-            # Extract features for current user
-            user_features = self.extract_workout_features(user_history).reshape(1, -1)
-            
-            # Find similar users
-            distances, indices = model.kneighbors(user_features)
-            
-            recommendations = self.generate_workout_recommendations_logic(user_data, distances, indices)
-            
-            return recommendations
-        except:
+        model, user_ids, recommender = self.artifact_group('workout_recommendation')
+        # Extract features for current user (ValueError for a malformed history)
+        user_features = self.extract_workout_features(user_history).reshape(1, -1)
+        if model is None or user_ids is None or not np.isfinite(user_features).all():
+            # Untrained, or no usable durations/calories to compare users by
             return self.generate_default_workout_recommendations(user_data)
-    
-    def generate_workout_recommendations_logic(self, user_data, distances, indices):
-        """Generate workout recommendations based on similarity"""
-        fitness_level = user_data.get('fitness_level', 'Beginner')
-        goal = user_data.get('goal', 'Weight Loss')
         
-        recommendations = []
+        # Find similar users, including ones added since the last compaction
+        self.workout_updates.refresh()
+        distances, neighbour_ids = merge_neighbours(
+            model, user_ids, self.workout_updates, user_features, WORKOUT_NEIGHBORS
+        )
         
-        # Beginner recommendations
-        if fitness_level == 'Beginner':
-            recommendations = [
-                {
-                    'type': 'Cardio',
-                    'name': 'Brisk Walking',
-                    'duration': 30,
-                    'intensity': 'Low',
-                    'description': 'Easy-paced walking to build cardiovascular fitness',
-                    'calories_burned': 120,
-                    'difficulty': 1
-                },
-                {
-                    'type': 'Strength',
-                    'name': 'Bodyweight Training',
-                    'duration': 25,
-                    'intensity': 'Low-Medium',
-                    'description': 'Basic exercises using your body weight',
-                    'calories_burned': 150,
-                    'difficulty': 1
-                },
-                {
-                    'type': 'Flexibility',
-                    'name': 'Beginner Yoga',
-                    'duration': 20,
-                    'intensity': 'Low',
-                    'description': 'Stretching and basic yoga poses',
-                    'calories_burned': 80,
-                    'difficulty': 1
-                }
-            ]
+        ranked_types = []
+        if recommender is not None:
+            pending = {
+                user_id: self.workout_updates.vector(user_id)
+                for user_id in neighbour_ids if user_id in self.workout_updates
+            }
+            ranked_types = recommender.rank(neighbour_ids, distances, pending)
         
-        # Intermediate recommendations
-        elif fitness_level == 'Intermediate':
-            recommendations = [
-                {
-                    'type': 'Cardio',
-                    'name': 'Running',
-                    'duration': 40,
-                    'intensity': 'Medium',
-                    'description': 'Steady-state running to improve endurance',
-                    'calories_burned': 400,
-                    'difficulty': 2
-                },
-                {
-                    'type': 'Strength',
-                    'name': 'Weight Training',
-                    'duration': 45,
-                    'intensity': 'Medium',
-                    'description': 'Structured weight lifting program',
-                    'calories_burned': 350,
-                    'difficulty': 2
-                },
-                {
-                    'type': 'HIIT',
-                    'name': 'Interval Training',
-                    'duration': 30,
-                    'intensity': 'High',
-                    'description': 'High-intensity intervals for maximum results',
-                    'calories_burned': 350,
-                    'difficulty': 3
-                }
-            ]
+        return self.generate_workout_recommendations_logic(user_data, ranked_types)
+    
+    def generate_workout_recommendations_logic(self, user_data, ranked_types):
+        """Catalogue workouts for the user's level, the types similar users did most first.
         
-        # Advanced recommendations
-        else:
-            recommendations = [
-                {
-                    'type': 'Strength',
-                    'name': 'Advanced Lifting',
-                    'duration': 60,
-                    'intensity': 'Very High',
-                    'description': 'Progressive overload strength training',
-                    'calories_burned': 450,
-                    'difficulty': 4
-                },
-                {
-                    'type': 'HIIT',
-                    'name': 'CrossFit-Style Training',
-                    'duration': 45,
-                    'intensity': 'Very High',
-                    'description': 'Intense functional fitness training',
-                    'calories_burned': 500,
-                    'difficulty': 4
-                },
-                {
-                    'type': 'Endurance',
-                    'name': 'Long-Distance Running',
-                    'duration': 90,
-                    'intensity': 'Medium-High',
-                    'description': 'Building endurance and stamina',
-                    'calories_burned': 900,
-                    'difficulty': 4
-                }
-            ]
+        ``ranked_types`` is [(workout type, score)] from NeighbourRecommender.rank;
+        each workout carries its type's score as ``similar_users_share``.
+        Slots left over are filled from the level's default plan.
+        """
+        fitness_level = user_data.get('fitness_level', 'Beginner')
+        catalogue = WORKOUT_CATALOGUE.get(fitness_level, WORKOUT_CATALOGUE['Advanced'])
         
-        return recommendations
+        scores = {workout_type: score for workout_type, score in ranked_types if workout_type in catalogue}
+        types = list(scores)[:WORKOUT_RECOMMENDATIONS]
+        defaults = [workout_type for workout_type in catalogue if workout_type not in scores]
+        types += defaults[:WORKOUT_RECOMMENDATIONS - len(types)]
+        
+        return [
+            {'type': workout_type, **catalogue[workout_type],
+             'similar_users_share': round(scores.get(workout_type, 0.0), 3)}
+            for workout_type in types
+        ]
     
     def generate_default_workout_recommendations(self, user_data):
         """Generate default recommendations when model is not trained"""
@@ -262,13 +586,39 @@ class MLModels:
     
     def get_nutrition_recommendations(self, user_data):
         """Generate personalized nutrition recommendations"""
-        bmi = user_data.get('bmi', 24)
-        goal = user_data.get('goal', 'Weight Loss')
-        fitness_level = user_data.get('fitness_level', 'Beginner')
-        weight = user_data.get('weight', 70)
+        # The plan depends only on these inputs, so it is memoized on them
+        key = (
+            user_data.get('weight', 70),
+            user_data.get('height', 170),
+            user_data.get('age', 30),
+            user_data.get('fitness_level', 'Beginner'),
+            user_data.get('goal', 'Weight Loss')
+        )
+        try:
+            recommendations = self.nutrition_plan_cache(*key)
+        except TypeError:
+            # Unhashable input (e.g. a list); compute without caching
+            recommendations = self.compute_nutrition_recommendations(*key)
         
+        # Callers get their own dicts so the cached plan can't be mutated
+        return [dict(plan) for plan in recommendations]
+    
+    def nutrition_cache_stats(self):
+        """Hit/miss counters of the nutrition plan cache"""
+        info = self.nutrition_plan_cache.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'size': info.currsize,
+            'maxsize': info.maxsize,
+            'hit_ratio': info.hits / lookups if lookups else 0.0
+        }
+    
+    def compute_nutrition_recommendations(self, weight, height, age, fitness_level, goal):
+        """Compute nutrition plans for one set of inputs (uncached)"""
         # Calculate daily caloric needs
-        bmr = self.calculate_bmr(weight, user_data.get('height', 170), user_data.get('age', 30))
+        bmr = self.calculate_bmr(weight, height, age)
         tdee = bmr * self.get_activity_multiplier(fitness_level)
         
         recommendations = []
@@ -330,6 +680,97 @@ class MLModels:
         
         return recommendations
     
+    def compute_nutrition_recommendations_batch(self, weight, height, age, fitness_level, goal):
+        """Vectorized compute_nutrition_recommendations for a whole cohort.
+        
+        Takes equal-length arrays and returns a dict of arrays: ``bmr``,
+        ``tdee``, ``plan_count`` (1 or 2) and (n, 2) arrays ``type``,
+        ``daily_calories``, ``protein_grams``, ``carbs_grams``, ``fat_grams``
+        and ``description``; the second column is unused where plan_count is 1.
+        """
+        weight = np.asarray(weight, dtype=float)
+        height = np.asarray(height, dtype=float)
+        age = np.asarray(age, dtype=float)
+        fitness_level = np.asarray(fitness_level, dtype=object).astype(str)
+        goal = np.asarray(goal, dtype=object).astype(str)
+        n = len(weight)
+        
+        bmr = self.calculate_bmr(weight, height, age)
+        levels, level_codes = np.unique(fitness_level, return_inverse=True)
+        multipliers = np.array([self.get_activity_multiplier(level) for level in levels], dtype=float)
+        tdee = bmr * multipliers[level_codes.reshape(-1)]
+        
+        loss = goal == 'Weight Loss'
+        gain = goal == 'Muscle Gain'
+        maintenance = ~(loss | gain)
+        
+        daily_calories = np.trunc(np.where(loss, tdee * 0.85, np.where(gain, tdee * 1.1, tdee)))
+        # Maintenance splits macros from the unrounded TDEE
+        macro_calories = np.where(maintenance, tdee, daily_calories)
+        
+        # (protein g/kg, carb share, fat share) per plan slot: loss, gain, maintenance
+        slots = [
+            ((2.2, 0.40, 0.30), (2.5, 0.45, 0.25), (1.6, 0.45, 0.35)),
+            ((1.8, 0.45, 0.25), (2.2, 0.50, 0.20), (0.0, 0.0, 0.0))
+        ]
+        result = {
+            'bmr': bmr,
+            'tdee': tdee,
+            'plan_count': np.where(maintenance, 1, 2),
+            'type': np.empty((n, 2), dtype=object),
+            'description': np.empty((n, 2), dtype=object),
+            'daily_calories': np.repeat(daily_calories.astype(np.int64)[:, None], 2, axis=1),
+            'protein_grams': np.zeros((n, 2), dtype=np.int64),
+            'carbs_grams': np.zeros((n, 2), dtype=np.int64),
+            'fat_grams': np.zeros((n, 2), dtype=np.int64)
+        }
+        for j, (loss_split, gain_split, maintenance_split) in enumerate(slots):
+            protein, carbs, fat = (
+                np.where(loss, l, np.where(gain, g, m))
+                for l, g, m in zip(loss_split, gain_split, maintenance_split)
+            )
+            result['protein_grams'][:, j] = np.trunc(weight * protein)
+            result['carbs_grams'][:, j] = np.trunc(macro_calories * carbs / 4)
+            result['fat_grams'][:, j] = np.trunc(macro_calories * fat / 9)
+        
+        # Plan names and descriptions depend only on the goal
+        for mask, goal_name in ((loss, 'Weight Loss'), (gain, 'Muscle Gain'), (maintenance, None)):
+            plans = self.compute_nutrition_recommendations(70, 170, 30, 'Beginner', goal_name)
+            for j, plan in enumerate(plans):
+                result['type'][mask, j] = plan['type']
+                result['description'][mask, j] = plan['description']
+        
+        return result
+    
+    def get_nutrition_recommendations_batch(self, users):
+        """Nutrition recommendations for many users (list of user_data or columns)"""
+        X, errors = self.build_batch_matrix(users, NUTRITION_BATCH_FEATURES, NUTRITION_BATCH_DEFAULTS)
+        if isinstance(users, dict):
+            levels = users.get('fitness_level', ['Beginner'] * len(X))
+            goals = users.get('goal', ['Weight Loss'] * len(X))
+        else:
+            levels = [u.get('fitness_level', 'Beginner') if isinstance(u, dict) else None for u in users]
+            goals = [u.get('goal', 'Weight Loss') if isinstance(u, dict) else None for u in users]
+        # Rows with errors are skipped below; give them defaults so the math stays finite
+        if errors:
+            X[list(errors)] = [NUTRITION_BATCH_DEFAULTS[field] for field in NUTRITION_BATCH_FEATURES]
+        
+        plans = self.compute_nutrition_recommendations_batch(X[:, 0], X[:, 1], X[:, 2], levels, goals)
+        
+        fields = ('type', 'daily_calories', 'protein_grams', 'carbs_grams', 'fat_grams', 'description')
+        columns = {field: plans[field].tolist() for field in fields}
+        plan_count = plans['plan_count'].tolist()
+        results = []
+        for i in range(len(X)):
+            if i in errors:
+                results.append({'error': errors[i]})
+                continue
+            results.append({'recommendations': [
+                {field: columns[field][i][j] for field in fields}
+                for j in range(plan_count[i])
+            ]})
+        return results
+    
     def calculate_bmr(self, weight, height, age):
         """Calculate Basal Metabolic Rate (Mifflin-St Jeor equation)"""
         # Simplified calculation (assuming average male)
@@ -349,14 +790,15 @@ class MLModels:
     
     def train_progress_prediction_model(self, historical_data):
         """Train regression model for progress prediction"""
-        if not historical_data or len(historical_data) < 5:
-            return None
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.ensemble import RandomForestRegressor
         
-        df = pd.DataFrame(historical_data)
+        if self.count_rows(historical_data) < 5:
+            return None
         
         # Prepare features and target
-        X = df[['days_elapsed', 'workouts_completed', 'calories_burned', 'nutrition_compliance']].values
-        y = df['weight_change'].values
+        X = self.training_columns(historical_data, ['days_elapsed', 'workouts_completed', 'calories_burned', 'nutrition_compliance'])
+        y = self.training_columns(historical_data, ['weight_change'])[:, 0]
         
         # Scale features
         scaler = StandardScaler()
@@ -366,48 +808,143 @@ class MLModels:
         model = RandomForestRegressor(n_estimators=100, random_state=42)
         model.fit(X_scaled, y)
         
-        joblib.dump(model, os.path.join(self.model_path, PROGRESS_PREDICTION_MODEL))
-        joblib.dump(scaler, os.path.join(self.model_path, 'progress_scaler.pkl'))
+        self.save_artifact(model, PROGRESS_PREDICTION_MODEL)
+        self.save_artifact(ForestArrays.from_estimator(model, scaler), PROGRESS_PREDICTION_FOREST)
+        self.save_artifact(scaler, 'progress_scaler.pkl')
+        self.commit_artifact_group('progress_prediction')
         
         return model
     
     def predict_progress(self, user_data, user_history):
         """Predict future progress"""
-        try:
-            model = joblib.load(os.path.join(self.model_path, PROGRESS_PREDICTION_MODEL))
-            scaler = joblib.load(os.path.join(self.model_path, 'progress_scaler.pkl'))
-            
-            # Extract features
-            days = len(user_history.get('workout_history', []))
-            workouts = len(user_history.get('workout_history', []))
-            calories = sum([w.get('calories_burned', 200) for w in user_history.get('workout_history', [])])
-            compliance = user_history.get('nutrition_compliance', 0.7)
-            
-            X = np.array([[days, workouts, calories, compliance]])
-            X_scaled = scaler.transform(X)
-            
-            prediction = model.predict(X_scaled)[0]
-            
-            return {
-                'predicted_weight_change': float(prediction),
-                'direction': 'Loss' if prediction < 0 else 'Gain',
-                'days_ahead': PREDICTION_DAYS_AHEAD
-            }
-        except:
-            return {'predicted_weight_change': 0, 'direction': 'Stable', 'days_ahead': PREDICTION_DAYS_AHEAD}
+        return self.predict_progress_many([user_history])[0]
+    
+    def predict_progress_many(self, user_histories):
+        """predict_progress for several user histories, with one vectorized predict.
+        
+        Used to coalesce concurrent single-user requests (micro_batching.py).
+        A history whose features cannot be extracted falls back on its own,
+        exactly as it would in predict_progress.
+        """
+        results = [None] * len(user_histories)
+        network = self.progress_network()
+        if network is not None:
+            rows, scored = self._feature_rows(user_histories, self.extract_progress_nn_features)
+            if scored:
+                try:
+                    for i, prediction in zip(scored, network.predict(np.array(rows))):
+                        results[i] = self.format_progress_prediction(prediction)
+                except PREDICT_ERRORS as e:
+                    # Logged and counted, then the forest answers instead
+                    self._model_failed('predicting progress with the network', 'progress_network', e)
+        
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+        predict = self.forest_predictor(len(pending), 'progress_prediction')
+        if predict is not None:
+            rows, scored = self._feature_rows([user_histories[i] for i in pending], self.extract_progress_features)
+            try:
+                for j, prediction in zip(scored, predict(np.array(rows)) if scored else ()):
+                    results[pending[j]] = self.format_progress_prediction(prediction)
+            except PREDICT_ERRORS as e:
+                # Logged and counted, then answered with the 'Stable' default below
+                self._model_failed('predicting progress', 'progress_prediction', e)
+        
+        return [
+            result if result is not None else
+            {'predicted_weight_change': 0, 'direction': 'Stable', 'days_ahead': PREDICTION_DAYS_AHEAD}
+            for result in results
+        ]
+    
+    def _feature_rows(self, user_histories, extract):
+        """(feature rows, indices of the histories they came from), skipping histories that fail"""
+        rows, scored = [], []
+        for i, user_history in enumerate(user_histories):
+            try:
+                rows.append(extract(user_history))
+                scored.append(i)
+            except Exception:
+                pass
+        return rows, scored
+    
+    @timed('preprocessing')
+    def extract_progress_features(self, user_history):
+        """Extract progress model features (days, workouts, calories, compliance)"""
+        workout_history = user_history.get('workout_history', [])
+        workouts = self.count_rows(workout_history)
+        # Days since the first dated workout or log; the workout count for undated histories
+        days = self.history_rollup(user_history).days_elapsed(self.history_as_of(user_history))
+        if days is None:
+            days = workouts
+        if isinstance(workout_history, WorkoutAggregate):
+            calories = workout_history.calories_sum
+        elif isinstance(workout_history, dict):
+            if 'calories_burned' in workout_history and workouts:
+                values = np.asarray(workout_history['calories_burned'], dtype=float)
+                # cumsum adds in order, like the per-record sum below
+                calories = float(np.cumsum(np.where(np.isnan(values), 200, values))[-1])
+            else:
+                calories = 200 * workouts
+        else:
+            calories = sum([200 if w.get('calories_burned') is None else w['calories_burned'] for w in workout_history])
+        compliance = user_history.get('nutrition_compliance', 0.7)
+        
+        return [days, workouts, calories, compliance]
+    
+    def history_rollup(self, user_history):
+        """Daily/weekly Rollup of a user history: the stored one, or built from its dated records"""
+        rollup = user_history.get('rollup')
+        if rollup is None:
+            workouts = user_history.get('workout_history', [])
+            nutrition = user_history.get('nutrition_history', [])
+            rollup = Rollup.from_history(
+                None if isinstance(workouts, WorkoutAggregate) or not self.count_rows(workouts) else workouts,
+                nutrition if self.count_rows(nutrition) else None
+            )
+        return rollup
+    
+    def history_as_of(self, user_history):
+        """Day number that "today" means for a history (its ``as_of`` date, else today)"""
+        as_of = user_history.get('as_of')
+        return int(to_days([as_of])[0]) if as_of else None
+    
+    @timed('preprocessing')
+    def extract_progress_nn_features(self, user_history):
+        """Extract the progress neural network features (PROGRESS_NN_FEATURES order)"""
+        extra = [user_history.get(field, PROGRESS_NN_DEFAULTS[field]) for field in PROGRESS_NN_FEATURES[4:]]
+        return self.extract_progress_features(user_history) + extra
+    
+    def progress_network(self):
+        """The exported progress network if PROGRESS_ENGINE selects it and it exists"""
+        if PROGRESS_ENGINE != 'neural_network':
+            return None
+        return self.registry.get(PROGRESS_NN_WEIGHTS, loader=self.load_progress_network)
+    
+    def load_progress_network(self, path):
+        return ProgressNetwork.load(path, dtype=PROGRESS_NN_DTYPE)
+    
+    def format_progress_prediction(self, prediction):
+        """Format a raw weight change prediction for the API"""
+        return {
+            'predicted_weight_change': float(prediction),
+            'direction': 'Loss' if prediction < 0 else 'Gain',
+            'days_ahead': PREDICTION_DAYS_AHEAD
+        }
     
     # ============ FITNESS LEVEL CLASSIFICATION ============
     
     def train_fitness_classifier(self, user_profiles):
         """Train classifier for fitness level prediction"""
-        if not user_profiles or len(user_profiles) < 5:
-            return None
+        from sklearn.preprocessing import StandardScaler, LabelEncoder
+        from sklearn.ensemble import RandomForestClassifier
         
-        df = pd.DataFrame(user_profiles)
+        if self.count_rows(user_profiles) < 5:
+            return None
         
         # Prepare features
-        X = df[['age', 'bmi', 'workouts_per_week', 'average_duration', 'max_intensity']].values
-        y = df['fitness_level'].values
+        X = self.training_columns(user_profiles, ['age', 'bmi', 'workouts_per_week', 'average_duration', 'max_intensity'])
+        y = self.training_columns(user_profiles, ['fitness_level'], dtype=object)[:, 0]
         
         # Encode labels
         le = LabelEncoder()
@@ -421,38 +958,211 @@ class MLModels:
         model = RandomForestClassifier(n_estimators=100, random_state=42)
         model.fit(X_scaled, y_encoded)
         
-        joblib.dump(model, os.path.join(self.model_path, FITNESS_CLASSIFIER_MODEL))
-        joblib.dump(le, os.path.join(self.model_path, 'fitness_label_encoder.pkl'))
-        joblib.dump(scaler, os.path.join(self.model_path, 'fitness_scaler.pkl'))
+        self.save_artifact(model, FITNESS_CLASSIFIER_MODEL)
+        self.save_artifact(ForestArrays.from_estimator(model, scaler, le), FITNESS_CLASSIFIER_FOREST)
+        self.save_artifact(le, 'fitness_label_encoder.pkl')
+        self.save_artifact(scaler, 'fitness_scaler.pkl')
+        self.commit_artifact_group('fitness_classifier')
         
         return model
     
     def classify_fitness_level(self, age, bmi, workouts_per_week, avg_duration, max_intensity):
-        """Classify fitness level based on user metrics"""
+        """Classify fitness level based on user metrics; ValueError unless they are all finite numbers"""
+        try:
+            X = np.array([[age, bmi, workouts_per_week, avg_duration, max_intensity]], dtype=float)
+        except (TypeError, ValueError):
+            X = np.array([[np.nan]])
+        if not np.isfinite(X).all():
+            raise ValueError('age, bmi, workouts_per_week, avg_duration and max_intensity must be numbers')
+        
+        predict = self.forest_predictor(1, 'fitness_classifier')
+        if predict is None:
+            return self.default_fitness_level(workouts_per_week, avg_duration)
+        return predict(X)[0]
+    
+    def classify_fitness_levels(self, rows):
+        """classify_fitness_level for several (age, bmi, workouts_per_week, avg_duration,
+        max_intensity) tuples, with one vectorized predict for the numeric ones"""
+        numeric = [
+            i for i, row in enumerate(rows) if all(isinstance(v, (int, float)) and np.isfinite(v) for v in row)
+        ]
+        levels = [None] * len(rows)
+        if numeric:
+            predict = self.forest_predictor(len(numeric), 'fitness_classifier')
+            if predict is not None:
+                try:
+                    for i, level in zip(numeric, predict(np.array([rows[i] for i in numeric], dtype=float))):
+                        levels[i] = level
+                except Exception as e:
+                    # No fallback, as in classify_fitness_level: each caller gets a server error
+                    self._model_failed('classifying fitness levels', 'fitness_classifier', e)
+                    raise RuntimeError(f'Prediction failed: {e}') from e
+        # Anything else takes the single-row path, which rejects non-numbers
+        return [level if level is not None else self.classify_fitness_level(*rows[i]) for i, level in enumerate(levels)]
+    
+    def default_fitness_level(self, workouts_per_week, avg_duration):
+        """Default classification logic when the classifier is unavailable"""
+        if workouts_per_week >= 5 and avg_duration >= 45:
+            return 'Advanced'
+        elif workouts_per_week >= 3 and avg_duration >= 30:
+            return 'Intermediate'
+        else:
+            return 'Beginner'
+    
+    # ============ BATCH INFERENCE ============
+    
+    @timed('preprocessing')
+    def build_batch_matrix(self, users, fields, defaults):
+        """Build a float feature matrix from a list of row dicts or a dict of columns.
+        
+        Returns (X, errors) where errors maps row index to a message. Values
+        that are not finite numbers (null, 'nan', strings) are errors. Rows
+        with errors are left as NaN and must not be scored.
+        """
+        errors = {}
+        
+        if isinstance(users, dict):
+            lengths = {len(col) for col in users.values() if isinstance(col, (list, tuple))}
+            if len(lengths) > 1:
+                raise ValueError('All columns must have the same length')
+            n = lengths.pop() if lengths else 0
+            X = np.empty((n, len(fields)))
+            for j, field in enumerate(fields):
+                column = users.get(field)
+                if column is None:
+                    X[:, j] = defaults[field]
+                    continue
+                try:
+                    X[:, j] = np.asarray(column, dtype=float)
+                    bad = np.flatnonzero(~np.isfinite(X[:, j]))
+                except (TypeError, ValueError):
+                    bad = range(n)
+                for i in bad:
+                    X[i, j] = self._batch_value(column[i], field, i, errors)
+        else:
+            X = np.empty((len(users), len(fields)))
+            for i, row in enumerate(users):
+                if not isinstance(row, dict):
+                    errors[i] = 'Each user must be an object'
+                    X[i] = np.nan
+                    continue
+                for j, field in enumerate(fields):
+                    X[i, j] = self._batch_value(row.get(field, defaults[field]), field, i, errors)
+        
+        return X, errors
+    
+    def _batch_value(self, value, field, index, errors):
         try:
-            model = joblib.load(os.path.join(self.model_path, FITNESS_CLASSIFIER_MODEL))
-            le = joblib.load(os.path.join(self.model_path, 'fitness_label_encoder.pkl'))
-            scaler = joblib.load(os.path.join(self.model_path, 'fitness_scaler.pkl'))
-            
-            X = np.array([[age, bmi, workouts_per_week, avg_duration, max_intensity]])
-            X_scaled = scaler.transform(X)
-            
-            prediction = model.predict(X_scaled)[0]
-            
-            return le.inverse_transform([prediction])[0]
-        except:
-            # Default classification logic
-            if workouts_per_week >= 5 and avg_duration >= 45:
-                return 'Advanced'
-            elif workouts_per_week >= 3 and avg_duration >= 30:
-                return 'Intermediate'
+            number = float(value)
+        except (TypeError, ValueError):
+            pass
+        else:
+            if np.isfinite(number):
+                return number
+        errors.setdefault(index, f'Invalid value for {field}: {value!r}')
+        return np.nan
+    
+    def _scored_chunks(self, n, errors):
+        """Yield index arrays of error-free rows, BATCH_CHUNK_SIZE at a time"""
+        valid = np.ones(n, dtype=bool)
+        if errors:
+            valid[list(errors)] = False
+        indices = np.flatnonzero(valid)
+        for start in range(0, len(indices), BATCH_CHUNK_SIZE):
+            yield indices[start:start + BATCH_CHUNK_SIZE]
+    
+    def classify_fitness_level_batch(self, users):
+        """Classify fitness level for many users, one vectorized pass per chunk"""
+        X, errors = self.build_batch_matrix(users, FITNESS_BATCH_FEATURES, FITNESS_BATCH_DEFAULTS)
+        levels = np.empty(len(X), dtype=object)
+        for chunk in self._scored_chunks(len(X), errors):
+            predict = self.forest_predictor(len(chunk), 'fitness_classifier')
+            if predict is None:
+                # Not trained: the same heuristic as the single-user endpoint
+                levels[chunk] = self.default_fitness_levels(X[chunk, 2], X[chunk, 3])
+                continue
+            try:
+                levels[chunk] = predict(X[chunk])
+            except Exception as e:
+                self._chunk_failed('classifying fitness level batch', 'fitness_classifier', chunk, e, errors)
+        
+        return [
+            {'error': errors[i]} if i in errors else {'fitness_level': str(levels[i])}
+            for i in range(len(X))
+        ]
+    
+    def _chunk_failed(self, action, model, chunk, error, errors):
+        """Log a model failure on a chunk and give each of its rows an error entry"""
+        self._model_failed(action, model, error)
+        for i in chunk.tolist():
+            errors[i] = f'Prediction failed: {error}'
+    
+    def _model_failed(self, action, model, error):
+        """Log a model failure and count it in ml_model_errors_total"""
+        logger.error(f"Error {action}: {str(error)}")
+        metrics.MODEL_ERRORS.inc(model)
+    
+    def default_fitness_levels(self, workouts_per_week, avg_duration):
+        """Vectorized default_fitness_level"""
+        return np.where(
+            (workouts_per_week >= 5) & (avg_duration >= 45), 'Advanced',
+            np.where((workouts_per_week >= 3) & (avg_duration >= 30), 'Intermediate', 'Beginner')
+        )
+    
+    def predict_progress_batch(self, users):
+        """Predict progress for many users, one vectorized pass per chunk.
+        
+        Accepts either a list of {user_data, user_history} items or a dict of
+        columns holding the model features directly.
+        """
+        network = self.progress_network()
+        if network is not None:
+            fields, defaults, extract = PROGRESS_NN_FEATURES, PROGRESS_NN_DEFAULTS, self.extract_progress_nn_features
+        else:
+            fields, defaults, extract = PROGRESS_BATCH_FEATURES, PROGRESS_BATCH_DEFAULTS, self.extract_progress_features
+        
+        if isinstance(users, dict):
+            X, errors = self.build_batch_matrix(users, fields, defaults)
+        else:
+            X = np.empty((len(users), len(fields)))
+            errors = {}
+            for i, item in enumerate(users):
+                try:
+                    X[i] = extract(item.get('user_history', {}))
+                except Exception as e:
+                    errors[i] = f'Invalid user_history: {e}'
+                    X[i] = np.nan
+        
+        predictions = np.full(len(X), np.nan)
+        for chunk in self._scored_chunks(len(X), errors):
+            predict = network.predict if network is not None else self.forest_predictor(len(chunk), 'progress_prediction')
+            if predict is None:
+                continue  # not trained: 'Stable', like the single-user endpoint
+            try:
+                predictions[chunk] = predict(X[chunk])
+            except Exception as e:
+                model = 'progress_network' if network is not None else 'progress_prediction'
+                self._chunk_failed('predicting progress batch', model, chunk, e, errors)
+        
+        results = []
+        for i, prediction in enumerate(predictions):
+            if i in errors:
+                results.append({'error': errors[i]})
+            elif np.isnan(prediction):
+                results.append({'predicted_weight_change': 0, 'direction': 'Stable', 'days_ahead': PREDICTION_DAYS_AHEAD})
             else:
-                return 'Beginner'
+                results.append(self.format_progress_prediction(prediction))
+        return results
     
     # ============ NEURAL NETWORK FOR PROGRESS ============
     
     def build_progress_neural_network(self):
         """Build neural network for progress prediction"""
+        # TensorFlow is only needed for training; inference workers never import it
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense, Dropout
+        from tensorflow.keras.optimizers import Adam
+        
         model = Sequential([
             Dense(128, activation='relu', input_shape=(10,)),
             Dropout(0.2),
@@ -474,18 +1184,16 @@ class MLModels:
     
     def train_progress_neural_network(self, historical_data):
         """Train neural network on historical data"""
-        if not historical_data or len(historical_data) < 10:
-            return None
+        from sklearn.preprocessing import StandardScaler
         
-        df = pd.DataFrame(historical_data)
+        if self.count_rows(historical_data) < 10:
+            return None
         
         # Prepare features (expanded)
-        feature_cols = ['days_elapsed', 'workouts_completed', 'calories_burned', 
-                       'nutrition_compliance', 'sleep_hours', 'water_intake',
-                       'protein_intake', 'exercise_variety', 'workout_intensity', 'rest_days']
+        feature_cols = list(PROGRESS_NN_FEATURES)
         
-        X = df[feature_cols].values
-        y = df['weight_change'].values
+        X = self.training_columns(historical_data, feature_cols)
+        y = self.training_columns(historical_data, ['weight_change'])[:, 0]
         
         # Scale features
         scaler = StandardScaler()
@@ -495,8 +1203,13 @@ class MLModels:
         model = self.build_progress_neural_network()
         model.fit(X_scaled, y, epochs=50, batch_size=16, validation_split=0.2, verbose=0)
         
-        model.save(os.path.join(self.model_path, PROGRESS_NEURAL_NETWORK))
-        joblib.dump(scaler, os.path.join(self.model_path, 'nn_scaler.pkl'))
+        atomic_write(os.path.join(self.model_path, PROGRESS_NEURAL_NETWORK), model.save)
+        self.save_artifact(scaler, 'nn_scaler.pkl')
+        
+        # Weights + scaler as plain arrays so workers can serve it without TensorFlow
+        network = ProgressNetwork.from_keras(model, scaler)
+        atomic_write(os.path.join(self.model_path, PROGRESS_NN_WEIGHTS), network.save)
+        self.registry.invalidate()
         
         return model
     
@@ -504,10 +1217,16 @@ class MLModels:
         """Generate AI insights for user"""
         insights = []
         
+        rollup = self.history_rollup(user_history)
+        
         # Workout consistency insight
         workouts = user_history.get('workout_history', [])
-        if len(workouts) > 0:
-            workouts_per_week = len(workouts) / 4  # Approximate
+        if self.count_rows(workouts) > 0:
+            if rollup.total('workouts'):
+                recent = rollup.recent(INSIGHTS_WINDOW_DAYS, self.history_as_of(user_history))
+                workouts_per_week = recent['workouts'] / (INSIGHTS_WINDOW_DAYS / 7)
+            else:
+                workouts_per_week = self.count_rows(workouts) / 4  # Undated history: approximate
             if workouts_per_week >= 5:
                 insights.append({
                     'type': 'positive',
@@ -526,7 +1245,7 @@ class MLModels:
         
         # Nutrition insight
         nutrition = user_history.get('nutrition_history', [])
-        if nutrition:
+        if user_history.get('nutrition_count', self.count_rows(nutrition)):
             insights.append({
                 'type': 'info',
                 'message': 'Nutrition tracking is key! Continue logging your meals.'
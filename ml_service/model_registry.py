@@ -0,0 +1,269 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import joblib
+import metrics
+from config import MODEL_RELOAD_CHECK_INTERVAL, MODEL_MMAP_MODE
+
+
+def atomic_write(path, write):
+    """Create ``path`` by calling ``write(tmp_path)`` and renaming the result into place.
+
+    Readers (including ModelRegistry in other processes) see either the old
+    file or the complete new one, never a partially written artifact.
+    """
+    directory, name = os.path.split(path)
+    root, ext = os.path.splitext(name)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{root}.', suffix=ext, dir=directory or '.')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_dump(obj, path):
+    """joblib.dump through atomic_write"""
+    atomic_write(path, lambda tmp_path: joblib.dump(obj, tmp_path))
+
+
+class _ModelEntry:
+    """Immutable snapshot of one loaded artifact"""
+
+    __slots__ = ('obj', 'version', 'checked_at', 'load_time', 'size_bytes', 'loaded_at', 'loads')
+
+    def __init__(self, obj, version, checked_at, load_time=0.0, size_bytes=0, loaded_at=None, loads=0):
+        self.obj = obj
+        self.version = version
+        self.checked_at = checked_at
+        self.load_time = load_time
+        self.size_bytes = size_bytes
+        self.loaded_at = loaded_at
+        self.loads = loads
+
+
+class ModelRegistry:
+    """In-process cache of trained model artifacts.
+
+    Each artifact is deserialized once and kept resident. The file is
+    re-stat'ed at most every ``check_interval`` seconds; when its version
+    (mtime, size, inode) changes the new object is loaded off to the side
+    and swapped in with a single dict assignment, so readers always see
+    either the old or the new artifact. Missing files are cached as
+    ``None`` for the same interval so callers can fall back cheaply.
+
+    With ``mmap_mode='r'`` the NumPy arrays inside joblib artifacts are
+    memory-mapped read-only instead of copied, so every worker process
+    serving the same model directory shares one copy in the page cache.
+    Artifacts are only ever replaced by rename, never rewritten in place,
+    so an existing mapping keeps reading the old file until it is swapped.
+
+    Artifacts written by one training run (a model and its scaler, an index
+    and its user ids) form a group: get_group() loads and swaps them as one
+    snapshot, and only once commit_group() has recorded that run's files,
+    so a reader never pairs a new model with an old scaler.
+    """
+
+    def __init__(self, model_path, check_interval=MODEL_RELOAD_CHECK_INTERVAL, mmap_mode=MODEL_MMAP_MODE):
+        self.model_path = model_path
+        self.check_interval = check_interval
+        self.mmap_mode = mmap_mode
+        self._entries = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        # Served from memory vs. had to re-check the file (unlocked: approximate)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filename, loader=None):
+        """Return the loaded artifact, or None if it does not exist"""
+        entry = self._entries.get(filename)
+        if entry is not None and time.monotonic() - entry.checked_at < self.check_interval:
+            self.hits += 1
+            return entry.obj
+        self.misses += 1
+        return self._refresh(filename, loader or self.load)
+
+    def load(self, path):
+        """Default loader: joblib, memory-mapping arrays when mmap_mode is set"""
+        return joblib.load(path, mmap_mode=self.mmap_mode)
+
+    def get_many(self, *filenames):
+        """Return a tuple of artifacts, or None if any of them is missing"""
+        objs = tuple(self.get(filename) for filename in filenames)
+        if any(obj is None for obj in objs):
+            return None
+        return objs
+
+    def get_group(self, name, filenames, loaders=None):
+        """Tuple of the artifacts of group ``name`` from one training run; None for missing members.
+
+        ``loaders`` maps member filenames to custom loaders. While the files
+        on disk do not match the group's generation file (a training run is
+        still writing them) the previous snapshot is kept.
+        """
+        entry = self._entries.get(name)
+        if entry is not None and time.monotonic() - entry.checked_at < self.check_interval:
+            self.hits += 1
+            return entry.obj
+        self.misses += 1
+        return self._refresh_group(name, filenames, loaders or {})
+
+    def commit_group(self, name, filenames):
+        """Record the current files of group ``name`` as one generation; call after writing them all"""
+        versions = {
+            filename: self._file_version(os.path.join(self.model_path, filename)) for filename in filenames
+        }
+
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump(versions, f)
+
+        atomic_write(os.path.join(self.model_path, f'{name}.generation'), write)
+
+    def invalidate(self, filename=None):
+        """Force the next get() to re-check the file(s) on disk"""
+        with self._lock:
+            names = [filename] if filename else list(self._entries)
+            for name in names:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    self._entries[name] = _ModelEntry(
+                        entry.obj, entry.version, float('-inf'), entry.load_time,
+                        entry.size_bytes, entry.loaded_at, entry.loads
+                    )
+
+    def stats(self):
+        """Per-artifact load statistics"""
+        stats = {}
+        for name, entry in list(self._entries.items()):
+            stats[name] = {
+                'loaded': any(obj is not None for obj in entry.obj) if isinstance(entry.obj, tuple)
+                else entry.obj is not None,
+                'load_time_ms': round(entry.load_time * 1000, 3),
+                'size_bytes': entry.size_bytes,
+                'loaded_at': entry.loaded_at,
+                'loads': entry.loads
+            }
+        return stats
+
+    def _file_version(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _load_lock(self, filename):
+        with self._lock:
+            return self._load_locks.setdefault(filename, threading.Lock())
+
+    def _refresh(self, filename, loader):
+        # Only one thread per artifact does the stat/load; the others wait
+        # and then pick up whatever it installed.
+        with self._load_lock(filename):
+            now = time.monotonic()
+            entry = self._entries.get(filename)
+            if entry is not None and now - entry.checked_at < self.check_interval:
+                return entry.obj
+
+            path = os.path.join(self.model_path, filename)
+            version = self._file_version(path)
+            loads = entry.loads if entry is not None else 0
+
+            if entry is not None and entry.version == version:
+                new_entry = _ModelEntry(
+                    entry.obj, version, now, entry.load_time,
+                    entry.size_bytes, entry.loaded_at, loads
+                )
+            elif version is None:
+                new_entry = _ModelEntry(None, None, now, loads=loads)
+            else:
+                start = time.perf_counter()
+                try:
+                    with metrics.phase('model_load'):
+                        obj = loader(path)
+                except Exception:
+                    # Keep serving the previous artifact (or the fallback) until
+                    # the file on disk changes again.
+                    obj = entry.obj if entry is not None else None
+                    new_entry = _ModelEntry(
+                        obj, version, now, loads=loads,
+                        size_bytes=version[1], loaded_at=entry.loaded_at if entry is not None else None
+                    )
+                else:
+                    load_time = time.perf_counter() - start
+                    metrics.MODEL_LOAD.observe(load_time, filename)
+                    new_entry = _ModelEntry(
+                        obj, version, now, load_time,
+                        version[1], time.time(), loads + 1
+                    )
+
+            self._entries[filename] = new_entry
+            return new_entry.obj
+
+    def _member_versions(self, filenames):
+        return tuple(self._file_version(os.path.join(self.model_path, filename)) for filename in filenames)
+
+    def _generation(self, name, filenames):
+        """Member versions recorded by commit_group, or None if the group has no generation file"""
+        try:
+            with open(os.path.join(self.model_path, f'{name}.generation')) as f:
+                recorded = json.load(f)
+        except FileNotFoundError:
+            return None
+        return tuple(tuple(recorded[filename]) if recorded.get(filename) else None for filename in filenames)
+
+    def _refresh_group(self, name, filenames, loaders):
+        with self._load_lock(name):
+            now = time.monotonic()
+            entry = self._entries.get(name)
+            if entry is not None and now - entry.checked_at < self.check_interval:
+                return entry.obj
+
+            previous = entry.obj if entry is not None else tuple(None for _ in filenames)
+            loads = entry.loads if entry is not None else 0
+            version = self._member_versions(filenames)
+            generation = self._generation(name, filenames)
+            if entry is not None and entry.version == version:
+                new_entry = _ModelEntry(
+                    entry.obj, version, now, entry.load_time, entry.size_bytes, entry.loaded_at, loads
+                )
+            elif generation is not None and generation != version:
+                # Mid-write: keep the previous snapshot and look again next interval
+                new_entry = _ModelEntry(
+                    previous, entry.version if entry is not None else None, now,
+                    entry.load_time if entry is not None else 0.0, entry.size_bytes if entry is not None else 0,
+                    entry.loaded_at if entry is not None else None, loads
+                )
+            else:
+                start = time.perf_counter()
+                try:
+                    with metrics.phase('model_load'):
+                        objs = tuple(
+                            loaders.get(filename, self.load)(os.path.join(self.model_path, filename))
+                            if member is not None else None
+                            for filename, member in zip(filenames, version)
+                        )
+                    if self._member_versions(filenames) != version:
+                        raise RuntimeError(f'{name} was rewritten while loading')
+                except Exception:
+                    new_entry = _ModelEntry(
+                        previous, entry.version if entry is not None else None, now, loads=loads,
+                        loaded_at=entry.loaded_at if entry is not None else None
+                    )
+                else:
+                    load_time = time.perf_counter() - start
+                    metrics.MODEL_LOAD.observe(load_time, name)
+                    new_entry = _ModelEntry(
+                        objs, version, now, load_time,
+                        sum(member[1] for member in version if member is not None), time.time(), loads + 1
+                    )
+
+            self._entries[name] = new_entry
+            return new_entry.obj
@@ -0,0 +1,97 @@
+import numpy as np
+
+from ann_index import IVFIndex
+
+
+class NeighbourRecommender:
+    """Workout types ranked by how often similar users did them.
+
+    Built at training time from a sparse user x workout-type count matrix.
+    Users are grouped into k-means clusters of about ``cluster_size`` in the
+    workout feature space (the space the similarity index searches), and
+    each cluster keeps its ``top_k`` workout types with their mean share of
+    the members' workouts. Serving maps each nearest neighbour to its
+    cluster and merges those short lists, weighting each by
+    1 / (1 + the neighbour's distance), so a request is a lookup plus a
+    merge of WORKOUT_NEIGHBORS * top_k entries and never touches the count
+    matrix.
+    """
+
+    def __init__(self, types, centroids, user_clusters, top_types, top_shares):
+        self.types_ = list(types)
+        self.centroids_ = centroids
+        self.user_clusters_ = user_clusters  # {user_id: cluster}
+        self.top_types_ = top_types  # (n_clusters, top_k) column in types_
+        self.top_shares_ = top_shares  # (n_clusters, top_k) mean share of the members' workouts
+
+    def __setstate__(self, state):
+        # Memory-mapped arrays as plain ndarray views (see ForestArrays)
+        self.__dict__.update({
+            name: np.asarray(value) if isinstance(value, np.memmap) else value
+            for name, value in state.items()
+        })
+
+    @classmethod
+    def fit(cls, user_ids, features, counts, types, top_k=4, cluster_size=50, max_clusters=1024):
+        """Cluster users by ``features`` and keep each cluster's top workout types.
+
+        ``counts`` is a (n_users, len(types)) scipy sparse matrix of workouts
+        per type, rows in ``user_ids`` order.
+        """
+        from scipy import sparse
+
+        n_users = len(user_ids)
+        n_clusters = max(1, min(-(-n_users // cluster_size), max_clusters))
+        index = IVFIndex(n_lists=n_clusters).fit(features)
+        n_clusters = len(index.centroids_)
+        clusters = np.empty(n_users, dtype=np.int64)
+        clusters[index.order_] = np.repeat(np.arange(n_clusters), np.diff(index.offsets_))
+
+        # Each user's workouts as shares, so one very active user doesn't speak for the whole cluster
+        counts = sparse.csr_matrix(counts, dtype=float)
+        totals = np.asarray(counts.sum(axis=1)).ravel()
+        shares = sparse.diags(np.divide(1.0, totals, out=np.zeros(n_users), where=totals > 0)) @ counts
+        membership = sparse.csr_matrix(
+            (np.ones(n_users), (clusters, np.arange(n_users))), shape=(n_clusters, n_users)
+        )
+        sizes = np.bincount(clusters, minlength=n_clusters)
+        cluster_shares = (membership @ shares).toarray() / np.maximum(sizes, 1)[:, None]
+
+        top_types = np.argsort(-cluster_shares, axis=1, kind='stable')[:, :min(top_k, len(types))]
+        top_shares = np.take_along_axis(cluster_shares, top_types, axis=1)
+        return cls(
+            types, index.centroids_, dict(zip(user_ids, clusters.tolist())),
+            top_types.astype(np.int32), top_shares
+        )
+
+    def cluster_of(self, user_id, vectors):
+        """Stored cluster of a training user, nearest centroid for a user in ``vectors``; None if unknown"""
+        vector = vectors.get(user_id)
+        if vector is not None:
+            return int(np.argmin(((self.centroids_ - vector) ** 2).sum(axis=1)))
+        return self.user_clusters_.get(user_id)
+
+    def rank(self, neighbour_ids, distances, vectors=None):
+        """[(workout type, score)] for the neighbours, best first; scores sum to at most 1.
+
+        ``vectors`` maps neighbours that are not (or no longer) as they were
+        at training, e.g. pending incremental updates, to their current
+        feature vectors. Neighbours unknown to this model are skipped.
+        """
+        vectors = vectors or {}
+        clusters, weights = [], []
+        for user_id, distance in zip(neighbour_ids, distances):
+            cluster = self.cluster_of(user_id, vectors)
+            if cluster is not None:
+                clusters.append(cluster)
+                weights.append(1.0 / (1.0 + distance))
+        if not clusters:
+            return []
+        weights = np.asarray(weights) / np.sum(weights)
+        scores = np.bincount(
+            self.top_types_[clusters].ravel(),
+            weights=(self.top_shares_[clusters] * weights[:, None]).ravel(),
+            minlength=len(self.types_)
+        )
+        order = np.argsort(-scores, kind='stable')
+        return [(self.types_[i], float(scores[i])) for i in order if scores[i] > 0]
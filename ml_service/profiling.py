@@ -0,0 +1,173 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when profiling is enabled and it carries the
+``X-Profile`` header (or ``?profile=``), or when it is the Nth request under
+the sampled mode. The flag value picks the engine (``cprofile`` or
+``sampling``; anything else uses PROFILE_ENGINE), unless PROFILE_TOKEN is set,
+in which case the value must be the token. Two engines:
+
+  * cprofile - deterministic cProfile of the handler, dumped as a ``.prof``
+               file (``python -m pstats``, snakeviz)
+  * sampling - a background thread samples the handler thread's stack every
+               PROFILE_SAMPLE_INTERVAL_MS and writes collapsed stacks
+               (``frame;frame;frame count``, for flamegraph.pl / speedscope)
+
+Only one request per process is profiled at a time; others run normally.
+Dumps are written after the response is sent, into PROFILE_PATH, which is
+capped at PROFILE_MAX_FILES by deleting the oldest dumps.
+"""
+
+import cProfile
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from config import PROFILE_ENGINE, PROFILE_MAX_FILES, PROFILE_PATH, PROFILE_SAMPLE_INTERVAL_MS
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ('cprofile', 'sampling')
+EXTENSIONS = {'cprofile': '.prof', 'sampling': '.collapsed'}
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread"""
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class RequestProfile:
+    """One profiled request: start() before the handler, stop() after, dump() once the response is sent"""
+
+    def __init__(self, engine, label):
+        self.engine = engine
+        self.label = label
+        self.profile_id = f'{time.strftime("%Y%m%dT%H%M%S")}-{uuid.uuid4().hex[:8]}'
+        self.duration = None
+        self._profiler = None
+
+    @property
+    def filename(self):
+        return self.profile_id + EXTENSIONS[self.engine]
+
+    def start(self):
+        if self.engine == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = StackSampler(threading.get_ident())
+            self._profiler.start()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        if self.engine == 'cprofile':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        self.duration = time.perf_counter() - self._started
+
+    def dump(self, directory=PROFILE_PATH, max_files=PROFILE_MAX_FILES):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.filename)
+        if self.engine == 'cprofile':
+            self._profiler.dump_stats(path)
+        else:
+            self._profiler.dump(path)
+        logger.info(f"Profile {self.profile_id} ({self.label}, {self.duration * 1000:.1f} ms) written to {path}")
+        rotate(directory, max_files)
+        return path
+
+
+def rotate(directory, max_files):
+    """Delete the oldest profile dumps beyond max_files"""
+    dumps = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and os.path.splitext(entry.name)[1] in EXTENSIONS.values():
+            try:
+                dumps.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue  # removed by another worker
+    dumps.sort()
+    for _, path in dumps[:max(len(dumps) - max_files, 0)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class RequestProfiler:
+    """Decides which requests to profile and makes sure only one runs at a time"""
+
+    def __init__(self, enabled, token='', sample_every=0, engine=PROFILE_ENGINE):
+        if engine not in ENGINES:
+            raise ValueError(f'engine must be one of {ENGINES}: {engine!r}')
+        self.enabled = enabled
+        self.token = token
+        self.sample_every = sample_every
+        self.engine = engine
+        self._counter = itertools.count(1)
+        self._active = threading.Lock()
+
+    def engine_for(self, flag):
+        """Engine to profile a request with, or None. ``flag`` is the header/query value (or None)"""
+        if flag is not None and self.enabled:
+            if not self.token:
+                return flag if flag in ENGINES else self.engine
+            if flag == self.token:
+                return self.engine
+        if self.sample_every > 0 and next(self._counter) % self.sample_every == 0:
+            return self.engine
+        return None
+
+    def begin(self, flag, label):
+        """Start profiling this request if it qualifies; returns the RequestProfile or None"""
+        engine = self.engine_for(flag)
+        if engine is None or not self._active.acquire(blocking=False):
+            return None
+        profile = RequestProfile(engine, label)
+        try:
+            profile.start()
+        except Exception:
+            self._active.release()
+            raise
+        return profile
+
+    def end(self, profile):
+        try:
+            profile.stop()
+        finally:
+            self._active.release()
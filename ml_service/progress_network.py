@@ -0,0 +1,106 @@
+import numpy as np
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+    'tanh': np.tanh
+}
+
+DTYPES = ('float64', 'float32', 'int8')
+
+
+class ProgressNetwork:
+    """NumPy forward pass of the exported progress neural network.
+
+    Holds the Dense layers' weights plus the ``nn_scaler.pkl`` mean/scale,
+    so a worker can score the network without importing TensorFlow or
+    sklearn. Dropout layers are identity at inference time and are not
+    exported. Weights can be held as float64, float32 or int8 (symmetric,
+    one scale per output unit, dequantized inside the matmul).
+    """
+
+    def __init__(self, weights, biases, activations, mean, scale, dtype='float32'):
+        if dtype not in DTYPES:
+            raise ValueError(f'dtype must be one of {DTYPES}: {dtype!r}')
+        self.dtype = dtype
+        compute = np.float64 if dtype == 'float64' else np.float32
+        self.mean = np.asarray(mean, dtype=compute)
+        self.scale = np.asarray(scale, dtype=compute)
+        self.biases = [np.asarray(b, dtype=compute) for b in biases]
+        self.activations = list(activations)
+        for name in self.activations:
+            if name not in ACTIVATIONS:
+                raise ValueError(f'Unsupported activation: {name}')
+
+        if dtype == 'int8':
+            self.weights, self.weight_scales = [], []
+            for w in weights:
+                w = np.asarray(w, dtype=np.float32)
+                w_scale = np.abs(w).max(axis=0) / 127
+                w_scale[w_scale == 0] = 1
+                self.weights.append(np.round(w / w_scale).astype(np.int8))
+                self.weight_scales.append(w_scale.astype(np.float32))
+        else:
+            self.weights = [np.asarray(w, dtype=compute) for w in weights]
+            self.weight_scales = None
+
+    @classmethod
+    def from_keras(cls, model, scaler):
+        """Extract the Dense layers of a trained Keras model"""
+        weights, biases, activations = [], [], []
+        for layer in model.layers:
+            params = layer.get_weights()
+            if not params:
+                continue  # Dropout and other weightless layers
+            weights.append(params[0])
+            biases.append(params[1])
+            activations.append(layer.get_config().get('activation', 'linear'))
+        return cls(weights, biases, activations, scaler.mean_, scaler.scale_, dtype='float64')
+
+    def save(self, path):
+        """Write the network as one compact .npz array file"""
+        arrays = {
+            'mean': self.mean.astype(np.float64),
+            'scale': self.scale.astype(np.float64),
+            'activations': np.array(self.activations)
+        }
+        # Keras trains in float32, so float32 weights are stored losslessly
+        for i, (w, b) in enumerate(zip(self.dequantized_weights(), self.biases)):
+            arrays[f'weights_{i}'] = w.astype(np.float32)
+            arrays[f'bias_{i}'] = b.astype(np.float32)
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path, dtype='float32'):
+        with np.load(path) as data:
+            activations = [str(a) for a in data['activations']]
+            n_layers = len(activations)
+            return cls(
+                [data[f'weights_{i}'] for i in range(n_layers)],
+                [data[f'bias_{i}'] for i in range(n_layers)],
+                activations, data['mean'], data['scale'], dtype=dtype
+            )
+
+    def dequantized_weights(self):
+        if self.weight_scales is None:
+            return self.weights
+        return [w.astype(np.float32) * s for w, s in zip(self.weights, self.weight_scales)]
+
+    @property
+    def n_features(self):
+        return len(self.mean)
+
+    def predict(self, X):
+        """Predicted weight change for each row of raw (unscaled) features"""
+        compute = self.mean.dtype
+        h = (np.asarray(X, dtype=compute).reshape(-1, self.n_features) - self.mean) / self.scale
+        for i, (w, b, activation) in enumerate(zip(self.weights, self.biases, self.activations)):
+            if self.weight_scales is None:
+                h = h @ w
+            else:
+                h = (h @ w.astype(compute)) * self.weight_scales[i]
+            h += b
+            h = ACTIVATIONS[activation](h)
+        return h[:, 0]
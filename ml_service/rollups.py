@@ -0,0 +1,192 @@
+import datetime
+
+import numpy as np
+
+from workout_aggregates import WORKOUT_DEFAULTS
+
+# One column per bucketed quantity
+FIELDS = (
+    'workouts', 'minutes', 'calories_burned',
+    'nutrition_logs', 'calories', 'protein_grams', 'carbs_grams', 'fat_grams'
+)
+FIELD_INDEX = {field: i for i, field in enumerate(FIELDS)}
+
+# Same per-log defaults as MLModels.preprocess_nutrition_history
+NUTRITION_DEFAULTS = {'calories': 2000, 'protein_grams': 100, 'carbs_grams': 250, 'fat_grams': 70}
+
+
+def to_days(dates):
+    """Day numbers (days since 1970-01-01) of date strings; -1 where a date is missing or unparseable"""
+    dates = np.asarray(dates, dtype=object)
+    valid = np.array([isinstance(d, str) and d != '' for d in dates], dtype=bool)
+    days = np.full(len(dates), -1, dtype=np.int64)
+    if valid.any():
+        try:
+            # ISO dates, the common case, in one vectorized pass
+            days[valid] = np.array([d[:10] for d in dates[valid]], dtype='datetime64[D]').astype(np.int64)
+        except ValueError:
+            days[valid] = [parse_day(d) for d in dates[valid]]
+    return days
+
+
+def parse_day(date):
+    """Day number of one date string in any format pandas reads, or -1"""
+    try:
+        return int(np.datetime64(date[:10], 'D').astype(np.int64))
+    except ValueError:
+        pass
+    import pandas as pd
+
+    parsed = pd.to_datetime(date, errors='coerce')
+    return -1 if pd.isna(parsed) else int(np.datetime64(parsed.date(), 'D').astype(np.int64))
+
+
+def to_number(value, default):
+    """float(value), or ``default`` for a missing, NaN or non-numeric value"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if number != number else number
+
+
+def today():
+    return int(np.datetime64(datetime.date.today(), 'D').astype(np.int64))
+
+
+def week_of(day):
+    # Day 0 (1970-01-01) was a Thursday; weeks start on Monday
+    return (day + 3) // 7
+
+
+def bucket_values(records, numeric_defaults, count_field):
+    """(days, values) of a list of records or dict of columns: one FIELDS row per dated record"""
+    if isinstance(records, dict):
+        n = len(next(iter(records.values()), ()))
+        column = lambda name: records.get(name, [None] * n)
+    else:
+        n = len(records)
+        column = lambda name: [record.get(name) for record in records]
+
+    days = to_days(column('date'))
+    values = np.zeros((n, len(FIELDS)))
+    values[:, FIELD_INDEX[count_field]] = 1
+    for source, (field, default) in numeric_defaults.items():
+        values[:, FIELD_INDEX[field]] = [to_number(v, default) for v in column(source)]
+    dated = days >= 0
+    return days[dated], values[dated]
+
+
+def workout_buckets(workouts):
+    return bucket_values(workouts, {
+        'duration': ('minutes', WORKOUT_DEFAULTS['duration']),
+        'calories_burned': ('calories_burned', WORKOUT_DEFAULTS['calories_burned'])
+    }, 'workouts')
+
+
+def nutrition_buckets(logs):
+    return bucket_values(logs, {
+        name: (name, default) for name, default in NUTRITION_DEFAULTS.items()
+    }, 'nutrition_logs')
+
+
+class Rollup:
+    """Daily and weekly totals of one user's workouts and nutrition logs.
+
+    ``daily`` is an (n_days, len(FIELDS)) array starting at ``start_day``
+    and ``weekly`` the same per Monday-based week, so a range query sums at
+    most a few daily rows plus one row per whole week, however long the
+    history. ``first_day`` is the first dated record and ``all_time`` the
+    FIELDS totals over every record; both cover records before
+    ``start_day`` when only a recent window was loaded.
+    """
+
+    __slots__ = ('start_day', 'daily', 'weekly', 'first_day', 'all_time')
+
+    def __init__(self, start_day=None, daily=None, first_day=None, all_time=None):
+        self.start_day = start_day
+        self.daily = np.zeros((0, len(FIELDS))) if daily is None else np.asarray(daily, dtype=float)
+        self.first_day = first_day if first_day is not None else (start_day if len(self.daily) else None)
+        self.all_time = None if all_time is None else np.asarray(all_time, dtype=float)
+        self._rebuild_weekly()
+
+    @classmethod
+    def from_history(cls, workouts=None, nutrition_logs=None):
+        rollup = cls()
+        if workouts is not None:
+            rollup.add(*workout_buckets(workouts))
+        if nutrition_logs is not None:
+            rollup.add(*nutrition_buckets(nutrition_logs))
+        return rollup
+
+    def __len__(self):
+        return len(self.daily)
+
+    @property
+    def end_day(self):
+        """One past the last bucketed day"""
+        return self.start_day + len(self.daily) if self.start_day is not None else None
+
+    def _rebuild_weekly(self):
+        if not len(self.daily):
+            self.weekly = np.zeros((0, len(FIELDS)))
+            return
+        weeks = week_of(np.arange(self.start_day, self.end_day)) - week_of(self.start_day)
+        self.weekly = np.zeros((weeks[-1] + 1, len(FIELDS)))
+        np.add.at(self.weekly, weeks, self.daily)
+
+    def add(self, days, values):
+        """Add FIELDS rows ``values`` on day numbers ``days``"""
+        days = np.asarray(days, dtype=np.int64)
+        if not len(days):
+            return
+        values = np.asarray(values, dtype=float)
+        start = int(days.min()) if self.start_day is None else min(self.start_day, int(days.min()))
+        end = int(days.max()) + 1 if self.start_day is None else max(self.end_day, int(days.max()) + 1)
+        if start != self.start_day or end != self.end_day:
+            grown = np.zeros((end - start, len(FIELDS)))
+            if len(self.daily):
+                grown[self.start_day - start:self.end_day - start] = self.daily
+            self.daily, self.start_day = grown, start
+            self._rebuild_weekly()
+        np.add.at(self.daily, days - start, values)
+        np.add.at(self.weekly, week_of(days) - week_of(start), values)
+        if self.all_time is not None:
+            self.all_time = self.all_time + values.sum(axis=0)
+        self.first_day = start if self.first_day is None else min(self.first_day, start)
+
+    def totals(self, first_day, last_day):
+        """FIELDS totals over days first_day..last_day inclusive, as a dict"""
+        total = np.zeros(len(FIELDS))
+        if len(self.daily):
+            first, end = max(first_day, self.start_day), min(last_day + 1, self.end_day)
+            if first < end:
+                # Partial weeks at either end from daily rows, whole weeks from weekly rows
+                first_week_start = (week_of(first - 1) + 1) * 7 - 3
+                last_week_end = week_of(end) * 7 - 3
+                if first_week_start >= last_week_end:
+                    total += self.daily[first - self.start_day:end - self.start_day].sum(axis=0)
+                else:
+                    base = week_of(self.start_day)
+                    total += self.daily[first - self.start_day:first_week_start - self.start_day].sum(axis=0)
+                    total += self.weekly[week_of(first_week_start) - base:week_of(last_week_end) - base].sum(axis=0)
+                    total += self.daily[last_week_end - self.start_day:end - self.start_day].sum(axis=0)
+        return dict(zip(FIELDS, total.tolist()))
+
+    def total(self, field):
+        """All-time total of one field"""
+        if self.all_time is not None:
+            return float(self.all_time[FIELD_INDEX[field]])
+        return float(self.weekly[:, FIELD_INDEX[field]].sum())
+
+    def recent(self, days, as_of=None):
+        """Totals over the ``days`` days ending on ``as_of`` (default today)"""
+        as_of = today() if as_of is None else as_of
+        return self.totals(as_of - days + 1, as_of)
+
+    def days_elapsed(self, as_of=None):
+        """Days from the first dated record to ``as_of`` (default today), or None"""
+        if self.first_day is None:
+            return None
+        as_of = today() if as_of is None else as_of
+        return max(as_of - self.first_day, 0)
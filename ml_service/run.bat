@@ -55,6 +55,10 @@ echo Service running on http://localhost:5001
 echo ================================
 echo.
 
-python app.py
+if "%ML_SERVER%"=="asgi" (
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5001
+) else (
+    python app.py
+)
 
 pause
@@ -43,4 +43,9 @@ echo "================================"
 echo "Starting ML Service..."
 echo "Service running on http://localhost:5001"
 echo "================================"
-python app.py
+if [ "$ML_SERVER" = "asgi" ]; then
+    # Async front end with a pool of INFERENCE_WORKERS inference processes
+    uvicorn asgi_app:app --host 0.0.0.0 --port "${ML_PORT:-5001}"
+else
+    python app.py
+fi
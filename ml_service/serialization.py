@@ -0,0 +1,134 @@
+"""
+Request and response codecs for the Flask app.
+
+JSON goes through orjson when it is installed (several times faster than the
+json module on large histories), and MessagePack is negotiated by content
+type: a request body sent as ``Content-Type: application/msgpack`` is decoded
+by get_json(), and a client sending ``Accept: application/msgpack`` gets
+jsonify() responses encoded as MessagePack. Both libraries are optional; the
+service falls back to the json module and answers MessagePack requests with
+415 when msgpack is missing.
+"""
+
+import json
+
+import numpy as np
+from flask import Request, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.exceptions import BadRequest, UnsupportedMediaType
+from werkzeug.http import parse_accept_header
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+
+def encode_default(obj):
+    """Fallback encoder: NumPy values, then whatever Flask's JSON encoder supports"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return DefaultJSONProvider.default(obj)
+
+
+class CodecRequest(Request):
+    """Request whose get_json() also decodes MessagePack bodies"""
+
+    def get_json(self, force=False, silent=False, cache=True):
+        if self.mimetype not in MSGPACK_MIMETYPES:
+            return super().get_json(force=force, silent=silent, cache=cache)
+        if msgpack is None:
+            if silent:
+                return None
+            raise UnsupportedMediaType('MessagePack support is not installed (pip install msgpack)')
+        try:
+            return msgpack.unpackb(self.get_data(cache=cache), raw=False, strict_map_key=False)
+        except Exception as e:
+            if silent:
+                return None
+            raise BadRequest(f'Failed to decode MessagePack body: {e}')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson when available, with MessagePack responses on request"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._orjson_dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def _orjson_dumps(self, obj):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=encode_default, option=option)
+
+    def response(self, *args, **kwargs):
+        if wants_msgpack():
+            obj = self._prepare_response_obj(args, kwargs)
+            body = msgpack.packb(obj, default=encode_default, use_bin_type=True)
+            return self._app.response_class(body, mimetype=MSGPACK_MIMETYPES[0])
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._orjson_dumps(obj) + b'\n', mimetype=self.mimetype)
+
+
+def wants_msgpack():
+    """True if the current request prefers a MessagePack response"""
+    if msgpack is None or not has_request_context():
+        return False
+    return prefers_msgpack(request.accept_mimetypes)
+
+
+def prefers_msgpack(accept):
+    """True if a parsed Accept header ranks MessagePack above JSON"""
+    return accept.best_match(('application/json',) + MSGPACK_MIMETYPES) in MSGPACK_MIMETYPES
+
+
+# ============ OUTSIDE FLASK (asgi_app.py) ============
+
+def decode_body(body, mimetype):
+    """Decode a request body by its content type (MessagePack or JSON); raises BadRequest"""
+    if mimetype in MSGPACK_MIMETYPES:
+        if msgpack is None:
+            raise UnsupportedMediaType('MessagePack support is not installed (pip install msgpack)')
+        try:
+            return msgpack.unpackb(body, raw=False, strict_map_key=False)
+        except Exception as e:
+            raise BadRequest(f'Failed to decode MessagePack body: {e}')
+    try:
+        return orjson.loads(body) if orjson is not None else json.loads(body)
+    except ValueError as e:
+        raise BadRequest(f'Failed to decode JSON object: {e}')
+
+
+def encode_body(obj, accept_header=''):
+    """(body, content type) of a response object, MessagePack if the Accept header prefers it"""
+    if msgpack is not None and accept_header and prefers_msgpack(parse_accept_header(accept_header, MIMEAccept)):
+        return msgpack.packb(obj, default=encode_default, use_bin_type=True), MSGPACK_MIMETYPES[0]
+    # Sorted keys, like Flask's JSON responses
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+        body = orjson.dumps(obj, default=encode_default, option=option)
+    else:
+        body = json.dumps(obj, default=encode_default, sort_keys=True).encode()
+    return body + b'\n', 'application/json'
+
@@ -0,0 +1,219 @@
+import multiprocessing
+import os
+import uuid
+import weakref
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+
+from model_registry import atomic_dump
+
+# IndexShard of this shard worker process, loaded by _load_shard
+_shard = None
+
+
+def shard_of(user_ids, n_shards):
+    """Shard number of each user id: a CRC32 of its text, stable across processes and rebuilds"""
+    return np.array([zlib.crc32(str(user_id).encode()) % n_shards for user_id in user_ids], dtype=np.int64)
+
+
+def shard_filename(shard):
+    return f'workout_index_shard_{shard}.pkl'
+
+
+class IndexShard:
+    """A similarity index over one subset of users.
+
+    ``rows`` holds each member's position in the full user list
+    (user_ids.pkl), so results from every shard share one numbering.
+    """
+
+    def __init__(self, index, rows, build_id):
+        self.index = index
+        self.rows = rows
+        self.build_id = build_id
+
+    def kneighbors(self, X, k):
+        """(distances, rows) of this shard's k nearest users, each (n_queries, <= k)"""
+        k = min(k, len(self.rows))
+        if k == 0:
+            return np.empty((len(X), 0)), np.empty((len(X), 0), dtype=np.int64)
+        distances, indices = self.index.kneighbors(X, n_neighbors=k)
+        return distances, np.asarray(self.rows)[indices]
+
+
+def build_shard(path, features_path, rows, mode, build_id):
+    """Fit one shard over rows of the saved feature matrix and write it to ``path``; returns its size.
+
+    Module-level so shards can be built in parallel worker processes; each
+    worker maps the feature matrix instead of receiving it pickled.
+    """
+    from ml_models import MLModels
+
+    index = None
+    if len(rows):
+        features = np.load(features_path, mmap_mode='r')
+        index = MLModels().build_workout_index(mode)
+        index.fit(np.asarray(features[rows], dtype=float))
+    atomic_dump(IndexShard(index, rows, build_id), path)
+    return len(rows)
+
+
+def _load_shard(path, build_id):
+    global _shard
+    _shard = joblib.load(path)
+    if _shard.build_id != build_id:
+        raise RuntimeError(f'{os.path.basename(path)} was rebuilt since the index was loaded')
+
+
+def _shard_build_id():
+    return _shard.build_id
+
+
+def _query_shard(X, k):
+    return _shard.kneighbors(X, k)
+
+
+def _shutdown(pools):
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ShardedIndex:
+    """Scatter-gather nearest neighbour search over users split across shard files.
+
+    Users are assigned to ``n_shards`` shards by a hash of their id, and
+    each shard is an independent index (exact ball tree or IVF) in its own
+    file, so shards are built in parallel and a shard whose users have not
+    changed is reused as is. The pickled object is only the manifest (shard
+    files and their build ids); attach() loads the shards, either into this
+    process or into one worker process per shard. A query is sent to every
+    shard and the per-shard top k are merged into the global top k, so
+    results are the same as one index over all users (exact shards give
+    exact results). Exposes the ``kneighbors`` interface of sklearn's
+    NearestNeighbors, with indices into user_ids.pkl.
+    """
+
+    def __init__(self, n_neighbors, shard_files, build_ids, sizes, mode):
+        self.n_neighbors = n_neighbors
+        self.shard_files_ = list(shard_files)
+        self.build_ids_ = list(build_ids)
+        self.sizes_ = list(sizes)
+        self.mode = mode
+        self.n_samples_fit_ = sum(sizes)
+        self._shards = None
+        self._pools = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_shards'] = state['_pools'] = None
+        return state
+
+    @property
+    def n_shards(self):
+        return len(self.shard_files_)
+
+    # ============ BUILD ============
+
+    @classmethod
+    def build(cls, directory, user_ids, features_path, n_shards, mode='exact', n_neighbors=5,
+              workers=1, previous=None, changed_rows=None):
+        """Partition users across ``n_shards`` shard files and build them; returns the manifest.
+
+        ``features_path`` is the saved (n_users, n_features) matrix, rows in
+        ``user_ids`` order. With ``previous`` (the manifest being replaced,
+        over the first ``previous.n_samples_fit_`` of the same user_ids) and
+        ``changed_rows``, only shards holding a changed or new row are
+        rebuilt. Shards are built in up to ``workers`` processes.
+        """
+        assignment = shard_of(user_ids, n_shards)
+        shard_rows = [np.flatnonzero(assignment == shard) for shard in range(n_shards)]
+        build_ids = [uuid.uuid4().hex for _ in range(n_shards)]
+        dirty = set(range(n_shards))
+        if previous is not None and changed_rows is not None and previous.n_shards == n_shards \
+                and previous.mode == mode and previous.n_samples_fit_ <= len(user_ids):
+            new_rows = np.arange(previous.n_samples_fit_, len(user_ids))
+            dirty = set(assignment[np.concatenate([np.asarray(changed_rows, dtype=np.int64), new_rows])].tolist())
+            for shard in set(range(n_shards)) - dirty:
+                build_ids[shard] = previous.build_ids_[shard]
+
+        tasks = [
+            (os.path.join(directory, shard_filename(shard)), features_path, shard_rows[shard], mode, build_ids[shard])
+            for shard in sorted(dirty)
+        ]
+        if workers > 1 and len(tasks) > 1:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context) as pool:
+                for future in [pool.submit(build_shard, *task) for task in tasks]:
+                    future.result()
+        else:
+            for task in tasks:
+                build_shard(*task)
+
+        return cls(
+            n_neighbors, [shard_filename(shard) for shard in range(n_shards)], build_ids,
+            [len(rows) for rows in shard_rows], mode
+        )
+
+    # ============ LOAD ============
+
+    def attach(self, directory, processes=False, mmap_mode=None):
+        """Load the shards from ``directory``, in this process or one worker process each.
+
+        Raises if a shard file no longer matches this manifest (rebuilt
+        since), so a reloading ModelRegistry keeps the previous index.
+        """
+        paths = [os.path.join(directory, filename) for filename in self.shard_files_]
+        if not processes:
+            shards = [joblib.load(path, mmap_mode=mmap_mode) for path in paths]
+            for path, shard, build_id in zip(paths, shards, self.build_ids_):
+                if shard.build_id != build_id:
+                    raise RuntimeError(f'{os.path.basename(path)} was rebuilt since the index was loaded')
+            self._shards = shards
+            return self
+
+        context = multiprocessing.get_context('spawn')
+        pools = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_load_shard, initargs=(path, build_id))
+            for path, build_id in zip(paths, self.build_ids_)
+        ]
+        try:
+            # Starts every worker and waits until its shard is loaded
+            for future in [pool.submit(_shard_build_id) for pool in pools]:
+                future.result()
+        except Exception:
+            _shutdown(pools)
+            raise
+        self._pools = pools
+        weakref.finalize(self, _shutdown, pools)
+        return self
+
+    def close(self):
+        """Stop the shard worker processes and drop the loaded shards"""
+        if self._pools is not None:
+            _shutdown(self._pools)
+        self._shards = self._pools = None
+
+    # ============ QUERY ============
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """Exact merge of every shard's k nearest neighbours, sorted by ascending distance"""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        k = min(n_neighbors or self.n_neighbors, self.n_samples_fit_)
+        if self._pools is not None:
+            futures = [pool.submit(_query_shard, X, k) for pool in self._pools]
+            results = [future.result() for future in futures]
+        elif self._shards is not None:
+            results = [shard.kneighbors(X, k) for shard in self._shards]
+        else:
+            raise RuntimeError('ShardedIndex is not attached to its shard files')
+
+        distances = np.concatenate([d for d, _ in results], axis=1)
+        rows = np.concatenate([r for _, r in results], axis=1)
+        top = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        indices = np.take_along_axis(rows, top, axis=1)
+        if return_distance:
+            return np.take_along_axis(distances, top, axis=1), indices
+        return indices
@@ -7,6 +7,7 @@ Tests all endpoints and validates responses
 import requests
 import json
 import sys
+import time
 from datetime import datetime
 
 # ML Service URL
@@ -37,6 +38,29 @@ class MLServiceTester:
             self.failed += 1
             return False
     
+    def test_readiness(self):
+        """Test that warm-up finishes and readiness reports its timings"""
+        print("\n" + "="*50)
+        print("TEST: Readiness")
+        print("="*50)
+        try:
+            deadline = time.time() + 60
+            while True:
+                response = requests.get(f"{self.base_url}/api/ml/ready", timeout=5)
+                if response.status_code != 503 or time.time() > deadline:
+                    break
+                time.sleep(0.5)
+            assert response.status_code == 200
+            data = response.json()
+            assert data['success'] == True
+            print(f"✅ PASSED: Service is ready (warm-up: {data['warmup_ms']} ms)")
+            self.passed += 1
+            return True
+        except Exception as e:
+            print(f"❌ FAILED: {str(e)}")
+            self.failed += 1
+            return False
+    
     def test_workout_recommendations(self):
         """Test workout recommendations endpoint"""
         print("\n" + "="*50)
@@ -250,6 +274,7 @@ class MLServiceTester:
         
         # Run all tests
         self.test_health_check()
+        self.test_readiness()
         self.test_workout_recommendations()
         self.test_nutrition_recommendations()
         self.test_progress_prediction()
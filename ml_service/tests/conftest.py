@@ -0,0 +1,63 @@
+"""
+Shared fixtures. Model, data and feature store paths point at a throwaway
+directory before config is imported, so the tests never touch ./models.
+
+Run from ml_service/:
+    python -m pytest -q tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+ROOT = tempfile.mkdtemp(prefix='ml-service-tests-')
+os.environ['MODEL_PATH'] = os.path.join(ROOT, 'models')
+os.environ['DATA_PATH'] = os.path.join(ROOT, 'data')
+os.environ['FEATURE_STORE_PATH'] = os.path.join(ROOT, 'data', 'feature_store.sqlite3')
+os.environ['WARMUP_ON_START'] = 'false'
+for directory in ('models', 'data'):
+    os.makedirs(os.path.join(ROOT, directory), exist_ok=True)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LEVELS = np.array(['Beginner', 'Intermediate', 'Advanced', 'Elite'], dtype=object)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(ROOT, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def trained_models():
+    """The app's MLModels with small progress and fitness forests trained"""
+    from app import ml_models
+
+    rng = np.random.default_rng(0)
+    n_rows = 400
+    ml_models.train_progress_prediction_model({
+        'days_elapsed': rng.integers(1, 365, n_rows).astype(float),
+        'workouts_completed': rng.integers(0, 200, n_rows).astype(float),
+        'calories_burned': rng.uniform(0, 80000, n_rows),
+        'nutrition_compliance': rng.uniform(0, 1, n_rows),
+        'weight_change': rng.normal(0, 3, n_rows)
+    })
+    ml_models.train_fitness_classifier({
+        'age': rng.integers(16, 80, n_rows).astype(float),
+        'bmi': rng.uniform(16, 40, n_rows),
+        'workouts_per_week': rng.integers(0, 8, n_rows).astype(float),
+        'average_duration': rng.uniform(10, 90, n_rows),
+        'max_intensity': rng.integers(1, 11, n_rows).astype(float),
+        'fitness_level': LEVELS[rng.integers(0, 4, n_rows)]
+    })
+    return ml_models
+
+
+@pytest.fixture
+def client(trained_models):
+    from app import app
+
+    return app.test_client()
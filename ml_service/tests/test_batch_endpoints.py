@@ -0,0 +1,106 @@
+"""Per-row errors on the batch scoring endpoints"""
+
+import numpy as np
+import pytest
+
+FITNESS_ROW = {'age': 30, 'bmi': 24, 'workouts_per_week': 4, 'avg_duration': 40, 'max_intensity': 6}
+
+
+@pytest.mark.parametrize('bad', [None, 'nan', 'x', float('inf')])
+def test_fitness_columns_invalid_value_fails_only_its_row(client, bad):
+    columns = {field: [value] * 3 for field, value in FITNESS_ROW.items()}
+    columns['age'][1] = bad
+    response = client.post('/api/ml/classify-fitness-level/batch', json={'columns': columns})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['count'] == 3
+    assert data['errors'] == 1
+    assert 'fitness_level' in data['results'][0]
+    assert 'age' in data['results'][1]['error']
+    assert 'fitness_level' in data['results'][2]
+
+
+def test_fitness_list_matches_columns(client):
+    users = [FITNESS_ROW, dict(FITNESS_ROW, bmi='nan'), dict(FITNESS_ROW, age=55)]
+    columns = {field: [user[field] for user in users] for field in FITNESS_ROW}
+    from_list = client.post('/api/ml/classify-fitness-level/batch', json={'users': users}).get_json()
+    from_columns = client.post('/api/ml/classify-fitness-level/batch', json={'columns': columns}).get_json()
+
+    assert from_list['results'] == from_columns['results']
+    assert from_list['errors'] == 1
+
+
+def test_progress_invalid_history_fails_only_its_row(client):
+    users = [
+        {'user_history': {'workout_history': [{'calories_burned': 300}] * 4}},
+        {'user_history': {'workout_history': 'not a history'}},
+        {'user_history': {}}
+    ]
+    data = client.post('/api/ml/progress-prediction/batch', json={'users': users}).get_json()
+
+    assert data['errors'] == 1
+    assert 'error' in data['results'][1]
+    assert 'error' not in data['results'][0] and 'error' not in data['results'][2]
+
+
+def test_failed_chunk_gives_each_row_an_error(client, trained_models, monkeypatch):
+    def failing_predictor(n_rows, group):
+        def predict(X):
+            raise RuntimeError('model exploded')
+        return predict
+
+    monkeypatch.setattr(trained_models, 'forest_predictor', failing_predictor)
+    columns = {field: [value] * 2 for field, value in FITNESS_ROW.items()}
+    columns['max_intensity'][0] = 'x'
+    data = client.post('/api/ml/classify-fitness-level/batch', json={'columns': columns}).get_json()
+
+    assert data['errors'] == 2
+    assert 'max_intensity' in data['results'][0]['error']
+    assert data['results'][1]['error'] == 'Prediction failed: model exploded'
+
+
+def test_malformed_batch_is_rejected(client):
+    response = client.post('/api/ml/classify-fitness-level/batch', json={'users': 'everyone'})
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_valid_rows_match_single_user_endpoint(client):
+    users = [dict(FITNESS_ROW, age=age) for age in np.linspace(20, 70, 5).tolist()]
+    batch = client.post('/api/ml/classify-fitness-level/batch', json={'users': users}).get_json()['results']
+    single = [client.post('/api/ml/classify-fitness-level', json=user).get_json()['fitness_level'] for user in users]
+
+    assert [r['fitness_level'] for r in batch] == single
+
+
+def failing_predictor(n_rows, group):
+    def predict(X):
+        raise ValueError('X has 4 features, but the model expects 5')
+    return predict
+
+
+def model_errors(model):
+    import metrics
+    return metrics.MODEL_ERRORS._values.get((model,), 0)
+
+
+def test_single_progress_model_failure_is_counted(client, trained_models, monkeypatch):
+    monkeypatch.setattr(trained_models, 'forest_predictor', failing_predictor)
+    before = model_errors('progress_prediction')
+    response = client.post('/api/ml/progress-prediction', json={'user_history': {'workout_history': []}})
+
+    assert response.status_code == 200
+    assert response.get_json()['prediction']['direction'] == 'Stable'
+    assert model_errors('progress_prediction') == before + 1
+
+
+def test_single_fitness_model_failure_is_reported(client, trained_models, monkeypatch):
+    monkeypatch.setattr(trained_models, 'forest_predictor', failing_predictor)
+    before = model_errors('fitness_classifier')
+    response = client.post('/api/ml/classify-fitness-level', json=FITNESS_ROW)
+
+    assert response.status_code == 500
+    assert response.get_json()['success'] is False
+    assert model_errors('fitness_classifier') > before
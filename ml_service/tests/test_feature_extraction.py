@@ -0,0 +1,63 @@
+"""extract_workout_features_bulk against the per-user path"""
+
+import numpy as np
+import pytest
+
+from benchmarks.feature_extraction import generate_table, user_workouts
+from ml_models import MLModels
+
+
+@pytest.fixture(scope='module')
+def ml_models():
+    return MLModels()
+
+
+def test_bulk_matches_per_user(ml_models):
+    table = generate_table(300, 6, seed=3)
+    starts = np.searchsorted(table['user_id'], np.arange(301))
+    user_ids, features = ml_models.extract_workout_features_bulk(table)
+
+    assert len(user_ids) == len(np.unique(table['user_id']))
+    for row, user in enumerate(user_ids.tolist()):
+        expected = ml_models.extract_workout_features(user_workouts(table, starts, user))
+        np.testing.assert_allclose(features[row], expected, rtol=1e-9, atol=1e-9)
+
+
+def test_bulk_matches_per_user_with_missing_values(ml_models):
+    workouts = {
+        'a': [{'type': 'Cardio', 'duration': None, 'calories_burned': 300},
+              {'type': 'HIIT', 'duration': 45, 'calories_burned': None},
+              {'type': 'Strength', 'duration': 20, 'calories_burned': 150}],
+        'b': [{'type': 'Flexibility', 'duration': 60, 'calories_burned': 100}],
+        'c': [{'type': 'Cardio', 'duration': None, 'calories_burned': None}] * 2
+    }
+    rows = [dict(workout, user_id=user) for user, history in workouts.items() for workout in history]
+    table = {column: np.array([row[column] for row in rows], dtype=object) for column in rows[0]}
+    table['duration'] = np.array([np.nan if v is None else v for v in table['duration']], dtype=float)
+    table['calories_burned'] = np.array([np.nan if v is None else v for v in table['calories_burned']], dtype=float)
+    user_ids, features = ml_models.extract_workout_features_bulk(table)
+
+    for row, user in enumerate(user_ids.tolist()):
+        np.testing.assert_allclose(features[row], ml_models.extract_workout_features(workouts[user]))
+
+
+def test_listed_users_without_workouts_get_zero_rows(ml_models):
+    table = generate_table(20, 4, seed=5)
+    starts = np.searchsorted(table['user_id'], np.arange(21))
+    requested = np.array([7, 1000, 2])
+    user_ids, features = ml_models.extract_workout_features_bulk(table, user_ids=requested)
+
+    np.testing.assert_array_equal(user_ids, requested)
+    np.testing.assert_allclose(features[0], ml_models.extract_workout_features(user_workouts(table, starts, 7)))
+    np.testing.assert_array_equal(features[1], np.zeros(10))
+    np.testing.assert_allclose(features[2], ml_models.extract_workout_features(user_workouts(table, starts, 2)))
+
+
+def test_columnar_history_matches_list(ml_models):
+    table = generate_table(1, 12, seed=8)
+    workouts = user_workouts(table, [0, len(table['user_id'])], 0)
+    columns = {column: [workout[column] for workout in workouts] for column in workouts[0]}
+
+    np.testing.assert_allclose(
+        ml_models.extract_workout_features(columns), ml_models.extract_workout_features(workouts)
+    )
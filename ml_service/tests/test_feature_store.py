@@ -0,0 +1,142 @@
+"""WorkoutAggregate and FeatureStore against the per-user history path"""
+
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from feature_store import FeatureStore
+from ml_models import MLModels
+from workout_aggregates import WorkoutAggregate
+
+WORKOUTS = [
+    {'type': 'Cardio', 'duration': 30, 'calories_burned': 300, 'date': '2024-01-01'},
+    {'type': 'Strength', 'duration': None, 'calories_burned': 250, 'date': '2024-01-03'},
+    {'type': 'HIIT', 'duration': 45, 'calories_burned': None, 'date': '2024-01-04'},
+    {'type': 'Yoga', 'duration': 60, 'calories_burned': 120},
+    {'type': 'Cardio', 'duration': 25.5, 'calories_burned': 410.2, 'date': '2024-01-09'}
+]
+NUTRITION = [{'date': '2024-01-01', 'calories': 2100, 'protein_grams': 130}, {'calories': 1900}]
+
+
+@pytest.fixture(scope='module')
+def ml_models():
+    return MLModels()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FeatureStore(str(tmp_path / 'store.sqlite3'))
+
+
+@pytest.mark.parametrize('n', [0, 1, 2, 5])
+def test_aggregate_features_match_extraction(ml_models, n):
+    workouts = WORKOUTS[:n]
+    np.testing.assert_allclose(
+        WorkoutAggregate.from_workouts(workouts).features(), ml_models.extract_workout_features(workouts),
+        rtol=1e-9, atol=1e-9
+    )
+
+
+def test_aggregate_features_with_only_missing_durations(ml_models):
+    workouts = [{'type': 'Cardio', 'calories_burned': 200}, {'type': 'HIIT', 'duration': None}]
+    np.testing.assert_allclose(
+        WorkoutAggregate.from_workouts(workouts).features(), ml_models.extract_workout_features(workouts)
+    )
+
+
+def test_aggregate_is_order_independent_of_batching():
+    one_by_one = WorkoutAggregate()
+    for workout in WORKOUTS:
+        one_by_one.update_many([workout])
+    columns = {column: [w.get(column) for w in WORKOUTS] for column in ('type', 'duration', 'calories_burned')}
+    np.testing.assert_allclose(one_by_one.features(), WorkoutAggregate.from_workouts(columns).features())
+
+
+def test_append_and_lookup(store, ml_models):
+    assert store.user_history('u1') is None
+    assert store.append_workouts('u1', WORKOUTS[:2]) == 2
+    assert store.append_workouts('u1', {column: [w.get(column) for w in WORKOUTS[2:]] for column in WORKOUTS[0]}) == 3
+    assert store.append_nutrition('u1', NUTRITION) == 2
+    store.set_profile('u1', {'age': 31})
+    store.set_profile('u1', {'weight': 70})
+
+    assert store.profile('u1') == {'age': 31, 'weight': 70}
+    assert store.counts('u1') == {'workouts': 5, 'nutrition': 2}
+    assert store.workout_aggregate('u1') == WorkoutAggregate.from_workouts(WORKOUTS)
+    np.testing.assert_allclose(
+        ml_models.extract_workout_features(store.user_history('u1')['workout_history']),
+        ml_models.extract_workout_features(WORKOUTS)
+    )
+
+    history = store.workout_history('u1')
+    assert list(history['type']) == [w['type'] for w in WORKOUTS]
+    # Missing values are stored as their ingestion defaults
+    assert history['duration'][1] == 30 and history['calories_burned'][2] == 200
+    assert store.nutrition_history('u1')['calories'].tolist() == [2100, 1900]
+
+
+def test_user_ids_are_text(store):
+    store.append_workouts(42, WORKOUTS[:1])
+    store.append_nutrition('42', NUTRITION[:1])
+    assert store.counts('42') == {'workouts': 1, 'nutrition': 1}
+
+
+def test_nutrition_only_user(store):
+    store.append_nutrition('u2', NUTRITION)
+    history = store.user_history('u2')
+    assert history['nutrition_count'] == 2
+    assert len(history['workout_history']) == 0
+    store.append_workouts('u2', WORKOUTS[:1])
+    assert store.counts('u2') == {'workouts': 1, 'nutrition': 2}
+
+
+def test_delete_user(store):
+    store.append_workouts('u3', WORKOUTS)
+    store.append_nutrition('u3', NUTRITION)
+    store.set_profile('u3', {'age': 40})
+    store.delete_user('u3')
+
+    assert store.user_history('u3') is None
+    assert store.counts('u3') == {'workouts': 0, 'nutrition': 0}
+
+
+def test_stored_user_matches_inline_history(client):
+    user_data = {'age': 30, 'weight': 70, 'height': 170, 'fitness_level': 'Intermediate', 'goal': 'Weight Loss'}
+    client.delete('/api/ml/users/inline-check')
+    client.put('/api/ml/users/inline-check/profile', json={'user_data': user_data})
+    client.post('/api/ml/users/inline-check/workouts', json={'workouts': WORKOUTS})
+    client.post('/api/ml/users/inline-check/nutrition', json={'nutrition_logs': NUTRITION})
+    inline = {'workout_history': WORKOUTS, 'nutrition_history': NUTRITION}
+
+    for path in ('/api/ml/progress-prediction', '/api/ml/insights'):
+        stored = client.post(path, json={'user_id': 'inline-check', 'as_of': '2024-01-20'}).get_json()
+        sent = client.post(path, json={'user_data': user_data, 'user_history': dict(inline, as_of='2024-01-20')}).get_json()
+        stored.pop('timestamp', None)
+        sent.pop('timestamp', None)
+        assert stored == sent, path
+
+
+def test_overlapping_profile_updates_keep_both(tmp_path, monkeypatch):
+    path = str(tmp_path / 'store.sqlite3')
+    FeatureStore(path).set_profile('u4', {'age': 30})
+    loads = json.loads
+
+    def slow_loads(*args, **kwargs):
+        # Hold each update between reading the stored profile and writing the merge
+        time.sleep(0.2)
+        return loads(*args, **kwargs)
+
+    monkeypatch.setattr(json, 'loads', slow_loads)
+    first = threading.Thread(target=FeatureStore(path).set_profile, args=('u4', {'weight': 70}))
+    second = threading.Thread(target=FeatureStore(path).set_profile, args=('u4', {'height': 170}))
+    first.start()
+    time.sleep(0.05)
+    second.start()
+    first.join()
+    second.join()
+    monkeypatch.undo()
+
+    assert FeatureStore(path).profile('u4') == {'age': 30, 'weight': 70, 'height': 170}
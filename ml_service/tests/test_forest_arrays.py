@@ -0,0 +1,68 @@
+"""ForestArrays against sklearn predict on the same forests"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from config import ARTIFACT_GROUPS
+from forest_arrays import ForestArrays
+from model_registry import ModelRegistry
+
+
+def training_data(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    # Integer-valued columns put query rows exactly on split thresholds
+    X = np.column_stack([rng.integers(0, 10, n_rows), rng.normal(50, 20, n_rows), rng.integers(0, 3, n_rows)])
+    return X.astype(float), rng
+
+
+def test_regressor_matches_sklearn():
+    X, rng = training_data(500)
+    y = X[:, 0] * 2 - X[:, 1] / 10 + rng.normal(0, 1, len(X))
+    scaler = StandardScaler().fit(X)
+    forest = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0).fit(scaler.transform(X), y)
+    compiled = ForestArrays.from_estimator(forest, scaler)
+
+    queries, _ = training_data(300, seed=1)
+    np.testing.assert_allclose(compiled.predict(queries), forest.predict(scaler.transform(queries)), rtol=1e-12)
+    np.testing.assert_allclose(compiled.predict(X[:1]), forest.predict(scaler.transform(X[:1])), rtol=1e-12)
+
+
+def test_classifier_matches_sklearn():
+    X, rng = training_data(600)
+    labels = np.array(['Beginner', 'Intermediate', 'Advanced', 'Elite'], dtype=object)
+    encoder = LabelEncoder().fit(labels)
+    y = encoder.transform(labels[(X[:, 0] // 3).astype(int).clip(0, 3)])
+    scaler = StandardScaler().fit(X)
+    forest = RandomForestClassifier(n_estimators=15, random_state=0).fit(scaler.transform(X), y)
+    compiled = ForestArrays.from_estimator(forest, scaler, encoder)
+
+    queries, _ = training_data(400, seed=2)
+    expected = encoder.inverse_transform(forest.predict(scaler.transform(queries)))
+    np.testing.assert_array_equal(compiled.predict(queries), expected)
+
+
+@pytest.mark.parametrize('group', ['progress_prediction', 'fitness_classifier'])
+def test_trained_models_match_sklearn(trained_models, group):
+    forest, model, scaler, *label_encoder = trained_models.artifact_group(group)
+    assert isinstance(forest, ForestArrays)
+    n_features = len(scaler.mean_)
+    rng = np.random.default_rng(4)
+    queries = scaler.mean_ + rng.normal(0, 1, (200, n_features)) * scaler.scale_
+
+    expected = model.predict(scaler.transform(queries))
+    if label_encoder:
+        np.testing.assert_array_equal(forest.predict(queries), label_encoder[0].inverse_transform(expected))
+    else:
+        np.testing.assert_allclose(forest.predict(queries), expected, rtol=1e-12)
+
+
+def test_memory_mapped_forest_matches_loaded(trained_models):
+    registry = ModelRegistry(trained_models.model_path, mmap_mode='r')
+    mapped = registry.get_group('fitness_classifier', ARTIFACT_GROUPS['fitness_classifier'])[0]
+    loaded = trained_models.artifact_group('fitness_classifier')[0]
+    assert not isinstance(mapped.threshold_, np.memmap)
+
+    queries = np.array([[30, 24, 4, 40, 6], [60, 31, 0, 10, 1], [22, 20, 7, 80, 10]], dtype=float)
+    np.testing.assert_array_equal(mapped.predict(queries), loaded.predict(queries))
@@ -0,0 +1,104 @@
+"""Rollup range queries against summing the records directly"""
+
+import numpy as np
+import pytest
+
+from feature_store import FeatureStore
+from rollups import FIELDS, Rollup, to_days
+
+START = np.datetime64('2023-01-01')
+
+
+def workouts(n, span, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {'type': 'Cardio', 'duration': float(rng.integers(10, 90)), 'calories_burned': float(rng.integers(50, 900)),
+         'date': str(START + int(day))}
+        for day in rng.integers(0, span, n)
+    ]
+
+
+def brute_force(records, value, first_day, last_day):
+    days = to_days([r.get('date') for r in records])
+    return sum(value(r) for r, day in zip(records, days) if first_day <= day <= last_day)
+
+
+@pytest.mark.parametrize('window', [1, 6, 7, 8, 28, 90])
+def test_recent_matches_brute_force(window):
+    records = workouts(500, 400)
+    rollup = Rollup.from_history(records)
+    first = int(to_days([str(START)])[0])
+
+    for as_of in range(first - 5, first + 410, 13):
+        recent = rollup.recent(window, as_of)
+        first_day = as_of - window + 1
+        assert recent['workouts'] == brute_force(records, lambda r: 1, first_day, as_of)
+        assert recent['minutes'] == pytest.approx(brute_force(records, lambda r: r['duration'], first_day, as_of))
+        assert recent['calories_burned'] == pytest.approx(
+            brute_force(records, lambda r: r['calories_burned'], first_day, as_of)
+        )
+
+
+def test_recent_defaults_to_today_and_ignores_undated():
+    rollup = Rollup.from_history([{'duration': 30}, {'duration': 40, 'date': str(np.datetime64('today'))}])
+    assert rollup.recent(28)['workouts'] == 1
+    assert rollup.total('workouts') == 1
+
+
+def test_empty_rollup():
+    rollup = Rollup()
+    assert rollup.recent(28, 19000) == dict.fromkeys(FIELDS, 0.0)
+    assert rollup.days_elapsed(19000) is None
+
+
+def test_stored_window_matches_full_rollup(tmp_path):
+    store = FeatureStore(str(tmp_path / 'store.sqlite3'))
+    records = workouts(300, 200, seed=1)
+    nutrition = [{'date': r['date'], 'calories': 1800} for r in records[:80]]
+    store.append_workouts('u', records[:150])
+    store.append_workouts('u', records[150:])
+    store.append_nutrition('u', nutrition)
+    full = Rollup.from_history(records, nutrition)
+
+    for as_of in ('2022-12-01', '2023-02-10', '2023-07-19', '2024-03-01'):
+        day = int(to_days([as_of])[0])
+        history = store.user_history('u', as_of)
+        rollup = history['rollup']
+        assert history['as_of'] == as_of
+        assert len(rollup) <= 28
+        assert rollup.recent(28, day) == pytest.approx(full.recent(28, day))
+        assert rollup.days_elapsed(day) == full.days_elapsed(day)
+        for field in FIELDS:
+            assert rollup.total(field) == pytest.approx(full.total(field))
+
+
+def test_dates_in_other_formats_and_unparseable_dates():
+    days = to_days(['2024-01-02', '01/02/2024', 'January 2, 2024', '2024-01-02T10:00:00Z', 'garbage', '', None])
+    assert days.tolist() == [days[0]] * 4 + [-1, -1, -1]
+
+
+def test_non_numeric_values_count_as_defaults():
+    rollup = Rollup.from_history(
+        [{'duration': 'thirty', 'calories_burned': '120', 'date': '2024-01-02'},
+         {'duration': None, 'calories_burned': [1], 'date': '01/03/2024'}],
+        [{'calories': 'lots', 'date': '2024-01-02'}]
+    )
+    assert rollup.total('workouts') == 2
+    assert rollup.total('minutes') == 60
+    assert rollup.total('calories_burned') == 320
+    assert rollup.total('calories') == 2000
+
+
+def test_insights_accept_malformed_workouts(client):
+    history = {
+        'workout_history': [
+            {'type': 'Cardio', 'duration': 'thirty', 'date': '2024-01-02'},
+            {'type': 'Cardio', 'duration': 30, 'date': '01/03/2024'},
+            {'type': 'HIIT', 'duration': 20, 'date': 'not a date'}
+        ],
+        'as_of': '2024-01-10'
+    }
+    response = client.post('/api/ml/insights', json={'user_data': {}, 'user_history': history})
+
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
@@ -0,0 +1,85 @@
+"""ShardedIndex against one exact NearestNeighbors over all users"""
+
+import os
+
+import numpy as np
+import pytest
+from sklearn.neighbors import NearestNeighbors
+
+from sharded_index import ShardedIndex
+
+K = 5
+
+
+def saved_features(directory, n_users, seed=0):
+    features = np.random.default_rng(seed).normal(0, 10, (n_users, 10))
+    path = os.path.join(directory, 'features.npy')
+    np.save(path, features)
+    return features, path
+
+
+def exact(features, queries, k=K):
+    return NearestNeighbors(n_neighbors=k, algorithm='ball_tree').fit(features).kneighbors(queries)
+
+
+def assert_same_neighbours(index, features, queries, k=K):
+    distances, indices = index.kneighbors(queries, n_neighbors=k)
+    expected_distances, expected_indices = exact(features, queries, k)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(distances, expected_distances)
+
+
+@pytest.mark.parametrize('n_shards', [1, 3, 8])
+def test_matches_exact_index(tmp_path, n_shards):
+    features, path = saved_features(str(tmp_path), 400)
+    index = ShardedIndex.build(str(tmp_path), [f'user-{i}' for i in range(400)], path, n_shards, n_neighbors=K)
+    index.attach(str(tmp_path))
+    queries = np.random.default_rng(1).normal(0, 10, (50, 10))
+
+    assert index.n_samples_fit_ == 400
+    assert sum(index.sizes_) == 400
+    assert_same_neighbours(index, features, queries)
+    # A user's own vector is its nearest neighbour
+    assert index.kneighbors(features[:20], return_distance=False)[:, 0].tolist() == list(range(20))
+
+
+def test_more_neighbours_than_some_shards_hold(tmp_path):
+    features, path = saved_features(str(tmp_path), 12)
+    index = ShardedIndex.build(str(tmp_path), list(range(12)), path, 6, n_neighbors=K).attach(str(tmp_path))
+    assert_same_neighbours(index, features, features[:4], k=10)
+
+
+def test_rebuild_only_changed_shards(tmp_path):
+    user_ids = list(range(300))
+    features, path = saved_features(str(tmp_path), 300)
+    previous = ShardedIndex.build(str(tmp_path), user_ids, path, 4, n_neighbors=K)
+
+    features[7] += 50
+    features = np.vstack([features, np.random.default_rng(2).normal(0, 10, (5, 10))])
+    np.save(path, features)
+    index = ShardedIndex.build(str(tmp_path), user_ids + list(range(300, 305)), path, 4, n_neighbors=K,
+                               previous=previous, changed_rows=[7])
+    index.attach(str(tmp_path))
+
+    reused = [new == old for new, old in zip(index.build_ids_, previous.build_ids_)]
+    assert any(reused) and not all(reused)
+    assert_same_neighbours(index, features, features[[7, 300, 304, 0]])
+
+
+def test_stale_shard_is_rejected(tmp_path):
+    features, path = saved_features(str(tmp_path), 100)
+    old = ShardedIndex.build(str(tmp_path), list(range(100)), path, 2, n_neighbors=K)
+    ShardedIndex.build(str(tmp_path), list(range(100)), path, 2, n_neighbors=K)
+
+    with pytest.raises(RuntimeError):
+        old.attach(str(tmp_path))
+
+
+def test_shards_in_worker_processes(tmp_path):
+    features, path = saved_features(str(tmp_path), 200)
+    index = ShardedIndex.build(str(tmp_path), list(range(200)), path, 2, n_neighbors=K)
+    index.attach(str(tmp_path), processes=True)
+    try:
+        assert_same_neighbours(index, features, features[:10] + 0.5)
+    finally:
+        index.close()
@@ -0,0 +1,18 @@
+"""Validation of incremental workout model updates"""
+
+import pytest
+
+
+@pytest.mark.parametrize('body', [
+    {'users_with_workouts': {'user_id': 1}},
+    {'users_with_workouts': [{'workouts': []}]},
+    {'users_with_workouts': [{'user_id': 1, 'workouts': []}, 'user-2']},
+    {'users_with_workouts': [{'user_id': 1, 'workouts': {'type': 'Cardio'}}]},
+    {'users_with_workouts': [{'user_id': 1, 'workouts': [{'type': 'Cardio', 'duration': 'thirty'}]}]},
+    ['not', 'an', 'object']
+])
+def test_malformed_update_is_rejected(client, body):
+    response = client.post('/api/ml/workout-model/users', json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,213 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from config import TRAINING_WORKERS, TRAINING_JOB_HISTORY
+
+logger = logging.getLogger(__name__)
+
+# Model name -> (MLModels training method, request field holding its data)
+TRAINING_TASKS = {
+    'workout_recommendation': ('train_workout_recommendation_model', 'users_with_workouts'),
+    'progress_prediction': ('train_progress_prediction_model', 'historical_progress_data'),
+    'progress_neural_network': ('train_progress_neural_network', 'historical_progress_data'),
+    'fitness_classifier': ('train_fitness_classifier', 'user_profiles')
+}
+
+# Model name -> (MLModels training method, NDJSON dataset it is trained from)
+FILE_TRAINING_TASKS = {
+    'workout_recommendation': ('train_workout_recommendation_model_from_table', 'workouts'),
+    'progress_prediction': ('train_progress_prediction_model', 'historical_progress_data'),
+    'progress_neural_network': ('train_progress_neural_network', 'historical_progress_data'),
+    'fitness_classifier': ('train_fitness_classifier', 'user_profiles')
+}
+
+# Why a task whose training method returned None (nothing trained) was skipped
+SKIP_REASONS = {
+    'workout_recommendation': 'No users to train on',
+    'progress_prediction': 'Fewer than 5 rows of historical_progress_data',
+    'progress_neural_network': 'Fewer than 10 rows of historical_progress_data',
+    'fitness_classifier': 'Fewer than 5 user_profiles',
+    'workout_compaction': 'No pending workout updates'
+}
+
+# Queue a worker process reports started tasks on, set by _set_started_queue
+_started = None
+
+
+def _set_started_queue(started):
+    global _started
+    _started = started
+
+
+def train_model(name, method_name, args):
+    """Run one MLModels training method in a worker process.
+
+    Returns (elapsed seconds, whether a model was trained); training methods
+    return None when they had too little data.
+    """
+    from ml_models import MLModels
+
+    if _started is not None:
+        _started.put(name)
+    start = time.perf_counter()
+    result = getattr(MLModels(), method_name)(*args)
+    return time.perf_counter() - start, result is not None
+
+
+class TrainingJobManager:
+    """Runs model training as background jobs.
+
+    Each job fits its models concurrently in a process pool so a request
+    thread is never blocked and the four independent models use separate
+    cores. Jobs run one at a time; job state is kept in memory for the last
+    TRAINING_JOB_HISTORY jobs.
+    """
+
+    def __init__(self, max_workers=TRAINING_WORKERS, on_model_trained=None):
+        self.max_workers = max_workers
+        self.on_model_trained = on_model_trained
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='training-job')
+
+    def submit(self, data, files=None, cleanup=()):
+        """Queue a training job; returns the job id.
+        
+        ``data`` holds inline datasets keyed like the /train-models payload,
+        ``files`` maps dataset names to NDJSON files that the worker process
+        parses itself. Paths in ``cleanup`` are deleted when the job ends.
+        """
+        files = files or {}
+        tasks = {
+            name: (method_name, (data[field],))
+            for name, (method_name, field) in TRAINING_TASKS.items()
+            if data.get(field)
+        }
+        for name, (method_name, dataset) in FILE_TRAINING_TASKS.items():
+            if dataset in files:
+                tasks[name] = ('train_from_file', (method_name, dataset, files[dataset]))
+        return self._submit('training', tasks, cleanup)
+
+    def submit_compaction(self):
+        """Queue a workout index compaction unless one is already queued or running"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job['kind'] == 'compaction' and job['status'] in ('queued', 'running'):
+                    return job['job_id']
+        return self._submit('compaction', {'workout_compaction': ('compact_workout_model', ())})
+
+    def _submit(self, kind, tasks, cleanup=()):
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'kind': kind,
+            'status': 'queued',
+            'progress': 0.0 if tasks else 1.0,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'models': {
+                name: {'status': 'pending', 'seconds': None, 'error': None, 'reason': None} for name in tasks
+            }
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+        self._runner.submit(self._run, job_id, tasks, cleanup)
+        return job_id
+
+    def get(self, job_id):
+        """Snapshot of a job's state, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return dict(job, models={name: dict(m) for name, m in job['models'].items()})
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _update_model(self, job_id, name, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            model = job['models'][name]
+            if fields.get('status') == 'running' and model['status'] != 'pending':
+                return  # the start notice arrived after the result
+            model.update(fields)
+            finished = sum(1 for m in job['models'].values() if m['status'] in ('completed', 'skipped', 'failed'))
+            job['progress'] = finished / len(job['models'])
+
+    def _watch_started(self, job_id, started):
+        """Mark tasks running as worker processes report them started; None stops"""
+        while True:
+            name = started.get()
+            if name is None:
+                return
+            self._update_model(job_id, name, status='running')
+
+    def _run(self, job_id, tasks, cleanup):
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            failed = self._train(job_id, tasks)
+        except Exception as e:
+            logger.error(f"Training job {job_id} failed: {str(e)}")
+            failed = True
+        finally:
+            for path in cleanup:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        self._update(job_id, status='failed' if failed else 'completed', finished_at=time.time())
+
+    def _train(self, job_id, tasks):
+        failed = False
+        if tasks:
+            # A fresh pool per job: spawned workers don't inherit server threads,
+            # and TensorFlow memory is released when the job ends.
+            context = multiprocessing.get_context('spawn')
+            workers = min(self.max_workers, len(tasks))
+            started = context.Queue()
+            watcher = threading.Thread(target=self._watch_started, args=(job_id, started), daemon=True)
+            watcher.start()
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=workers, mp_context=context, initializer=_set_started_queue, initargs=(started,)
+                ) as pool:
+                    futures = {
+                        pool.submit(train_model, name, method_name, args): name
+                        for name, (method_name, args) in tasks.items()
+                    }
+                    for future in as_completed(futures):
+                        name = futures[future]
+                        try:
+                            seconds, trained = future.result()
+                        except Exception as e:
+                            failed = True
+                            logger.error(f"Training job {job_id}: {name} failed: {str(e)}")
+                            self._update_model(job_id, name, status='failed', error=str(e))
+                        else:
+                            self._update_model(
+                                job_id, name, status='completed' if trained else 'skipped', seconds=round(seconds, 3),
+                                reason=None if trained else SKIP_REASONS.get(name, 'Nothing to train')
+                            )
+                            if trained and self.on_model_trained:
+                                self.on_model_trained(name)
+            finally:
+                started.put(None)
+                watcher.join()
+        return failed
+
+    def _prune(self):
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job['status'] in ('completed', 'failed')
+        ]
+        for job_id in finished[:max(0, len(self._jobs) - TRAINING_JOB_HISTORY)]:
+            del self._jobs[job_id]
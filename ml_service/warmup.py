@@ -0,0 +1,142 @@
+"""
+Boot-time warm-up and readiness.
+
+/api/ml/health only says the process is up. Before a fresh process can
+serve at full speed it still has to load its model artifacts and run each
+code path once (lazy imports, first-call allocations, the sklearn path for
+large batches). WarmUp does that up front, in the background, by loading
+the artifacts and sending one synthetic request to every inference
+endpoint through the app itself; /api/ml/ready reports success only once
+it has finished with every step succeeding, along with the time each step
+took. Synthetic requests
+are not counted in the request metrics.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from config import (
+    COMPILED_FOREST_MAX_ROWS, FITNESS_BATCH_DEFAULTS, NUTRITION_BATCH_DEFAULTS, PROGRESS_BATCH_DEFAULTS
+)
+
+logger = logging.getLogger(__name__)
+
+# Set on the WSGI environ / ASGI scope of synthetic requests
+WARMUP_KEY = 'ml.warmup'
+
+PROFILE = {'age': 30, 'weight': 70, 'height': 170, 'fitness_level': 'Intermediate', 'goal': 'Weight Loss'}
+HISTORY = {
+    'workout_history': [
+        {'type': workout_type, 'duration': 30 + 5 * i, 'calories_burned': 250 + 20 * i, 'date': f'2024-01-{i + 1:02d}'}
+        for i, workout_type in enumerate(('Cardio', 'Strength', 'HIIT', 'Flexibility', 'Cardio', 'Strength'))
+    ],
+    'nutrition_history': [{'calories': 2000, 'date': f'2024-01-{i + 1:02d}'} for i in range(6)]
+}
+
+
+def batch_columns(defaults, n_rows, **extra):
+    return {'columns': {name: [value] * n_rows for name, value in dict(defaults, **extra).items()}}
+
+
+def synthetic_requests():
+    """(path, JSON body) for every inference endpoint.
+
+    Batches have one row more than COMPILED_FOREST_MAX_ROWS, so they load
+    and run the sklearn forests while the single-user endpoints warm the
+    compiled ones.
+    """
+    n_rows = COMPILED_FOREST_MAX_ROWS + 1
+    return [
+        ('/api/ml/workout-recommendations', {'user_data': PROFILE, 'user_history': HISTORY['workout_history']}),
+        ('/api/ml/nutrition-recommendations', {'user_data': PROFILE}),
+        ('/api/ml/nutrition-recommendations/batch', batch_columns(
+            NUTRITION_BATCH_DEFAULTS, n_rows, fitness_level=PROFILE['fitness_level'], goal=PROFILE['goal'])),
+        ('/api/ml/progress-prediction', {'user_data': PROFILE, 'user_history': HISTORY}),
+        ('/api/ml/progress-prediction/batch', batch_columns(PROGRESS_BATCH_DEFAULTS, n_rows)),
+        ('/api/ml/classify-fitness-level', dict(FITNESS_BATCH_DEFAULTS)),
+        ('/api/ml/classify-fitness-level/batch', batch_columns(FITNESS_BATCH_DEFAULTS, n_rows)),
+        ('/api/ml/insights', {'user_data': PROFILE, 'user_history': HISTORY})
+    ]
+
+
+class WarmUp:
+    """Readiness state of one server process: 'pending', 'running', 'ready', 'failed' or 'skipped'"""
+
+    def __init__(self):
+        self.state = 'pending'
+        self.started_at = None
+        self.seconds = None
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state in ('ready', 'skipped')
+
+    def skip(self):
+        """Mark ready without warming up"""
+        with self._lock:
+            if self.state == 'pending':
+                self.state = 'skipped'
+
+    def start(self, send, load_artifacts=None):
+        """Run warm-up on a background thread; False if it was already started.
+
+        ``send(path, body)`` makes one synthetic request and returns its HTTP
+        status; ``load_artifacts`` (e.g. MLModels.load_artifacts) runs first.
+        """
+        with self._lock:
+            if self.state != 'pending':
+                return False
+            self.state = 'running'
+            self.started_at = datetime.now().isoformat()
+        threading.Thread(target=self.run, args=(send, load_artifacts), name='warmup', daemon=True).start()
+        return True
+
+    def run(self, send, load_artifacts=None):
+        start = time.perf_counter()
+        if load_artifacts is not None:
+            self.step('load_artifacts', load_artifacts)
+        for path, body in synthetic_requests():
+            self.step(path, send, path, body)
+        self.seconds = time.perf_counter() - start
+        failed = [name for name, step in self.steps.items() if 'error' in step]
+        if failed:
+            self.state = 'failed'
+            logger.error(f"Warm-up failed in {self.seconds:.2f}s: {', '.join(failed)}")
+        else:
+            self.state = 'ready'
+            logger.info(f"Warm-up finished in {self.seconds:.2f}s")
+
+    def step(self, name, func, *args):
+        """Time ``func(*args)``; an exception or a 5xx status is recorded, not raised"""
+        start = time.perf_counter()
+        record = {}
+        try:
+            result = func(*args)
+            if isinstance(result, int):
+                record['status'] = result
+                if result >= 500:
+                    record['error'] = f'HTTP {result}'
+            elif isinstance(result, dict):
+                record['loaded'] = result
+        except Exception as e:
+            logger.error(f"Error warming up {name}: {str(e)}")
+            record['error'] = str(e)
+        record['ms'] = round((time.perf_counter() - start) * 1000, 3)
+        self.steps[name] = record
+
+    def record(self, name, seconds, **details):
+        """Add a step timed elsewhere (e.g. starting the inference workers)"""
+        self.steps[name] = dict(details, ms=round(seconds * 1000, 3))
+
+    def status(self):
+        return {
+            'ready': self.ready,
+            'state': self.state,
+            'started_at': self.started_at,
+            'warmup_ms': round(self.seconds * 1000, 3) if self.seconds is not None else None,
+            'steps': dict(self.steps)
+        }
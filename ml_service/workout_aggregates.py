@@ -0,0 +1,100 @@
+import math
+
+import numpy as np
+
+from config import WORKOUT_FEATURE_TYPES
+from ingestion import DATASETS
+
+WORKOUT_DEFAULTS = DATASETS['workouts']['defaults']
+TYPE_BITS = {workout_type: 1 << i for i, workout_type in enumerate(WORKOUT_FEATURE_TYPES)}
+
+
+class WorkoutAggregate:
+    """Running totals of one user's workouts, updated in O(1) per workout.
+
+    Keeps the count, duration and calorie sums, Welford running mean/M2 for
+    both, and a bitmask of the WORKOUT_FEATURE_TYPES seen, which is all
+    extract_workout_features needs. A missing duration or calorie value
+    counts as its NDJSON ingestion default (30 minutes, 200 kcal).
+    """
+
+    __slots__ = (
+        'count', 'duration_sum', 'duration_mean', 'duration_m2',
+        'calories_sum', 'calories_mean', 'calories_m2', 'type_mask'
+    )
+
+    def __init__(self, count=0, duration_sum=0.0, duration_mean=0.0, duration_m2=0.0,
+                 calories_sum=0.0, calories_mean=0.0, calories_m2=0.0, type_mask=0):
+        self.count = count
+        self.duration_sum = duration_sum
+        self.duration_mean = duration_mean
+        self.duration_m2 = duration_m2
+        self.calories_sum = calories_sum
+        self.calories_mean = calories_mean
+        self.calories_m2 = calories_m2
+        self.type_mask = type_mask
+
+    def __len__(self):
+        return self.count
+
+    def __eq__(self, other):
+        return isinstance(other, WorkoutAggregate) and self.to_row() == other.to_row()
+
+    def to_row(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    @classmethod
+    def from_workouts(cls, workouts):
+        aggregate = cls()
+        aggregate.update_many(workouts)
+        return aggregate
+
+    def update(self, workout_type, duration=None, calories=None):
+        """Fold in one workout"""
+        duration = WORKOUT_DEFAULTS['duration'] if duration is None or duration != duration else float(duration)
+        calories = WORKOUT_DEFAULTS['calories_burned'] if calories is None or calories != calories else float(calories)
+
+        self.count += 1
+        self.duration_sum += duration
+        self.calories_sum += calories
+        # Welford's update
+        delta = duration - self.duration_mean
+        self.duration_mean += delta / self.count
+        self.duration_m2 += delta * (duration - self.duration_mean)
+        delta = calories - self.calories_mean
+        self.calories_mean += delta / self.count
+        self.calories_m2 += delta * (calories - self.calories_mean)
+        self.type_mask |= TYPE_BITS.get(workout_type, 0)
+
+    def update_many(self, workouts):
+        """Fold in a list of workout dicts or a dict of columns"""
+        if isinstance(workouts, dict):
+            n = len(next(iter(workouts.values()), ()))
+            columns = [workouts.get(col, [None] * n) for col in ('type', 'duration', 'calories_burned')]
+            for workout_type, duration, calories in zip(*columns):
+                self.update(workout_type, duration, calories)
+        else:
+            for workout in workouts:
+                self.update(workout.get('type'), workout.get('duration'), workout.get('calories_burned'))
+
+    def duration_std(self):
+        """Sample standard deviation of duration (ddof=1)"""
+        return math.sqrt(self.duration_m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def features(self):
+        """The 10-feature vector of extract_workout_features"""
+        if not self.count:
+            return np.zeros(10)
+        return np.array([
+            self.count,
+            self.duration_sum,
+            self.calories_sum,
+            self.duration_sum / self.count,
+            self.calories_sum / self.count,
+            *(1 if self.type_mask & TYPE_BITS[t] else 0 for t in WORKOUT_FEATURE_TYPES),
+            self.duration_std()
+        ], dtype=float)